@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Catch-up / backfill da Prata para as fontes JSON e IBGE.
+
+new_script_silver_json.py e new_script_silver_ibge_final.py processam só a
+pasta data=YYYYMMDD mais recente da Bronze; um dia perdido nunca chega à
+Prata. Este job encontra, em um intervalo de datas, todas as partições da
+Bronze pendentes:
+- sem marcador de conclusão e sem saída na Prata (nunca processadas);
+- sem marcador e com saída mais antiga que a Bronze (desatualizadas);
+- com marcador cuja assinatura (keys + ETags da Bronze) não bate mais.
+
+Cada partição roda em um processo novo do pool (max_tasks_per_child=1):
+a falha ou o consumo de memória de um dia não afeta os demais. Ao terminar
+uma partição, o marcador prata/controle/backfill/<fonte>/data=YYYYMMDD.json
+é gravado; uma nova execução retoma só o que ficou pendente.
+
+Uso:
+    python script/backfill_prata.py json --inicio 20250801 --fim 20251031
+    python script/backfill_prata.py todas --processos 8
+    python script/backfill_prata.py ibge --forcar          # reprocessa tudo no intervalo
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import boto3
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+BUCKET = "data-ingest"
+PATH_CONTROLE = "prata/controle/backfill/"
+
+# fonte -> prefixo na Bronze e prefixos de saída na Prata
+FONTES = {
+    "json": {
+        "bronze": "bronze/json/",
+        "prata": [
+            "prata/json/transacoes/",
+            "prata/json/pedidos_externos/",
+            "prata/json/pedidos_externos_itens/",
+            "prata/json/produtos_parceiros/",
+            "prata/json/tags_produtos/",
+        ],
+    },
+    "ibge": {
+        "bronze": "bronze/ibge/",
+        "prata": ["prata/ibge_uf/", "prata/ibge_municipios/"],
+    },
+}
+MAX_PROCESSOS = 8
+
+PADRAO_DATA = re.compile(r"data=(\d{8})/")
+
+s3 = boto3.client(
+    "s3",
+    endpoint_url="http://minio:9000",
+    aws_access_key_id="minioadmin",
+    aws_secret_access_key="minioadmin",
+    region_name="us-east-1",
+)
+
+# ============================================================
+# INVENTÁRIO
+# ============================================================
+def listar_por_data(prefix: str) -> dict:
+    """{YYYYMMDD: [objetos]} de todas as partições data= do prefixo (paginado)."""
+    por_data = {}
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET, Prefix=prefix):
+        for o in page.get("Contents", []):
+            m = PADRAO_DATA.search(o["Key"])
+            if m:
+                por_data.setdefault(m.group(1), []).append(o)
+    return por_data
+
+def assinatura(objetos: list) -> str:
+    bruto = "\n".join(sorted(f"{o['Key']}|{o['ETag']}" for o in objetos))
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+def ler_marcadores(fonte: str) -> dict:
+    """{YYYYMMDD: assinatura da Bronze processada}."""
+    marcadores = {}
+    for data, objetos in listar_por_data(f"{PATH_CONTROLE}{fonte}/").items():
+        obj = s3.get_object(Bucket=BUCKET, Key=objetos[0]["Key"])
+        marcadores[data] = json.loads(obj["Body"].read().decode("utf-8")).get("assinatura")
+    return marcadores
+
+def registrar_particao(fonte: str, run_date: str | None):
+    """Marca a partição como processada para a versão atual da Bronze."""
+    if not run_date:
+        return
+    objetos = listar_por_data(f"{FONTES[fonte]['bronze']}data={run_date}/").get(run_date, [])
+    marcador = {
+        "assinatura": assinatura(objetos),
+        "arquivos": len(objetos),
+        "processado_em": datetime.now().isoformat(timespec="seconds"),
+    }
+    s3.put_object(
+        Bucket=BUCKET, Key=f"{PATH_CONTROLE}{fonte}/data={run_date}.json",
+        Body=json.dumps(marcador, indent=2).encode("utf-8"),
+    )
+
+def particoes_pendentes(fonte: str, inicio: str | None = None, fim: str | None = None,
+                        forcar: bool = False) -> list[str]:
+    bronze = listar_por_data(FONTES[fonte]["bronze"])
+    marcadores = ler_marcadores(fonte)
+    saidas = {}
+    for prefixo in FONTES[fonte]["prata"]:
+        for data, objetos in listar_por_data(prefixo).items():
+            saidas.setdefault(data, []).extend(objetos)
+
+    pendentes = []
+    for data, objetos in sorted(bronze.items()):
+        if (inicio and data < inicio) or (fim and data > fim):
+            continue
+        if forcar:
+            pendentes.append(data)
+        elif data in marcadores:
+            if marcadores[data] != assinatura(objetos):
+                pendentes.append(data)
+        elif data not in saidas:
+            pendentes.append(data)
+        elif min(o["LastModified"] for o in saidas[data]) < max(o["LastModified"] for o in objetos):
+            pendentes.append(data)
+    return pendentes
+
+# ============================================================
+# PROCESSAMENTO (um processo por partição)
+# ============================================================
+def processar_particao(fonte: str, run_date: str) -> dict:
+    inicio = time.time()
+    run_time = datetime.now().strftime("%H%M%S")
+    try:
+        if fonte == "json":
+            import new_script_silver_json as silver_json
+            silver_json.process_extrato(run_date, run_time)
+            silver_json.process_pedidos(run_date, run_time)
+            silver_json.process_produtos(run_date, run_time)
+            silver_json.process_tags(run_date, run_time)
+        else:
+            from new_script_silver_ibge_final import process_ibge_uf
+            process_ibge_uf(run_date, run_time)
+        registrar_particao(fonte, run_date)
+        return {"fonte": fonte, "data": run_date, "ok": True, "segundos": time.time() - inicio}
+    except (Exception, SystemExit) as e:
+        return {"fonte": fonte, "data": run_date, "ok": False, "erro": repr(e),
+                "segundos": time.time() - inicio}
+
+def executar(tarefas: list[tuple], processos: int) -> list[dict]:
+    resultados = []
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processos, mp_context=contexto, max_tasks_per_child=1) as pool:
+        futuros = {pool.submit(processar_particao, fonte, data): (fonte, data) for fonte, data in tarefas}
+        for futuro in as_completed(futuros):
+            fonte, data = futuros[futuro]
+            try:
+                r = futuro.result()
+            except Exception as e:  # processo morto (ex.: OOM)
+                r = {"fonte": fonte, "data": data, "ok": False, "erro": repr(e), "segundos": 0.0}
+            resultados.append(r)
+            icone = "✅" if r["ok"] else "❌"
+            print(f"{icone} {fonte} data={data} ({r['segundos']:.1f}s){'' if r['ok'] else ' ' + r['erro']}")
+    return resultados
+
+# ============================================================
+# EXECUÇÃO PRINCIPAL
+# ============================================================
+def main():
+    parser = argparse.ArgumentParser(description="Catch-up/backfill da Prata (JSON e IBGE).")
+    parser.add_argument("fonte", choices=[*FONTES, "todas"])
+    parser.add_argument("--inicio", help="primeira data (YYYYMMDD)")
+    parser.add_argument("--fim", help="última data (YYYYMMDD)")
+    parser.add_argument("--processos", type=int, default=min(MAX_PROCESSOS, os.cpu_count() or 1))
+    parser.add_argument("--forcar", action="store_true", help="reprocessa mesmo partições em dia")
+    args = parser.parse_args()
+
+    fontes = list(FONTES) if args.fonte == "todas" else [args.fonte]
+    tarefas = []
+    for fonte in fontes:
+        datas = particoes_pendentes(fonte, args.inicio, args.fim, args.forcar)
+        print(f"📋 {fonte}: {len(datas)} partição(ões) pendente(s)")
+        tarefas += [(fonte, data) for data in datas]
+    if not tarefas:
+        print("✅ Prata em dia. Nada a processar.")
+        return
+
+    inicio = time.time()
+    resultados = executar(tarefas, args.processos)
+    falhas = [r for r in resultados if not r["ok"]]
+    serial = sum(r["segundos"] for r in resultados)
+    print(f"\n🏁 {len(resultados) - len(falhas)}/{len(resultados)} partições em {time.time() - inicio:.1f}s "
+          f"(soma serial {serial:.1f}s).")
+    if falhas:
+        print("⚠️ Partições com falha continuam pendentes e serão retomadas na próxima execução.")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
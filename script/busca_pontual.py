@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+Busca pontual por chave nas entidades da Prata (produto, cliente, produtos_parceiros).
+
+Escrita (write_parquet_s3 da Prata e gravar_lotes): as entidades são
+gravadas ordenadas pela chave principal, em row groups pequenos, com
+page index e bloom filters nas colunas de busca (CHAVES). Com a tabela
+ordenada, o min/max de cada row group no footer aponta um único row
+group para o id; para colunas fora da ordem (email), o bloom filter do
+row group descarta os que não têm o valor.
+
+Leitura (buscar):
+1. arquivos do snapshot atual: log de snapshots (snapshots_prata.py)
+   para o db_loja, listagem da última partição para os JSONs, com TTL;
+2. footer em cache (leitor_parquet_s3) → row groups candidatos pelo
+   min/max (busca binária na coluna de ordenação);
+3. bloom filter do column chunk lido por range request (em cache) e
+   testado com xxHash64 (split block bloom filter do Parquet);
+4. só o row group que passou é lido, com um filtro pela chave.
+Resultados ficam em um LRU no processo, com chave = valor + arquivos do
+snapshot (um snapshot novo invalida as entradas antigas).
+
+O pyarrow não expõe os offsets do page index na leitura; a menor unidade
+lida aqui é o row group (LINHAS_ROW_GROUP linhas). O page index gravado
+serve aos leitores que o usam (DuckDB no consulta_lake.py, Spark).
+
+Uso:
+    python script/busca_pontual.py produto id 4711
+    python script/busca_pontual.py cliente email ana@exemplo.com
+"""
+
+import bisect
+import re
+import struct
+import sys
+import time
+from collections import OrderedDict
+import boto3
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from leitor_parquet_s3 import ler_intervalo, ler_metadados, ler_row_groups
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+BUCKET = "data-ingest"
+
+# entidade -> prefixo na Prata, coluna de ordenação e colunas de busca
+# (produtos_parceiros não tem sku nos arquivos atuais; a coluna entra se aparecer)
+ENTIDADES = {
+    "produto": {"prefixo": "prata/dbloja/produto/", "ordem": "id", "chaves": ["id"]},
+    "cliente": {"prefixo": "prata/dbloja/cliente/", "ordem": "id", "chaves": ["id", "email"]},
+    "produtos_parceiros": {"prefixo": "prata/json/produtos_parceiros/", "ordem": "id", "chaves": ["id", "sku"]},
+}
+
+LINHAS_ROW_GROUP = 8192
+LINHAS_PAGINA = 1024
+FPP_BLOOM = 0.01
+TAMANHO_LRU = 4096
+TTL_ARQUIVOS = 30        # s em que os arquivos do snapshot atual são reaproveitados
+
+PADRAO_KEY = re.compile(r"^(prata/(?:dbloja|json)/[^/]+/)data=\d{8}/[^/]+\.parquet$")
+
+s3 = boto3.client(
+    "s3",
+    endpoint_url="http://minio:9000",
+    aws_access_key_id="minioadmin",
+    aws_secret_access_key="minioadmin",
+    region_name="us-east-1"
+)
+
+_resultados = OrderedDict()   # (entidade, coluna, valor, arquivos) -> [linhas]
+_blooms = OrderedDict()       # (key, row group, coluna) -> bitset | None
+_arquivos = {}                # entidade -> (instante, arquivos)
+
+# ============================================================
+# ESCRITA
+# ============================================================
+def entidade_da_key(key: str) -> str | None:
+    m = PADRAO_KEY.match(key)
+    if not m:
+        return None
+    return next((nome for nome, e in ENTIDADES.items() if e["prefixo"] == m.group(1)), None)
+
+def ordenar(key: str, table: pa.Table) -> pa.Table:
+    """Ordena a tabela pela chave principal quando a key é de uma entidade."""
+    entidade = entidade_da_key(key)
+    ordem = ENTIDADES[entidade]["ordem"] if entidade else None
+    if ordem is None or ordem not in table.column_names:
+        return table
+    return table.take(pc.sort_indices(table, sort_keys=[(ordem, "ascending")]))
+
+def opcoes_escrita(key: str, schema: pa.Schema, ordenado: bool = True) -> dict:
+    """Opções do Parquet para a key: row groups pequenos, page index e bloom filters
+    nas colunas de busca (vazio para keys que não são de entidades)."""
+    entidade = entidade_da_key(key)
+    if entidade is None:
+        return {}
+    e = ENTIDADES[entidade]
+    opcoes = {
+        "row_group_size": LINHAS_ROW_GROUP,
+        "write_page_index": True,
+        "max_rows_per_page": LINHAS_PAGINA,
+        "bloom_filter_options": {
+            c: {"ndv": LINHAS_ROW_GROUP, "fpp": FPP_BLOOM} for c in e["chaves"] if schema.get_field_index(c) >= 0
+        },
+    }
+    if ordenado and schema.get_field_index(e["ordem"]) >= 0:
+        opcoes["sorting_columns"] = [pq.SortingColumn(schema.get_field_index(e["ordem"]))]
+    return opcoes
+
+# ============================================================
+# BLOOM FILTER (split block, xxHash64)
+# ============================================================
+_P1, _P2, _P3, _P4, _P5 = (11400714785074694791, 14029467366897019727, 1609587929392839161,
+                           9650029242287828579, 2870177450012600261)
+_M64 = 2**64 - 1
+_SALT = (0x47B6137B, 0x44974D91, 0x8824AD5B, 0xA2B7289D, 0x705495C7, 0x2DF1424B, 0x9EFC4947, 0x5C6BFB31)
+
+def _rotl(x: int, r: int) -> int:
+    return ((x << r) | (x >> (64 - r))) & _M64
+
+def _round(acc: int, valor: int) -> int:
+    return (_rotl((acc + valor * _P2) & _M64, 31) * _P1) & _M64
+
+def xxh64(dados: bytes, seed: int = 0) -> int:
+    """xxHash64 (o hash dos bloom filters do Parquet)."""
+    n, p = len(dados), 0
+    if n >= 32:
+        v = [(seed + _P1 + _P2) & _M64, (seed + _P2) & _M64, seed, (seed - _P1) & _M64]
+        while p <= n - 32:
+            for i in range(4):
+                v[i] = _round(v[i], struct.unpack_from("<Q", dados, p + 8 * i)[0])
+            p += 32
+        h = (_rotl(v[0], 1) + _rotl(v[1], 7) + _rotl(v[2], 12) + _rotl(v[3], 18)) & _M64
+        for x in v:
+            h = ((h ^ _round(0, x)) * _P1 + _P4) & _M64
+    else:
+        h = (seed + _P5) & _M64
+    h = (h + n) & _M64
+    while p + 8 <= n:
+        h ^= _round(0, struct.unpack_from("<Q", dados, p)[0])
+        h = (_rotl(h, 27) * _P1 + _P4) & _M64
+        p += 8
+    if p + 4 <= n:
+        h ^= (struct.unpack_from("<I", dados, p)[0] * _P1) & _M64
+        h = (_rotl(h, 23) * _P2 + _P3) & _M64
+        p += 4
+    while p < n:
+        h ^= (dados[p] * _P5) & _M64
+        h = (_rotl(h, 11) * _P1) & _M64
+        p += 1
+    h ^= h >> 33
+    h = (h * _P2) & _M64
+    h ^= h >> 29
+    h = (h * _P3) & _M64
+    return h ^ (h >> 32)
+
+def _bytes_do_valor(valor, tipo_fisico: str) -> bytes:
+    """Valor no encoding PLAIN do Parquet (sem prefixo de tamanho), que é o que entra no hash."""
+    if tipo_fisico == "INT64":
+        return struct.pack("<q", int(valor))
+    if tipo_fisico == "INT32":
+        return struct.pack("<i", int(valor))
+    if tipo_fisico == "DOUBLE":
+        return struct.pack("<d", float(valor))
+    if tipo_fisico == "FLOAT":
+        return struct.pack("<f", float(valor))
+    return str(valor).encode("utf-8")
+
+def _bitset(bloco: bytes) -> bytes:
+    """Bitset do bloom filter: o cabeçalho Thrift começa com numBytes (campo 1, i32 zigzag)."""
+    if not bloco or bloco[0] != 0x15:
+        raise ValueError("cabeçalho de bloom filter inesperado")
+    num_bytes, deslocamento, p = 0, 0, 1
+    while True:
+        b = bloco[p]
+        num_bytes |= (b & 0x7F) << deslocamento
+        p += 1
+        if not b & 0x80:
+            break
+        deslocamento += 7
+    num_bytes = (num_bytes >> 1) ^ -(num_bytes & 1)
+    return bloco[-num_bytes:]
+
+def bloom_pode_conter(bitset: bytes, h: int) -> bool:
+    blocos = len(bitset) // 32
+    bloco = ((h >> 32) * blocos) >> 32
+    chave = h & 0xFFFFFFFF
+    for i, salt in enumerate(_SALT):
+        bit = ((chave * salt) & 0xFFFFFFFF) >> 27
+        palavra = struct.unpack_from("<I", bitset, bloco * 32 + 4 * i)[0]
+        if not palavra & (1 << bit):
+            return False
+    return True
+
+def _bloom(key: str, rg: int, coluna_md) -> bytes | None:
+    chave = (key, rg, coluna_md.path_in_schema)
+    if chave in _blooms:
+        _blooms.move_to_end(chave)
+        return _blooms[chave]
+    bitset = None
+    if coluna_md.bloom_filter_offset and coluna_md.bloom_filter_length:
+        try:
+            bitset = _bitset(ler_intervalo(key, coluna_md.bloom_filter_offset, coluna_md.bloom_filter_length,
+                                           bucket=BUCKET))
+        except (ValueError, IndexError):
+            bitset = None
+    _blooms[chave] = bitset
+    if len(_blooms) > TAMANHO_LRU:
+        _blooms.popitem(last=False)
+    return bitset
+
+# ============================================================
+# LEITURA
+# ============================================================
+def arquivos_atuais(entidade: str) -> tuple[str, ...]:
+    """Arquivos do snapshot atual da entidade (em cache por TTL_ARQUIVOS)."""
+    em_cache = _arquivos.get(entidade)
+    if em_cache and time.time() - em_cache[0] < TTL_ARQUIVOS:
+        return em_cache[1]
+    prefixo = ENTIDADES[entidade]["prefixo"]
+    arquivos = ()
+    if prefixo.startswith("prata/dbloja/"):
+        from snapshots_prata import resolver
+        try:
+            arquivos = tuple(resolver(entidade)["arquivos"])
+        except LookupError:
+            arquivos = ()
+    if not arquivos:
+        keys = []
+        for page in s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET, Prefix=f"{prefixo}data="):
+            keys.extend(o["Key"] for o in page.get("Contents", []) if o["Key"].endswith(".parquet"))
+        if keys:
+            pasta, nome = max(keys).rsplit("/", 1)
+            arquivos = tuple(sorted(k for k in keys if k.rsplit("/", 1)[0] == pasta)) if nome.startswith("part-") \
+                else (max(keys),)
+    _arquivos[entidade] = (time.time(), arquivos)
+    return arquivos
+
+def _normalizar(valor, tipo: pa.DataType):
+    if pa.types.is_integer(tipo):
+        return int(valor)
+    if pa.types.is_floating(tipo):
+        return float(valor)
+    return str(valor)
+
+def row_groups_candidatos(md: pq.FileMetaData, indice: int, valor, ordenado: bool) -> list[int]:
+    """Row groups cujo min/max pode conter o valor (busca binária quando a coluna está ordenada)."""
+    stats = [md.row_group(rg).column(indice).statistics for rg in range(md.num_row_groups)]
+    if ordenado and all(s is not None and s.has_min_max for s in stats):
+        inicio = bisect.bisect_left(stats, valor, key=lambda s: s.max)
+        candidatos = []
+        for rg in range(inicio, len(stats)):
+            if stats[rg].min > valor:
+                break
+            candidatos.append(rg)
+        return candidatos
+    return [rg for rg, s in enumerate(stats)
+            if s is None or not s.has_min_max or s.min <= valor <= s.max]
+
+def buscar_no_arquivo(key: str, coluna: str, valor, ordem: str | None = None) -> pa.Table | None:
+    md = ler_metadados(key, bucket=BUCKET)
+    schema = md.schema.to_arrow_schema()
+    if schema.get_field_index(coluna) < 0:
+        return None
+    valor = _normalizar(valor, schema.field(coluna).type)
+    indice = next(i for i in range(md.num_columns) if md.schema.column(i).path == coluna)
+    ordenado = coluna == ordem and any(
+        s.column_index == indice for s in (md.row_group(0).sorting_columns if md.num_row_groups else ()))
+    candidatos = row_groups_candidatos(md, indice, valor, ordenado)
+
+    h = None
+    selecionados = []
+    for rg in candidatos:
+        coluna_md = md.row_group(rg).column(indice)
+        bitset = _bloom(key, rg, coluna_md)
+        if bitset is not None:
+            h = h if h is not None else xxh64(_bytes_do_valor(valor, coluna_md.physical_type))
+            if not bloom_pode_conter(bitset, h):
+                continue
+        selecionados.append(rg)
+    if not selecionados:
+        return None
+    table = ler_row_groups(key, selecionados, bucket=BUCKET)
+    return table.filter(pc.equal(table[coluna], pa.scalar(valor, table.schema.field(coluna).type)))
+
+def buscar(entidade: str, coluna: str, valor) -> list[dict]:
+    """Linhas da entidade com coluna == valor no snapshot atual (LRU por valor e snapshot)."""
+    arquivos = arquivos_atuais(entidade)
+    chave = (entidade, coluna, str(valor), arquivos)
+    if chave in _resultados:
+        _resultados.move_to_end(chave)
+        return _resultados[chave]
+    ordem = ENTIDADES[entidade]["ordem"]
+    linhas = []
+    for key in arquivos:
+        encontrados = buscar_no_arquivo(key, coluna, valor, ordem)
+        if encontrados is not None:
+            linhas.extend(encontrados.to_pylist())
+    _resultados[chave] = linhas
+    if len(_resultados) > TAMANHO_LRU:
+        _resultados.popitem(last=False)
+    return linhas
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in ENTIDADES:
+        print(f"Uso: python script/busca_pontual.py <{'|'.join(ENTIDADES)}> <coluna> <valor>")
+        raise SystemExit(1)
+    entidade, coluna, valor = sys.argv[1:]
+    for rodada in ("fria", "quente (LRU)"):
+        inicio = time.perf_counter()
+        linhas = buscar(entidade, coluna, valor)
+        print(f"⏱️ {rodada}: {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    if not linhas:
+        print(f"⚠️ Nenhuma linha de {entidade} com {coluna} = {valor}.")
+    for linha in linhas:
+        print(linha)
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Cache local em disco (read-through, LRU) para objetos do MinIO.
+
+Numa mesma execução da pipeline os mesmos objetos são baixados várias
+vezes (Bronze lida pela Prata, snapshot da Prata relido no merge seguinte,
+JSONs lidos por cada process_*). Os objetos são guardados em disco com a
+chave (bucket, key, ETag): um objeto regravado ganha outro ETag e nunca
+é servido desatualizado.
+
+- limite de tamanho (S3_CACHE_MAX_MB) com remoção dos menos usados (LRU
+  pelo mtime, atualizado a cada acerto);
+- seguro entre processos: gravação em arquivo temporário + os.replace e
+  limpeza sob flock;
+- métricas de acertos/faltas por processo (metricas()) e acumuladas em
+  <cache>/metricas.json ao fim de cada processo.
+
+Uso:
+    from cache_s3 import obter, caminho_local
+    dados = obter(s3, "data-ingest", key)            # bytes
+    path = caminho_local(s3, "data-ingest", key)     # arquivo local (ex.: pyarrow)
+
+    python script/cache_s3.py            # mostra métricas e ocupação
+    python script/cache_s3.py limpar
+"""
+
+import atexit
+import fcntl
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+CACHE_DIR = os.environ.get("S3_CACHE_DIR", os.path.join(tempfile.gettempdir(), "cache_s3"))
+LIMITE_BYTES = int(os.environ.get("S3_CACHE_MAX_MB", "2048")) * 1024 * 1024
+ATIVO = os.environ.get("S3_CACHE", "1") != "0"
+
+OBJETOS_DIR = os.path.join(CACHE_DIR, "objetos")
+LOCK_PATH = os.path.join(CACHE_DIR, ".lock")
+METRICAS_PATH = os.path.join(CACHE_DIR, "metricas.json")
+
+_metricas = {"acertos": 0, "faltas": 0, "bytes_servidos": 0, "bytes_baixados": 0, "removidos": 0}
+
+# ============================================================
+# SUPORTE
+# ============================================================
+@contextmanager
+def _trava():
+    """Lock exclusivo entre processos (flock) para limpeza e métricas."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(LOCK_PATH, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _path(bucket: str, key: str, etag: str) -> str:
+    nome = hashlib.sha256(f"{bucket}/{key}/{etag}".encode("utf-8")).hexdigest()
+    return os.path.join(OBJETOS_DIR, nome[:2], nome)
+
+def _etag(s3, bucket: str, key: str) -> str:
+    return s3.head_object(Bucket=bucket, Key=key)["ETag"].strip('"')
+
+def _limpar_excedente():
+    """Remove os arquivos menos usados até o cache caber no limite."""
+    with _trava():
+        arquivos = []
+        for raiz, _, nomes in os.walk(OBJETOS_DIR):
+            for nome in nomes:
+                if nome.endswith(".tmp"):
+                    continue
+                path = os.path.join(raiz, nome)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                arquivos.append((st.st_mtime, st.st_size, path))
+        total = sum(a[1] for a in arquivos)
+        for _, tamanho, path in sorted(arquivos):
+            if total <= LIMITE_BYTES:
+                break
+            try:
+                os.remove(path)  # leitores com o arquivo já aberto continuam lendo
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+            _metricas["removidos"] += 1
+
+# ============================================================
+# API
+# ============================================================
+def caminho_local(s3, bucket: str, key: str, etag: str | None = None) -> str:
+    """Caminho local do objeto, baixando-o na primeira vez (ETag via HEAD se não informado)."""
+    etag = (etag or _etag(s3, bucket, key)).strip('"')
+    path = _path(bucket, key, etag)
+    try:
+        tamanho = os.path.getsize(path)
+        os.utime(path)  # marca o uso para o LRU
+        _metricas["acertos"] += 1
+        _metricas["bytes_servidos"] += tamanho
+        return path
+    except FileNotFoundError:
+        pass
+
+    _metricas["faltas"] += 1
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            s3.download_fileobj(bucket, key, f)
+        os.replace(tmp, path)  # atômico: outro processo vê o arquivo completo ou nada
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    tamanho = os.path.getsize(path)
+    _metricas["bytes_baixados"] += tamanho
+    # a varredura do diretório é cara: roda a cada 20 faltas ou após um objeto grande
+    if tamanho > LIMITE_BYTES // 10 or _metricas["faltas"] % 20 == 0:
+        _limpar_excedente()
+    return path
+
+def obter(s3, bucket: str, key: str, etag: str | None = None) -> bytes:
+    """Conteúdo do objeto, servido do cache quando possível."""
+    if not ATIVO:
+        return s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+    try:
+        with open(caminho_local(s3, bucket, key, etag), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        # removido por outro processo entre a consulta e a abertura: baixa de novo
+        with open(caminho_local(s3, bucket, key, etag), "rb") as f:
+            return f.read()
+
+def em_cache(s3, bucket: str, key: str, etag: str | None = None) -> str | None:
+    """Caminho local se o objeto já estiver no cache (sem baixar)."""
+    if not ATIVO:
+        return None
+    etag = (etag or _etag(s3, bucket, key)).strip('"')
+    if os.path.exists(_path(bucket, key, etag)):
+        return caminho_local(s3, bucket, key, etag)
+    return None
+
+# ============================================================
+# MÉTRICAS
+# ============================================================
+def metricas() -> dict:
+    """Métricas do processo atual (com taxa de acerto)."""
+    total = _metricas["acertos"] + _metricas["faltas"]
+    return {**_metricas, "taxa_acerto": round(_metricas["acertos"] / total, 3) if total else None}
+
+def _registrar_metricas():
+    """Soma as métricas do processo ao arquivo compartilhado."""
+    if not (_metricas["acertos"] or _metricas["faltas"]):
+        return
+    with _trava():
+        try:
+            with open(METRICAS_PATH, "r", encoding="utf-8") as f:
+                acumulado = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            acumulado = {}
+        for chave, valor in _metricas.items():
+            acumulado[chave] = acumulado.get(chave, 0) + valor
+        with open(METRICAS_PATH, "w", encoding="utf-8") as f:
+            json.dump(acumulado, f, indent=2)
+
+atexit.register(_registrar_metricas)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "limpar":
+        LIMITE_BYTES = 0
+        _limpar_excedente()
+        print(f"🧹 Cache esvaziado: {CACHE_DIR}")
+        raise SystemExit(0)
+
+    ocupado = sum(
+        os.path.getsize(os.path.join(raiz, n)) for raiz, _, nomes in os.walk(OBJETOS_DIR) for n in nomes
+    ) if os.path.isdir(OBJETOS_DIR) else 0
+    print(f"📦 Cache: {CACHE_DIR} ({ocupado / 2**20:,.1f} MB de {LIMITE_BYTES / 2**20:,.0f} MB)")
+    try:
+        with open(METRICAS_PATH, "r", encoding="utf-8") as f:
+            acumulado = json.load(f)
+        total = acumulado.get("acertos", 0) + acumulado.get("faltas", 0)
+        print(f"📈 Acertos: {acumulado.get('acertos', 0)} | Faltas: {acumulado.get('faltas', 0)} | "
+              f"Taxa: {acumulado.get('acertos', 0) / total:.1%}" if total else "📈 Sem métricas registradas.")
+    except FileNotFoundError:
+        print("📈 Sem métricas registradas.")
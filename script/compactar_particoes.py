@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+Compactação de arquivos pequenos nas partições data=YYYYMMDD do lake.
+
+Cada execução da pipeline grava novos {tabela}_{YYYYMMDD}_{HHMMSS}.parquet;
+com o tempo as partições acumulam centenas de objetos pequenos. Este job
+junta os arquivos pequenos de cada partição em arquivos do tamanho alvo,
+mantendo a ordem original das linhas e o schema (só une arquivos de schema
+idêntico).
+
+Regras por raiz:
+- bronze/dbloja/: agrupa por tabela; o arquivo mais recente de cada tabela
+  fica de fora, preservando a leitura do "último delta" (produto). Partes
+  de extrações em faixas (pasta com _manifesto.json, extracao_faixas.py)
+  nunca são tocadas: o manifesto delas continua apontando para as partes.
+- prata/dbloja/: só une os part-*.parquet da engine Spark, dentro de cada
+  dataset {tabela}_D_T.parquet/ (um snapshot dividido em partes) ou soltos
+  na partição (layout antigo); snapshots nunca são misturados entre si.
+
+Troca atômica: os arquivos compactados são gravados primeiro e só passam a
+ser lidos quando o manifesto _compactacao.json da partição é atualizado
+(um único PUT). A partir daí os arquivos substituídos são ignorados pelo
+list_parquets e apagados em uma execução posterior, após a carência, para
+não quebrar leitores que já os tinham listado.
+
+Uso:
+    python script/compactar_particoes.py            # todas as raízes
+    python script/compactar_particoes.py bronze/dbloja/
+"""
+
+import json
+import re
+import sys
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from leitor_parquet_s3 import ler_tabela
+from new_script_silver import s3, BUCKET, MANIFESTO_COMPACTACAO, MANIFESTO_FAIXAS, aplicar_compactacao
+from snapshots_prata import substituir_arquivos
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+RAIZES = {
+    "bronze/dbloja/": "tabela",
+    "prata/dbloja/": "partes",
+}
+MB = 1024 * 1024
+TAMANHO_ALVO = 128 * MB        # tamanho desejado de cada arquivo compactado
+TAMANHO_PEQUENO = 32 * MB      # arquivos acima disso não são tocados
+MIN_ARQUIVOS = 2               # mínimo de arquivos pequenos para compactar um grupo
+IDADE_MINIMA = 3600            # s: não mexe em grupos com escrita recente
+CARENCIA_EXCLUSAO = 3600       # s: espera antes de apagar arquivos substituídos
+LIMITE_MB_S = 20               # throttle de leitura+escrita para não disputar com a pipeline
+
+PADRAO_PARTICAO = re.compile(r"^(.*?data=\d{8}/)(.+)$")
+PADRAO_TABELA = re.compile(r"^(.+?)_\d{8}_\d{6}")
+
+# ============================================================
+# LISTAGEM
+# ============================================================
+def listar_particoes(raiz: str) -> dict:
+    """Agrupa os objetos da raiz por partição data=:
+    {particao: {"arquivos": [...], "manifesto": key, "faixas": {pastas com _manifesto.json}}}."""
+    particoes = {}
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET, Prefix=raiz):
+        for o in page.get("Contents", []):
+            m = PADRAO_PARTICAO.match(o["Key"])
+            if not m:
+                continue
+            p = particoes.setdefault(m.group(1), {"arquivos": [], "manifesto": None, "faixas": set()})
+            if o["Key"].endswith(".parquet"):
+                p["arquivos"].append(o)
+            elif o["Key"].endswith(MANIFESTO_COMPACTACAO):
+                p["manifesto"] = o["Key"]
+            elif o["Key"].endswith(f"/{MANIFESTO_FAIXAS}"):
+                p["faixas"].add(o["Key"].rsplit("/", 1)[0])
+    return particoes
+
+def ler_manifesto(particao: str) -> dict:
+    try:
+        obj = s3.get_object(Bucket=BUCKET, Key=f"{particao}{MANIFESTO_COMPACTACAO}")
+        return json.loads(obj["Body"].read().decode("utf-8"))
+    except s3.exceptions.NoSuchKey:
+        return {"arquivos": [], "substitui": []}
+
+def grupos_da_particao(modo: str, particao: str, objetos: list) -> dict:
+    """{nome_grupo: [objetos]} com os candidatos à compactação, em ordem de key."""
+    grupos = {}
+    for o in sorted(objetos, key=lambda o: o["Key"]):
+        relativo = o["Key"][len(particao):]
+        if modo == "tabela":
+            m = PADRAO_TABELA.match(relativo.split("/")[0])
+            if m:
+                grupos.setdefault(m.group(1), []).append(o)
+        elif modo == "partes" and relativo.rsplit("/", 1)[-1].startswith("part-"):
+            # grupo = pasta do dataset Spark ("" para part-files soltos na partição)
+            grupos.setdefault(relativo.rsplit("/", 1)[0] if "/" in relativo else "", []).append(o)
+
+    agora = datetime.now(timezone.utc)
+    candidatos = {}
+    for nome, objs in grupos.items():
+        if any((agora - o["LastModified"]).total_seconds() < IDADE_MINIMA for o in objs):
+            continue
+        if modo == "tabela":
+            objs = objs[:-1]  # o mais recente continua sendo o "último arquivo" da tabela
+        pequenos = [o for o in objs if o["Size"] < TAMANHO_PEQUENO]
+        if len(pequenos) >= MIN_ARQUIVOS:
+            candidatos[nome] = pequenos
+    return candidatos
+
+# ============================================================
+# COMPACTAÇÃO
+# ============================================================
+def nome_saida(modo: str, particao: str, grupo: str, n: int, marca: str) -> str:
+    if modo == "partes":
+        pasta = f"{grupo}/" if grupo else ""
+        return f"{particao}{pasta}part-{n:05d}-compactado-{marca}.parquet"
+    data = re.search(r"data=(\d{8})/", particao).group(1)
+    # hora 000000: ordena antes dos arquivos originais do mesmo dia
+    return f"{particao}{grupo}_{data}_000000_compactado_{marca}_{n:03d}.parquet"
+
+def escrever(tabelas: list, key: str) -> int:
+    table = pa.concat_tables(tabelas)
+    buf = BytesIO()
+    pq.write_table(table, buf, row_group_size=128 * 1024)
+    s3.put_object(Bucket=BUCKET, Key=key, Body=buf.getvalue())
+    return buf.tell()
+
+def compactar_grupo(modo: str, particao: str, grupo: str, objetos: list) -> tuple[list, list, int]:
+    """Une os arquivos do grupo em lotes do tamanho alvo. Retorna (novos, substituídos, bytes)."""
+    marca = datetime.now().strftime("%Y%m%d%H%M%S")
+    novos, substituidos, volume = [], [], 0
+    lote, lote_keys, lote_bytes, schema_lote = [], [], 0, None
+
+    def fechar_lote():
+        nonlocal lote, lote_keys, lote_bytes, schema_lote, volume
+        if len(lote_keys) >= MIN_ARQUIVOS:
+            key = nome_saida(modo, particao, grupo, len(novos), marca)
+            volume += escrever(lote, key)
+            novos.append(key)
+            substituidos.extend(lote_keys)
+        lote, lote_keys, lote_bytes, schema_lote = [], [], 0, None
+
+    for o in objetos:
+        table = ler_tabela(o["Key"], bucket=BUCKET)
+        volume += o["Size"]
+        schema = table.schema.remove_metadata()
+        if schema_lote is not None and (schema != schema_lote or lote_bytes + o["Size"] > TAMANHO_ALVO):
+            fechar_lote()
+        lote.append(table.replace_schema_metadata(None))
+        lote_keys.append(o["Key"])
+        lote_bytes += o["Size"]
+        schema_lote = schema
+    fechar_lote()
+    return novos, substituidos, volume
+
+def confirmar(particao: str, novos: list, substituidos: list):
+    """Ponto de commit: um único PUT do manifesto troca o conteúdo visível da partição."""
+    manifesto = ler_manifesto(particao)
+    manifesto["arquivos"] = sorted(set(manifesto.get("arquivos", [])) - set(substituidos) | set(novos))
+    manifesto["substitui"] = sorted(set(manifesto.get("substitui", [])) | set(substituidos))
+    manifesto["atualizado_em"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    s3.put_object(
+        Bucket=BUCKET, Key=f"{particao}{MANIFESTO_COMPACTACAO}",
+        Body=json.dumps(manifesto, indent=2).encode("utf-8"),
+    )
+
+def limpar_substituidos(particao: str, manifesto_key: str | None, objetos: list):
+    """Apaga arquivos substituídos há mais tempo que a carência."""
+    if not manifesto_key:
+        return
+    manifesto = ler_manifesto(particao)
+    atualizado = datetime.fromisoformat(manifesto.get("atualizado_em", "1970-01-01T00:00:00+00:00"))
+    if (datetime.now(timezone.utc) - atualizado).total_seconds() < CARENCIA_EXCLUSAO:
+        return
+    existentes = {o["Key"] for o in objetos}
+    apagar = [k for k in manifesto.get("substitui", []) if k in existentes]
+    for i in range(0, len(apagar), 1000):
+        s3.delete_objects(Bucket=BUCKET, Delete={"Objects": [{"Key": k} for k in apagar[i:i + 1000]]})
+    if apagar:
+        # já não aparecem na listagem: saem do manifesto para mantê-lo pequeno
+        manifesto["substitui"] = [k for k in manifesto["substitui"] if k not in apagar]
+        s3.put_object(
+            Bucket=BUCKET, Key=f"{particao}{MANIFESTO_COMPACTACAO}",
+            Body=json.dumps(manifesto, indent=2).encode("utf-8"),
+        )
+        print(f"🧹 {len(apagar)} arquivos substituídos apagados em {particao}")
+
+# ============================================================
+# EXECUÇÃO PRINCIPAL
+# ============================================================
+def compactar_raiz(raiz: str, modo: str):
+    print(f"\n📂 Raiz: {raiz}")
+    for particao, info in sorted(listar_particoes(raiz).items()):
+        limpar_substituidos(particao, info["manifesto"], info["arquivos"])
+
+        # considera só o que os leitores enxergam hoje
+        visiveis = set(aplicar_compactacao(
+            [o["Key"] for o in info["arquivos"]],
+            [info["manifesto"]] if info["manifesto"] else [],
+        ))
+        # partes de extrações em faixas ficam como estão (o _manifesto.json as referencia)
+        objetos = [o for o in info["arquivos"]
+                   if o["Key"] in visiveis and o["Key"].rsplit("/", 1)[0] not in info["faixas"]]
+
+        for grupo, candidatos in grupos_da_particao(modo, particao, objetos).items():
+            inicio = time.time()
+            novos, substituidos, volume = compactar_grupo(modo, particao, grupo, candidatos)
+            if novos:
+                confirmar(particao, novos, substituidos)
+                if modo == "partes":
+                    # o log de snapshots da Prata passa a apontar para os arquivos compactados
+                    substituir_arquivos(particao[len(raiz):].split("/")[0], substituidos, novos)
+                print(f"✅ {particao} [{grupo}]: {len(substituidos)} arquivos → {len(novos)}")
+            # throttle: mantém o volume médio abaixo de LIMITE_MB_S
+            espera = volume / (LIMITE_MB_S * MB) - (time.time() - inicio)
+            if espera > 0:
+                time.sleep(espera)
+
+def main():
+    raizes = sys.argv[1:] or list(RAIZES)
+    print("=== COMPACTAÇÃO DE PARTIÇÕES ===")
+    for raiz in raizes:
+        if raiz not in RAIZES:
+            print(f"❌ Raiz não suportada: {raiz}")
+            raise SystemExit(1)
+        compactar_raiz(raiz, RAIZES[raiz])
+    print("\n🏁 Compactação concluída.")
+
+
+if __name__ == "__main__":
+    main()
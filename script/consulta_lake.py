@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+Camada de consulta SQL sobre o Data Lake (Prata e Ouro) com DuckDB embarcado.
+
+Cada tabela do lake vira uma view do DuckDB lida direto do MinIO (httpfs):
+- poda de partições Hive em data=YYYYMMDD (WHERE data = '20251101');
+- projeção de colunas e uso das estatísticas dos row groups do Parquet;
+- leituras por HTTP range (só os trechos necessários de cada arquivo).
+
+Tabelas db_loja também ganham a view <tabela>_atual, restrita aos arquivos
+do snapshot atual no log de snapshots da Prata (snapshots_prata.py; sem
+log, latest_silver_snapshot_keys), e não a todos os arquivos da partição
+data= mais recente, onde várias execuções do dia deixam snapshots
+completos. Resultados ficam em cache local, com chave = consulta + versão
+do manifesto (chaves/ETags) dos arquivos envolvidos. O manifesto de cada
+tabela também é gravado em CACHE_DIR/manifestos/ com o instante da
+listagem: dentro do TTL, consultas repetidas (inclusive em execuções
+seguidas da CLI) não acessam o S3.
+
+Uso (API):
+    from consulta_lake import consultar
+    df = consultar("SELECT dia, SUM(receita) FROM vendas_dia_produto GROUP BY dia").to_pandas()
+
+Uso (CLI):
+    python script/consulta_lake.py "SELECT * FROM produto_atual WHERE preco > 100"
+    python script/consulta_lake.py --tabelas
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import time
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from new_script_silver import s3, BUCKET, MANIFESTO_COMPACTACAO, aplicar_compactacao, latest_silver_snapshot_keys
+from snapshots_prata import resolver
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+S3_ENDPOINT = "minio:9000"
+S3_ACCESS_KEY = "minioadmin"
+S3_SECRET_KEY = "minioadmin"
+
+CACHE_DIR = os.environ.get("CONSULTA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "consulta_lake"))
+MANIFESTO_TTL = 60  # segundos em que a listagem de uma tabela é reaproveitada
+
+# Catálogo: nome da view -> prefixo no bucket
+TABELAS = {
+    # Prata db_loja (snapshots por data)
+    "categorias_produto": "prata/dbloja/categorias_produto/",
+    "cliente": "prata/dbloja/cliente/",
+    "pedido_cabecalho": "prata/dbloja/pedido_cabecalho/",
+    "pedido_itens": "prata/dbloja/pedido_itens/",
+    "produto": "prata/dbloja/produto/",
+    # Prata enriquecida (data = dia do pedido)
+    "fato_pedido_itens": "prata/dbloja/fato_pedido_itens/",
+    # Prata JSON
+    "transacoes": "prata/json/transacoes/",
+    "pedidos_externos": "prata/json/pedidos_externos/",
+    "pedidos_externos_itens": "prata/json/pedidos_externos_itens/",
+    "produtos_parceiros": "prata/json/produtos_parceiros/",
+    "tags_produtos": "prata/json/tags_produtos/",
+    # Prata API
+    "ibge_uf": "prata/ibge_uf/",
+    "ibge_municipios": "prata/ibge_municipios/",
+    # Ouro
+    "vendas_dia_produto": "ouro/vendas_dia_produto/",
+    "vendas_dia_cliente": "ouro/vendas_dia_cliente/",
+}
+TABELAS_SNAPSHOT = ["categorias_produto", "cliente", "pedido_cabecalho", "pedido_itens", "produto"]
+
+_manifestos = {}  # prefixo -> (instante da listagem, [(key, etag, tamanho)]), espelho de CACHE_DIR/manifestos/
+
+# ============================================================
+# MANIFESTO (versão dos arquivos de cada tabela)
+# ============================================================
+def path_manifesto(prefixo: str) -> str:
+    nome = hashlib.sha256(prefixo.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, "manifestos", f"{nome}.json")
+
+def ler_manifesto_local(prefixo: str):
+    """(instante da listagem, arquivos) gravados por uma execução anterior, ou None."""
+    try:
+        with open(path_manifesto(prefixo), "r", encoding="utf-8") as f:
+            dados = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if dados.get("prefixo") != prefixo:
+        return None
+    return dados["listado_em"], [tuple(a) for a in dados["arquivos"]]
+
+def gravar_manifesto_local(prefixo: str, listado_em: float, arquivos: list):
+    path = path_manifesto(prefixo)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"prefixo": prefixo, "listado_em": listado_em, "arquivos": arquivos}, f)
+    os.replace(tmp, path)
+
+def manifesto(prefixo: str) -> list:
+    """Lista (key, etag, tamanho) dos .parquet do prefixo, com TTL em memória e em CACHE_DIR."""
+    agora = time.time()
+    em_cache = _manifestos.get(prefixo) or ler_manifesto_local(prefixo)
+    if em_cache and 0 <= agora - em_cache[0] < MANIFESTO_TTL:
+        _manifestos[prefixo] = em_cache
+        return em_cache[1]
+    arquivos, manifestos = [], []
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET, Prefix=prefixo):
+        for o in page.get("Contents", []):
+            if o["Key"].endswith(".parquet"):
+                arquivos.append((o["Key"], o["ETag"], o["Size"]))
+            elif o["Key"].endswith(MANIFESTO_COMPACTACAO):
+                manifestos.append(o["Key"])
+    visiveis = set(aplicar_compactacao([k for k, _, _ in arquivos], manifestos))
+    arquivos = sorted(a for a in arquivos if a[0] in visiveis)
+    _manifestos[prefixo] = (agora, arquivos)
+    gravar_manifesto_local(prefixo, agora, arquivos)
+    return arquivos
+
+def tabela_base(nome: str) -> str:
+    return nome[:-len("_atual")] if nome.endswith("_atual") else nome
+
+def tabelas_da_consulta(sql: str) -> list[str]:
+    """Views do catálogo referenciadas na consulta."""
+    try:
+        nomes = duckdb.get_table_names(sql)
+    except Exception:
+        nomes = set(TABELAS) | {f"{t}_atual" for t in TABELAS_SNAPSHOT}
+    return sorted(n for n in nomes if tabela_base(n) in TABELAS)
+
+def snapshot_atual(tabela: str) -> list[str]:
+    """Arquivos do snapshot atual da tabela: do log de snapshots ou, sem log, da listagem."""
+    try:
+        return resolver(tabela)["arquivos"]
+    except LookupError:
+        return latest_silver_snapshot_keys(tabela)
+
+def arquivos_da_view(nome: str) -> list[str]:
+    """Keys lidas pela view (a _atual fica só com os arquivos do snapshot atual)."""
+    if nome.endswith("_atual"):
+        return snapshot_atual(tabela_base(nome))
+    return [k for k, _, _ in manifesto(TABELAS[nome])]
+
+# ============================================================
+# DUCKDB
+# ============================================================
+def conectar() -> duckdb.DuckDBPyConnection:
+    con = duckdb.connect()
+    con.execute("INSTALL httpfs")
+    con.execute("LOAD httpfs")
+    con.execute(f"SET s3_endpoint='{S3_ENDPOINT}'")
+    con.execute(f"SET s3_access_key_id='{S3_ACCESS_KEY}'")
+    con.execute(f"SET s3_secret_access_key='{S3_SECRET_KEY}'")
+    con.execute("SET s3_region='us-east-1'")
+    con.execute("SET s3_url_style='path'")
+    con.execute("SET s3_use_ssl=false")
+    con.execute("SET enable_object_cache=true")  # reaproveita footers Parquet entre consultas
+    return con
+
+def registrar_view(con: duckdb.DuckDBPyConnection, nome: str, keys: list[str]) -> bool:
+    if not keys:
+        print(f"⚠️ Tabela '{nome}' sem arquivos no lake.")
+        return False
+    arquivos = ", ".join(f"'s3://{BUCKET}/{k}'" for k in keys)
+    con.execute(f"""
+        CREATE OR REPLACE VIEW {nome} AS
+        SELECT * FROM read_parquet([{arquivos}],
+            hive_partitioning = true, union_by_name = true, hive_types = {{'data': VARCHAR}})
+    """)
+    return True
+
+# ============================================================
+# API
+# ============================================================
+def chave_cache(sql: str, arquivos: dict) -> str:
+    """Consulta + versão dos arquivos lidos: chaves/ETags do manifesto ou, nas views
+    _atual, as keys do snapshot (imutáveis, nome com o instante da gravação)."""
+    versao = {t: manifesto(TABELAS[t]) if not t.endswith("_atual") else keys for t, keys in arquivos.items()}
+    bruto = json.dumps({"sql": " ".join(sql.split()), "manifesto": versao}, sort_keys=True)
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+def consultar(sql: str, usar_cache: bool = True) -> pa.Table:
+    """Executa SQL sobre o lake e retorna uma tabela Arrow."""
+    arquivos = {t: arquivos_da_view(t) for t in tabelas_da_consulta(sql)}
+    path_cache = os.path.join(CACHE_DIR, f"{chave_cache(sql, arquivos)}.parquet")
+    if usar_cache and os.path.exists(path_cache):
+        print("♻️ Resultado servido do cache.")
+        return pq.read_table(path_cache)
+
+    con = conectar()
+    try:
+        for nome, keys in arquivos.items():
+            registrar_view(con, nome, keys)
+        resultado = con.execute(sql).arrow()
+        if isinstance(resultado, pa.RecordBatchReader):
+            resultado = resultado.read_all()
+    finally:
+        con.close()
+
+    if usar_cache:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{path_cache}.{os.getpid()}.tmp"
+        pq.write_table(resultado, tmp)
+        os.replace(tmp, path_cache)
+    return resultado
+
+# ============================================================
+# CLI
+# ============================================================
+def main():
+    parser = argparse.ArgumentParser(description="Consulta SQL sobre a Prata/Ouro no MinIO (DuckDB).")
+    parser.add_argument("sql", nargs="?", help="consulta SQL")
+    parser.add_argument("--sem-cache", action="store_true", help="ignora o cache de resultados")
+    parser.add_argument("--csv", help="grava o resultado em CSV no caminho informado")
+    parser.add_argument("--tabelas", action="store_true", help="lista as tabelas disponíveis")
+    args = parser.parse_args()
+
+    if args.tabelas or not args.sql:
+        print("📚 Tabelas disponíveis:")
+        for nome, prefixo in TABELAS.items():
+            extra = f" (e {nome}_atual)" if nome in TABELAS_SNAPSHOT else ""
+            print(f"- {nome}{extra}: s3://{BUCKET}/{prefixo}")
+        return
+
+    inicio = time.time()
+    resultado = consultar(args.sql, usar_cache=not args.sem_cache)
+    df = resultado.to_pandas()
+    if args.csv:
+        df.to_csv(args.csv, index=False)
+        print(f"💾 Resultado salvo em {args.csv}")
+    else:
+        print(df.to_string(index=False))
+    print(f"\n⏱️ {len(df)} linhas em {time.time() - inicio:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
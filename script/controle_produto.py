@@ -1,11 +1,17 @@
 # -- coding: utf-8 --
 
 import boto3 
+import json
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from sqlalchemy import create_engine
 from io import BytesIO
 from datetime import datetime
 
+from diff_dbloja import TABELAS_DIFF, extrair_alteracoes
+from handoff_arrow import publicar
+
 # ============================================================
 # CONFIGURAÇÕES
 # ============================================================
@@ -73,12 +79,69 @@ def salvar_parquet_s3(df, tabela, data_execucao):
     nome_arquivo = f"{tabela}_{data_execucao}_{datetime.now().strftime('%H%M%S')}.parquet"
     caminho = f"{BASE_PATH}data={data_execucao}/{nome_arquivo}"
 
+    table = pa.Table.from_pandas(df, preserve_index=False)
     buffer = BytesIO()
-    df.to_parquet(buffer, index=False)
+    pq.write_table(table, buffer)
     s3.put_object(Bucket=BUCKET, Key=caminho, Body=buffer.getvalue())
+    publicar(caminho, table, BUCKET)  # entrega em memória para a Prata (orchestrator --handoff)
 
     print(f"💾 {tabela} salva com {len(df)} registros em: {caminho}")
 
+# ============================================================
+# FINGERPRINT DAS TABELAS FULL LOAD
+# ============================================================
+FINGERPRINT_KEY = f"{BASE_PATH}controle/fingerprints_full.json"
+BLOCO_FINGERPRINT = 100000  # ids por bloco no hash agregado
+
+def calcular_fingerprint(tabela, colunas):
+    """Linhas, maior id e hash do conteúdo, calculados no próprio Postgres.
+
+    O hash é feito por blocos de id (md5 de cada linha, concatenados em
+    ordem de id dentro do bloco) e depois sobre os hashes dos blocos, sem
+    trazer nenhuma linha da tabela para a pipeline.
+    """
+    query = f"""
+        WITH linhas AS (
+            SELECT id, md5(t::text) AS h
+            FROM (SELECT {colunas} FROM db_loja.{tabela}) t
+        ),
+        blocos AS (
+            SELECT id / {BLOCO_FINGERPRINT} AS bloco, count(*) AS n, max(id) AS max_id,
+                   md5(string_agg(h, '' ORDER BY id)) AS h
+            FROM linhas
+            GROUP BY 1
+        )
+        SELECT coalesce(sum(n), 0) AS linhas, max(max_id) AS max_id,
+               md5(coalesce(string_agg(h, '' ORDER BY bloco), '')) AS hash
+        FROM blocos
+    """
+    r = executar_query(query).iloc[0]
+    return {
+        "linhas": int(r["linhas"]),
+        "max_id": None if pd.isna(r["max_id"]) else int(r["max_id"]),
+        "hash": r["hash"],
+        "colunas": colunas,
+    }
+
+def fingerprint_igual(anterior, atual):
+    if not anterior:
+        return False
+    return all(anterior.get(c) == atual[c] for c in ("linhas", "max_id", "hash", "colunas"))
+
+def ler_fingerprints():
+    """Último fingerprint extraído de cada tabela full load."""
+    try:
+        response = s3.get_object(Bucket=BUCKET, Key=FINGERPRINT_KEY)
+        return json.loads(response["Body"].read().decode("utf-8"))
+    except s3.exceptions.NoSuchKey:
+        print("⚠️ Nenhum fingerprint encontrado. Todas as tabelas full load serão extraídas.")
+        return {}
+
+def salvar_fingerprints(fingerprints):
+    for fp in fingerprints.values():
+        fp.setdefault("extraido_em", datetime.now().isoformat(timespec="seconds"))
+    s3.put_object(Bucket=BUCKET, Key=FINGERPRINT_KEY, Body=json.dumps(fingerprints, indent=2).encode("utf-8"))
+
 # ============================================================
 # ETAPA 2: PRODUTO (INCREMENTAL)
 # ============================================================
@@ -105,41 +168,57 @@ else:
 # ============================================================
 # ETAPA 3: OUTRAS TABELAS (FULL LOAD)
 # ============================================================
-# 3.1 Categorias
-df_categorias = executar_query("""
-    SELECT id, nome, descricao
-    FROM db_loja.categorias_produto
-    ORDER BY id
-""")
-salvar_parquet_s3(df_categorias, "categorias_produto", data_execucao)
-
-# 3.2 Clientes
-df_clientes = executar_query("""
-    SELECT id, nome, email, telefone, data_cadastro
-    FROM db_loja.cliente
-    ORDER BY id
-""")
-salvar_parquet_s3(df_clientes, "cliente", data_execucao)
-
-# 3.3 Pedidos (cabeçalho)
-df_pedidos = executar_query("""
-    SELECT id, id_cliente, data_pedido, valor_total
-    FROM db_loja.pedido_cabecalho
-    ORDER BY id
-""")
-salvar_parquet_s3(df_pedidos, "pedido_cabecalho", data_execucao)
-
-# 3.4 Itens de pedido
-df_itens = executar_query("""
-    SELECT id, id_pedido, id_produto, quantidade, preco_unitario
-    FROM db_loja.pedido_itens
-    ORDER BY id
-""")
-salvar_parquet_s3(df_itens, "pedido_itens", data_execucao)
+# Engine de extração por tabela: "pandas" (padrão), "faixas" (faixas de id
+# em processos paralelos, ver extracao_faixas.py) ou "spark" (JDBC
+# particionado por id, ver ingest_dbloja_spark.py) para tabelas grandes.
+ENGINE_TABELAS = {
+    "categorias_produto": "pandas",
+    "cliente": "pandas",
+    "pedido_cabecalho": "pandas",
+    "pedido_itens": "faixas",
+}
+
+# Colunas extraídas de cada tabela (a mesma lista entra no fingerprint)
+TABELAS_FULL = {
+    "categorias_produto": "id, nome, descricao",                                 # 3.1 Categorias
+    "cliente": "id, nome, email, telefone, data_cadastro",                       # 3.2 Clientes
+    "pedido_cabecalho": "id, id_cliente, data_pedido, valor_total",              # 3.3 Pedidos (cabeçalho)
+    "pedido_itens": "id, id_pedido, id_produto, quantidade, preco_unitario",     # 3.4 Itens de pedido
+}
+
+fingerprints = ler_fingerprints()
+pendentes_spark = {}
+
+# o fingerprint só é registrado depois do upload: uma falha no meio força nova extração
+for tabela, colunas in TABELAS_FULL.items():
+    fingerprint = calcular_fingerprint(tabela, colunas)
+    if fingerprint_igual(fingerprints.get(tabela), fingerprint):
+        print(f"⏭️ {tabela} sem alterações na origem ({fingerprint['linhas']} linhas). Extração ignorada.")
+        continue
+    if tabela in TABELAS_DIFF:
+        # sem coluna de atualização confiável: envia só as linhas alteradas (diff_dbloja.py)
+        extrair_alteracoes(tabela, colunas, data_execucao, datetime.now().strftime("%H%M%S"))
+    elif ENGINE_TABELAS.get(tabela) == "faixas":
+        from extracao_faixas import extrair_tabela_faixas
+        extrair_tabela_faixas(tabela, colunas, data_execucao, datetime.now().strftime("%H%M%S"))
+    elif ENGINE_TABELAS.get(tabela) == "spark":
+        pendentes_spark[tabela] = fingerprint
+        continue
+    else:
+        salvar_parquet_s3(executar_query(f"SELECT {colunas} FROM db_loja.{tabela} ORDER BY id"), tabela, data_execucao)
+    fingerprints[tabela] = fingerprint
+    salvar_fingerprints(fingerprints)
+
+if pendentes_spark:
+    from ingest_dbloja_spark import extrair_tabelas_spark
+    print(f"⚡ Extraindo com Spark: {', '.join(pendentes_spark)}")
+    extrair_tabelas_spark(list(pendentes_spark), data_execucao)
+    fingerprints.update(pendentes_spark)
+    salvar_fingerprints(fingerprints)
 
 # ============================================================
 # FINALIZAÇÃO
 # ============================================================
 print("\n✅ Carga concluída com sucesso!")
 print(f"📁 Estrutura gerada: bronze/dbloja/data={data_execucao}/")
-print("📈 'produto' incremental e demais tabelas full load.")
+print("📈 'produto' incremental e demais tabelas full load (só as alteradas desde o último fingerprint).")
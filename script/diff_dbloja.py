@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Extração por diferença (row-hash) para tabelas sem coluna de atualização.
+
+Em vez de reextrair a tabela inteira, compara hashes de linha calculados
+no Postgres com um índice de hashes guardado no MinIO desde a última
+execução e envia para a Bronze só as chaves inseridas, alteradas ou
+removidas:
+
+bronze/dbloja/data=YYYYMMDD/{tabela}_alteracoes_YYYYMMDD_HHMMSS.parquet
+    colunas da tabela + _operacao (I/U/D) + _lote (YYYYMMDD_HHMMSS)
+
+Duas camadas de hash, ambas calculadas no banco:
+- blocos de BLOCO_IDS ids (md5 agregado): só os blocos cujo hash mudou
+  têm os hashes de linha buscados;
+- linhas (primeiros 64 bits do md5 da linha), comparadas com o índice.
+
+Índice (arrays ordenados por id, atualizados só nos blocos alterados):
+bronze/dbloja/controle/indice_hash/{tabela}/linhas.parquet   id, h (int64)
+bronze/dbloja/controle/indice_hash/{tabela}/blocos.parquet   bloco, n, h
+
+Sem índice (primeira execução), a tabela é extraída inteira no formato
+normal {tabela}_YYYYMMDD_HHMMSS.parquet e o índice é criado. A Prata
+aplica as alterações sobre o último snapshot (new_script_silver.py).
+
+Uso:
+    python script/diff_dbloja.py cliente categorias_produto
+"""
+
+import sys
+from io import BytesIO
+from datetime import datetime
+import boto3
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine
+
+from handoff_arrow import publicar
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+BUCKET = "data-ingest"
+BASE_PATH = "bronze/dbloja/"
+INDICE_PATH = f"{BASE_PATH}controle/indice_hash/"
+
+DB_CONFIG = {
+    "host": "db",
+    "port": 5432,
+    "database": "mydb",
+    "user": "myuser",
+    "password": "mypassword"
+}
+DB_URL = f"postgresql+psycopg2://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+engine = create_engine(DB_URL)
+
+# Tabelas em modo diferença e colunas extraídas (mesmas do controle_produto.py)
+TABELAS_DIFF = {
+    "categorias_produto": "id, nome, descricao",
+    "cliente": "id, nome, email, telefone, data_cadastro",
+}
+
+BLOCO_IDS = 10000        # ids por bloco de hash
+LOTE_IDS = 10000         # ids por consulta ao extrair as linhas alteradas
+
+s3 = boto3.client(
+    "s3",
+    endpoint_url="http://minio:9000",
+    aws_access_key_id="minioadmin",
+    aws_secret_access_key="minioadmin",
+    region_name="us-east-1"
+)
+
+# ============================================================
+# HASHES NO POSTGRES
+# ============================================================
+def hashes_blocos(tabela: str, colunas: str) -> pd.DataFrame:
+    """bloco, n, h de cada bloco de ids da tabela."""
+    query = f"""
+        SELECT id / {BLOCO_IDS} AS bloco, count(*) AS n,
+               md5(string_agg(md5(t::text), '' ORDER BY id)) AS h
+        FROM (SELECT {colunas} FROM db_loja.{tabela}) t
+        GROUP BY 1
+        ORDER BY 1
+    """
+    df = pd.read_sql_query(query, engine)
+    return df.astype({"bloco": "int64", "n": "int64"})
+
+def hashes_linhas(tabela: str, colunas: str, blocos=None) -> tuple[np.ndarray, np.ndarray]:
+    """(ids, hashes) ordenados por id; hash = primeiros 64 bits do md5 da linha."""
+    query = f"""
+        SELECT id, ('x' || substr(md5(t::text), 1, 16))::bit(64)::bigint AS h
+        FROM (SELECT {colunas} FROM db_loja.{tabela}) t
+    """
+    params = None
+    if blocos is not None:
+        query += f" WHERE id / {BLOCO_IDS} = ANY(%(blocos)s)"
+        params = {"blocos": [int(b) for b in blocos]}
+    df = pd.read_sql_query(query + " ORDER BY id", engine, params=params)
+    return df["id"].to_numpy(dtype="int64"), df["h"].to_numpy(dtype="int64")
+
+def extrair_linhas(tabela: str, colunas: str, ids: np.ndarray) -> pd.DataFrame:
+    """Linhas completas das chaves informadas, em lotes de LOTE_IDS."""
+    query = f"SELECT {colunas} FROM db_loja.{tabela} WHERE id = ANY(%(ids)s) ORDER BY id"
+    partes = [
+        pd.read_sql_query(query, engine, params={"ids": [int(i) for i in ids[i:i + LOTE_IDS]]})
+        for i in range(0, len(ids), LOTE_IDS)
+    ]
+    if not partes:
+        return pd.read_sql_query(f"SELECT {colunas} FROM db_loja.{tabela} WHERE false", engine)
+    return pd.concat(partes, ignore_index=True)
+
+# ============================================================
+# ÍNDICE DE HASHES (MinIO)
+# ============================================================
+def _ler_parquet(key: str) -> pd.DataFrame | None:
+    try:
+        return pd.read_parquet(BytesIO(s3.get_object(Bucket=BUCKET, Key=key)["Body"].read()))
+    except s3.exceptions.NoSuchKey:
+        return None
+
+def _salvar_parquet(df: pd.DataFrame, key: str):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    buffer = BytesIO()
+    pq.write_table(table, buffer)
+    s3.put_object(Bucket=BUCKET, Key=key, Body=buffer.getvalue())
+    if not key.startswith(INDICE_PATH):
+        publicar(key, table, BUCKET)
+
+def ler_indice(tabela: str):
+    """(ids, hashes, blocos) da última execução, ou None se não houver índice."""
+    linhas = _ler_parquet(f"{INDICE_PATH}{tabela}/linhas.parquet")
+    blocos = _ler_parquet(f"{INDICE_PATH}{tabela}/blocos.parquet")
+    if linhas is None or blocos is None:
+        return None
+    return linhas["id"].to_numpy(dtype="int64"), linhas["h"].to_numpy(dtype="int64"), blocos
+
+def salvar_indice(tabela: str, ids: np.ndarray, hashes: np.ndarray, blocos: pd.DataFrame):
+    # linhas antes dos blocos: se a execução parar no meio, os blocos antigos
+    # apenas fazem a próxima execução reler esses blocos
+    _salvar_parquet(pd.DataFrame({"id": ids, "h": hashes}), f"{INDICE_PATH}{tabela}/linhas.parquet")
+    _salvar_parquet(blocos, f"{INDICE_PATH}{tabela}/blocos.parquet")
+
+# ============================================================
+# COMPARAÇÃO
+# ============================================================
+def blocos_alterados(atuais: pd.DataFrame, anteriores: pd.DataFrame) -> np.ndarray:
+    """Blocos novos, removidos ou com hash/contagem diferente."""
+    m = atuais.merge(anteriores, on="bloco", how="outer", suffixes=("", "_ant"))
+    diferentes = (m["h"] != m["h_ant"]) | (m["n"] != m["n_ant"])
+    return np.sort(m.loc[diferentes, "bloco"].to_numpy(dtype="int64"))
+
+def comparar(ids_ant: np.ndarray, h_ant: np.ndarray, ids_nov: np.ndarray, h_nov: np.ndarray):
+    """Compara dois índices ordenados por id. Retorna (inseridos, atualizados, removidos)."""
+    if len(ids_ant) == 0:
+        return ids_nov, ids_nov[:0], ids_ant
+    pos = np.minimum(np.searchsorted(ids_ant, ids_nov), len(ids_ant) - 1)
+    existe = ids_ant[pos] == ids_nov
+    inseridos = ids_nov[~existe]
+    atualizados = ids_nov[existe & (h_ant[pos] != h_nov)]
+    removidos = ids_ant[~np.isin(ids_ant, ids_nov, assume_unique=True)]
+    return inseridos, atualizados, removidos
+
+# ============================================================
+# EXTRAÇÃO
+# ============================================================
+def extrair_alteracoes(tabela: str, colunas: str, data_execucao: str, hora_execucao: str) -> dict:
+    """Envia à Bronze só as linhas alteradas desde a última execução e atualiza o índice."""
+    lote = f"{data_execucao}_{hora_execucao}"
+    blocos = hashes_blocos(tabela, colunas)
+    indice = ler_indice(tabela)
+
+    if indice is None:
+        print(f"ℹ️ {tabela}: sem índice de hashes. Extração completa para criar a base.")
+        df = pd.read_sql_query(f"SELECT {colunas} FROM db_loja.{tabela} ORDER BY id", engine)
+        key = f"{BASE_PATH}data={data_execucao}/{tabela}_{lote}.parquet"
+        _salvar_parquet(df, key)
+        print(f"💾 {tabela} salva com {len(df)} registros em: {key}")
+        ids, hashes = hashes_linhas(tabela, colunas)
+        salvar_indice(tabela, ids, hashes, blocos)
+        return {"modo": "completo", "linhas": len(df)}
+
+    ids_ant, h_ant, blocos_ant = indice
+    alterados = blocos_alterados(blocos, blocos_ant)
+    if len(alterados) == 0:
+        print(f"✅ {tabela}: nenhum bloco alterado.")
+        return {"modo": "diferenca", "inseridos": 0, "atualizados": 0, "removidos": 0}
+
+    ids_nov, h_nov = hashes_linhas(tabela, colunas, alterados)
+    nos_alterados = np.isin(ids_ant // BLOCO_IDS, alterados)
+    inseridos, atualizados, removidos = comparar(ids_ant[nos_alterados], h_ant[nos_alterados], ids_nov, h_nov)
+
+    mudancas = {"inseridos": len(inseridos), "atualizados": len(atualizados), "removidos": len(removidos)}
+    if any(mudancas.values()):
+        df = extrair_linhas(tabela, colunas, np.sort(np.concatenate([inseridos, atualizados])))
+        df["_operacao"] = np.where(df["id"].isin(inseridos), "I", "U")
+        if len(removidos):
+            df = pd.concat([df, pd.DataFrame({"id": removidos, "_operacao": "D"})], ignore_index=True)
+        df["_lote"] = lote
+        key = f"{BASE_PATH}data={data_execucao}/{tabela}_alteracoes_{lote}.parquet"
+        _salvar_parquet(df, key)
+        print(f"💾 {tabela}: {mudancas} em {len(alterados)} bloco(s) → {key}")
+    else:
+        print(f"✅ {tabela}: {len(alterados)} bloco(s) relidos, nenhuma linha alterada.")
+
+    # atualiza o índice só nos blocos relidos
+    ids = np.concatenate([ids_ant[~nos_alterados], ids_nov])
+    hashes = np.concatenate([h_ant[~nos_alterados], h_nov])
+    ordem = np.argsort(ids, kind="stable")
+    salvar_indice(tabela, ids[ordem], hashes[ordem], blocos)
+    return {"modo": "diferenca", **mudancas}
+
+
+if __name__ == "__main__":
+    tabelas = sys.argv[1:] or list(TABELAS_DIFF)
+    agora = datetime.now()
+    for tabela in tabelas:
+        extrair_alteracoes(tabela, TABELAS_DIFF[tabela], agora.strftime("%Y%m%d"), agora.strftime("%H%M%S"))
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Extração Bronze de uma tabela grande em faixas de id paralelas (pandas/Arrow).
+
+A tabela é dividida em N faixas de chave primária, pelos quantis do
+histograma de `id` em pg_stats (faixas com volume parecido) ou, sem
+estatísticas, por min(id)/max(id). Cada faixa é lida em um processo do
+pool, com sua própria conexão (reaproveitada entre as faixas do mesmo
+processo), e gravada como uma parte Parquet:
+
+bronze/dbloja/data=YYYYMMDD/{tabela}_YYYYMMDD_HHMMSS.parquet/part-00000.parquet
+bronze/dbloja/data=YYYYMMDD/{tabela}_YYYYMMDD_HHMMSS.parquet/_manifesto.json
+
+Mesmo layout da engine Spark, então a Prata lê as partes como hoje. O
+manifesto (partes, faixas, linhas e schema) é gravado por último e
+permite ler a extração de volta como um único dataset (ler_dataset).
+Todas as partes usam o schema Arrow derivado dos tipos do Postgres.
+
+Uso:
+    python script/extracao_faixas.py pedido_itens
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from io import BytesIO
+import boto3
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine
+
+from cache_s3 import obter
+from handoff_arrow import publicar
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+BUCKET = "data-ingest"
+BASE_PATH = "bronze/dbloja/"
+MANIFESTO_PARTES = "_manifesto.json"
+
+DB_CONFIG = {
+    "host": "db",
+    "port": 5432,
+    "database": "mydb",
+    "user": "myuser",
+    "password": "mypassword"
+}
+DB_URL = f"postgresql+psycopg2://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+
+# Colunas extraídas por tabela (mesmas do controle_produto.py)
+COLUNAS_TABELAS = {
+    "categorias_produto": "id, nome, descricao",
+    "cliente": "id, nome, email, telefone, data_cadastro",
+    "pedido_cabecalho": "id, id_cliente, data_pedido, valor_total",
+    "pedido_itens": "id, id_pedido, id_produto, quantidade, preco_unitario",
+}
+
+MAX_CONEXOES = 8          # processos/conexões simultâneas no Postgres
+FAIXAS_POR_PROCESSO = 2   # mais faixas que processos equilibra faixas lentas
+
+# Tipos do Postgres (information_schema) -> tipos Arrow
+TIPOS_ARROW = {
+    "smallint": pa.int16(),
+    "integer": pa.int32(),
+    "bigint": pa.int64(),
+    "numeric": pa.float64(),
+    "real": pa.float32(),
+    "double precision": pa.float64(),
+    "boolean": pa.bool_(),
+    "date": pa.date32(),
+    "timestamp without time zone": pa.timestamp("us"),
+    "timestamp with time zone": pa.timestamp("us", tz="UTC"),
+}
+
+def get_minio_client():
+    return boto3.client(
+        "s3",
+        endpoint_url="http://minio:9000",
+        aws_access_key_id="minioadmin",
+        aws_secret_access_key="minioadmin",
+        region_name="us-east-1"
+    )
+
+s3 = get_minio_client()
+engine = create_engine(DB_URL)
+
+# ============================================================
+# PLANEJAMENTO DAS FAIXAS
+# ============================================================
+def schema_da_tabela(tabela: str, colunas: str) -> pa.Schema:
+    """Schema Arrow das colunas extraídas, a partir dos tipos do Postgres."""
+    tipos = pd.read_sql_query(
+        """
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_schema = 'db_loja' AND table_name = %(tabela)s
+        """,
+        engine, params={"tabela": tabela},
+    )
+    tipos = dict(zip(tipos["column_name"], tipos["data_type"]))
+    nomes = [c.strip() for c in colunas.split(",")]
+    return pa.schema([(c, TIPOS_ARROW.get(tipos.get(c), pa.string())) for c in nomes])
+
+def limites_por_histograma(tabela: str, n: int) -> list[int] | None:
+    """Cortes pelos quantis do histograma de id (pg_stats), se a tabela tiver estatísticas."""
+    df = pd.read_sql_query(
+        """
+        SELECT histogram_bounds::text AS limites
+        FROM pg_stats
+        WHERE schemaname = 'db_loja' AND tablename = %(tabela)s AND attname = 'id'
+        """,
+        engine, params={"tabela": tabela},
+    )
+    if df.empty or df["limites"].iloc[0] is None:
+        return None
+    limites = [int(v) for v in df["limites"].iloc[0].strip("{}").split(",") if v]
+    if len(limites) < 2:
+        return None
+    passo = (len(limites) - 1) / n
+    return sorted({limites[round(i * passo)] for i in range(1, n)})
+
+def limites_por_minmax(tabela: str, n: int) -> list[int] | None:
+    df = pd.read_sql_query(f"SELECT MIN(id) AS min_id, MAX(id) AS max_id FROM db_loja.{tabela}", engine)
+    min_id, max_id = df["min_id"].iloc[0], df["max_id"].iloc[0]
+    if pd.isna(min_id):
+        return None
+    passo = (int(max_id) - int(min_id) + 1) / n
+    return sorted({int(min_id) + round(i * passo) for i in range(1, n)})
+
+def planejar_faixas(tabela: str, n: int) -> list[tuple]:
+    """[(inicio, fim)] cobrindo todos os ids; None = sem limite (linhas fora do histograma)."""
+    cortes = limites_por_histograma(tabela, n) or limites_por_minmax(tabela, n) or []
+    pontos = [None] + cortes + [None]
+    return list(zip(pontos[:-1], pontos[1:]))
+
+# ============================================================
+# EXTRAÇÃO (executada nos processos do pool)
+# ============================================================
+_engine_processo = None
+
+def _iniciar_processo():
+    """Uma conexão por processo, reaproveitada entre as faixas que ele recebe."""
+    global _engine_processo, s3
+    _engine_processo = create_engine(DB_URL, pool_size=1, max_overflow=0)
+    s3 = get_minio_client()
+
+def extrair_faixa(tabela: str, colunas: str, faixa: tuple, schema: pa.Schema, key: str) -> dict:
+    inicio, fim = faixa
+    condicoes, params = [], {}
+    if inicio is not None:
+        condicoes.append("id >= %(inicio)s")
+        params["inicio"] = inicio
+    if fim is not None:
+        condicoes.append("id < %(fim)s")
+        params["fim"] = fim
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    query = f"SELECT {colunas} FROM db_loja.{tabela} {where} ORDER BY id"
+
+    t0 = time.time()
+    df = pd.read_sql_query(query, _engine_processo or engine, params=params or None)
+    table = pa.Table.from_pandas(df, preserve_index=False).cast(schema)
+    buffer = BytesIO()
+    pq.write_table(table, buffer)
+    s3.put_object(Bucket=BUCKET, Key=key, Body=buffer.getvalue())
+    publicar(key, table, BUCKET)
+    return {"key": key, "inicio": inicio, "fim": fim, "linhas": table.num_rows,
+            "bytes": buffer.tell(), "segundos": round(time.time() - t0, 2)}
+
+def _extrair_faixa(args):
+    return extrair_faixa(*args)
+
+def extrair_tabela_faixas(tabela: str, colunas: str, data_execucao: str, hora_execucao: str,
+                          processos: int | None = None) -> str:
+    """Extrai a tabela em faixas paralelas. Retorna o prefixo do dataset gravado."""
+    processos = processos or min(MAX_CONEXOES, os.cpu_count() or 1)
+    prefixo = f"{BASE_PATH}data={data_execucao}/{tabela}_{data_execucao}_{hora_execucao}.parquet/"
+    schema = schema_da_tabela(tabela, colunas)
+    faixas = planejar_faixas(tabela, processos * FAIXAS_POR_PROCESSO)
+    print(f"🧩 {tabela}: {len(faixas)} faixas de id em {processos} processos")
+
+    tarefas = [
+        (tabela, colunas, faixa, schema, f"{prefixo}part-{i:05d}.parquet")
+        for i, faixa in enumerate(faixas)
+    ]
+    t0 = time.time()
+    try:
+        with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo) as pool:
+            partes = list(pool.map(_extrair_faixa, tarefas))
+    except Exception:
+        # sem manifesto a extração não vale: remove as partes já gravadas
+        gravadas = s3.list_objects_v2(Bucket=BUCKET, Prefix=prefixo).get("Contents", [])
+        if gravadas:
+            s3.delete_objects(Bucket=BUCKET, Delete={"Objects": [{"Key": o["Key"]} for o in gravadas]})
+        raise
+
+    linhas = sum(p["linhas"] for p in partes)
+    manifesto = {
+        "tabela": tabela,
+        "partes": partes,
+        "linhas": linhas,
+        "schema": [{"nome": f.name, "tipo": str(f.type)} for f in schema],
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+    }
+    s3.put_object(Bucket=BUCKET, Key=f"{prefixo}{MANIFESTO_PARTES}",
+                  Body=json.dumps(manifesto, indent=2, default=str).encode("utf-8"))
+    segundos = time.time() - t0
+    print(f"💾 {tabela} salva com {linhas} registros em {len(partes)} partes: {prefixo} "
+          f"({segundos:.1f}s, {linhas / max(segundos, 1e-6):,.0f} linhas/s)")
+    return prefixo
+
+# ============================================================
+# LEITURA
+# ============================================================
+def ler_dataset(prefixo: str) -> pa.Table:
+    """Lê de volta, como uma tabela, as partes listadas no manifesto do prefixo."""
+    obj = s3.get_object(Bucket=BUCKET, Key=f"{prefixo}{MANIFESTO_PARTES}")
+    manifesto = json.loads(obj["Body"].read().decode("utf-8"))
+    tabelas = [
+        pq.read_table(BytesIO(obter(s3, BUCKET, p["key"])))
+        for p in manifesto["partes"]
+    ]
+    return pa.concat_tables(tabelas)
+
+
+if __name__ == "__main__":
+    agora = datetime.now()
+    for tabela in sys.argv[1:] or ["pedido_itens"]:
+        extrair_tabela_faixas(tabela, COLUNAS_TABELAS[tabela], agora.strftime("%Y%m%d"), agora.strftime("%H%M%S"))
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Prata enriquecida: fato desnormalizado de itens de pedido.
+
+Junta pedido_itens com pedido_cabecalho, produto, categorias_produto e
+cliente uma única vez, para que as leituras seguintes não precisem de
+joins:
+
+prata/dbloja/fato_pedido_itens/data=YYYYMMDD/fato_pedido_itens_<id inicial>.parquet
+    (data = dia do pedido)
+    id, id_pedido, id_produto, quantidade, preco_unitario, valor_item,
+    id_cliente, data_pedido, valor_total_pedido, produto, preco_tabela,
+    id_categoria, categoria, cliente, email_cliente
+
+Incremental: só os itens com id > marca d'água são lidos (filtro nos row
+groups) e enriquecidos; itens cujo cabeçalho ainda não chegou ficam na
+lista de pendentes do controle e são relidos na próxima execução. Os
+cabeçalhos são lidos só na faixa de id_pedido dos itens.
+
+As dimensões pequenas (produto, categorias_produto, cliente) ficam em
+cache local (Arrow IPC em CACHE_DIR, um arquivo por tabela e versão), com
+as colunas usadas. A versão de cada uma (hash dos arquivos do snapshot)
+é gravada no controle em versoes_dimensoes: enquanto o snapshot da Prata
+não muda, a execução seguinte lê a cópia local em vez do MinIO. Os joins
+são hash joins do Arrow (Table.join).
+
+Os valores das dimensões são os do momento do enriquecimento; itens já
+gravados não são reescritos quando uma dimensão muda.
+
+O controle fica em prata/dbloja/controle/fato_pedido_itens.json.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime
+from io import BytesIO
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from leitor_parquet_s3 import ler_tabela
+from new_script_silver import s3, BUCKET, PATH_PRATA, latest_silver_snapshot_keys
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+FATO = "fato_pedido_itens"
+PATH_FATO = f"{PATH_PRATA}{FATO}/"
+ESTADO_KEY = f"{PATH_PRATA}controle/{FATO}.json"
+SEM_DATA = "sem_data"   # partição dos pedidos sem data_pedido
+CACHE_DIR = os.environ.get("FATO_CACHE_DIR", os.path.join(tempfile.gettempdir(), FATO))
+
+# Dimensões na ordem dos joins: tabela -> {coluna na Prata: coluna no fato}
+# (a primeira coluna é a chave do join)
+DIMENSOES = {
+    "produto": {"id": "id_produto", "nome": "produto", "preco": "preco_tabela", "id_categoria": "id_categoria"},
+    "categorias_produto": {"id": "id_categoria", "nome": "categoria"},
+    "cliente": {"id": "id_cliente", "nome": "cliente", "email": "email_cliente"},
+}
+
+COLUNAS_FATO = [
+    "id", "id_pedido", "id_produto", "quantidade", "preco_unitario", "valor_item",
+    "id_cliente", "data_pedido", "valor_total_pedido",
+    "produto", "preco_tabela", "id_categoria", "categoria", "cliente", "email_cliente",
+]
+
+# ============================================================
+# ESTADO
+# ============================================================
+def ler_estado() -> dict:
+    try:
+        obj = s3.get_object(Bucket=BUCKET, Key=ESTADO_KEY)
+        return json.loads(obj["Body"].read().decode("utf-8"))
+    except s3.exceptions.NoSuchKey:
+        print("⚠️ Nenhum estado encontrado. O fato será montado desde o início.")
+        return {}
+
+def salvar_estado(estado: dict):
+    s3.put_object(Bucket=BUCKET, Key=ESTADO_KEY, Body=json.dumps(estado, indent=2).encode("utf-8"))
+    print(f"💧 Estado atualizado: ultimo_id_item={estado['ultimo_id_item']}")
+
+# ============================================================
+# LEITURA DA PRATA
+# ============================================================
+def ler_snapshot(tabela: str, columns=None, filters=None) -> pa.Table | None:
+    keys = latest_silver_snapshot_keys(tabela)
+    if not keys:
+        return None
+    return pa.concat_tables(
+        [ler_tabela(k, columns=columns, filters=filters, bucket=BUCKET) for k in keys],
+        promote_options="permissive",
+    )
+
+def versao_snapshot(tabela: str) -> str | None:
+    keys = latest_silver_snapshot_keys(tabela)
+    return hashlib.sha256("\n".join(keys).encode("utf-8")).hexdigest()[:16] if keys else None
+
+def path_dimensao(tabela: str, versao: str) -> str:
+    return os.path.join(CACHE_DIR, f"{tabela}_{versao}.arrow")
+
+def gravar_dimensao_local(tabela: str, versao: str, table: pa.Table, anterior: str | None):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = path_dimensao(tabela, versao)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+    if anterior and anterior != versao and os.path.exists(path_dimensao(tabela, anterior)):
+        os.remove(path_dimensao(tabela, anterior))
+
+def dimensao(tabela: str, anterior: str | None = None) -> tuple[pa.Table | None, str | None]:
+    """(tabela Arrow com as colunas do fato, versão).
+
+    `anterior` é a versão gravada no controle pela última execução: se o
+    snapshot não mudou, a dimensão vem da cópia local dessa versão.
+    """
+    versao = versao_snapshot(tabela)
+    if versao is None:
+        return None, None
+    if versao == anterior and os.path.exists(path_dimensao(tabela, versao)):
+        table = pa.ipc.open_file(pa.memory_map(path_dimensao(tabela, versao))).read_all()
+        print(f"♻️ Dimensão {tabela} inalterada (versão {versao}), lida do cache local.")
+        return table, versao
+    mapa = DIMENSOES[tabela]
+    table = ler_snapshot(tabela, columns=list(mapa)).rename_columns(list(mapa.values()))
+    chave = next(iter(mapa.values()))
+    table = table.filter(pc.is_valid(table[chave]))
+    gravar_dimensao_local(tabela, versao, table, anterior)
+    print(f"📥 Dimensão {tabela} carregada ({table.num_rows} linhas, versão {versao}).")
+    return table, versao
+
+# ============================================================
+# ENRIQUECIMENTO
+# ============================================================
+def _juntar(fato: pa.Table, dim: pa.Table | None, colunas: list[str]) -> pa.Table:
+    """Left join do fato com a dimensão pela primeira coluna (hash join do Arrow)."""
+    chave, extras = colunas[0], colunas[1:]
+    if dim is None:
+        for col in extras:
+            if col not in fato.column_names:
+                fato = fato.append_column(col, pa.nulls(fato.num_rows))
+        return fato
+    dim = dim.select(colunas)
+    dim = dim.set_column(0, chave, pc.cast(dim[chave], fato.schema.field(chave).type))
+    fato = fato.drop_columns([c for c in extras if c in fato.column_names])
+    return fato.join(dim, keys=chave, join_type="left outer", use_threads=True)
+
+def enriquecer(itens: pa.Table, cabecalhos: pa.Table, dimensoes: dict) -> pa.Table:
+    """Itens (já com cabeçalho disponível) com pedido, produto, categoria e cliente."""
+    cab = cabecalhos.select(["id", "id_cliente", "data_pedido", "valor_total"]).rename_columns(
+        ["id_pedido", "id_cliente", "data_pedido", "valor_total_pedido"])
+    cab = cab.set_column(0, "id_pedido", pc.cast(cab["id_pedido"], itens.schema.field("id_pedido").type))
+    fato = itens.join(cab, keys="id_pedido", join_type="inner", use_threads=True)
+    fato = fato.append_column("valor_item", pc.multiply(
+        pc.cast(fato["quantidade"], pa.float64()), pc.cast(fato["preco_unitario"], pa.float64())))
+    for tabela, mapa in DIMENSOES.items():
+        fato = _juntar(fato, dimensoes.get(tabela), list(mapa.values()))
+    fato = fato.select(COLUNAS_FATO)
+    return fato.take(pc.sort_indices(fato, sort_keys=[("id", "ascending")]))
+
+def dia_do_pedido(fato: pa.Table) -> pa.Array:
+    return pc.fill_null(pc.strftime(fato["data_pedido"], format="%Y%m%d"), SEM_DATA)
+
+def gravar_particoes(fato: pa.Table, id_inicial: int) -> list[str]:
+    """Um arquivo por dia do pedido; o nome usa o id inicial do lote, então
+    reexecutar a partir do mesmo estado sobrescreve em vez de duplicar."""
+    dias = dia_do_pedido(fato)
+    keys = []
+    for dia in sorted(pc.unique(dias).to_pylist()):
+        parte = fato.filter(pc.equal(dias, dia))
+        key = f"{PATH_FATO}data={dia}/{FATO}_{id_inicial}.parquet"
+        buf = BytesIO()
+        pq.write_table(parte, buf)
+        s3.put_object(Bucket=BUCKET, Key=key, Body=buf.getvalue())
+        keys.append(key)
+    return keys
+
+# ============================================================
+# EXECUÇÃO PRINCIPAL
+# ============================================================
+def main():
+    print("=== PRATA: FATO DE ITENS DE PEDIDO (incremental) ===")
+    estado = ler_estado()
+    ultimo_id = estado.get("ultimo_id_item")
+
+    colunas_itens = ["id", "id_pedido", "id_produto", "quantidade", "preco_unitario"]
+    filtro = [("id", ">", ultimo_id)] if ultimo_id is not None else None
+    itens = ler_snapshot("pedido_itens", columns=colunas_itens, filters=filtro)
+    if itens is not None and estado.get("pendentes"):
+        aguardando = ler_snapshot("pedido_itens", columns=colunas_itens, filters=[("id", "in", estado["pendentes"])])
+        itens = pa.concat_tables([aguardando, itens], promote_options="permissive")
+    if itens is None or itens.num_rows == 0:
+        print("✅ Nenhum item novo desde a última execução.")
+        return
+
+    ids_pedido = pc.drop_null(itens["id_pedido"])
+    cabecalhos = ler_snapshot(
+        "pedido_cabecalho", columns=["id", "id_cliente", "data_pedido", "valor_total"],
+        filters=[("id", ">=", pc.min(ids_pedido).as_py()), ("id", "<=", pc.max(ids_pedido).as_py())],
+    ) if len(ids_pedido) else None
+    if cabecalhos is None:
+        print("⚠️ Prata sem pedido_cabecalho para os itens novos. Nada a enriquecer.")
+        return
+
+    # itens cujo pedido ainda não chegou ficam para a próxima execução
+    com_pedido = pc.fill_null(pc.is_in(itens["id_pedido"], value_set=cabecalhos["id"].combine_chunks()), False)
+    pendentes = itens.filter(pc.invert(com_pedido))
+    novos = itens.filter(com_pedido)
+    if pendentes.num_rows:
+        print(f"⏳ {pendentes.num_rows} itens sem cabeçalho de pedido; serão enriquecidos depois.")
+
+    dimensoes, versoes = {}, {}
+    anteriores = estado.get("versoes_dimensoes", {})
+    for tabela in DIMENSOES:
+        dimensoes[tabela], versoes[tabela] = dimensao(tabela, anteriores.get(tabela))
+
+    keys = []
+    if novos.num_rows:
+        fato = enriquecer(novos, cabecalhos, dimensoes)
+        id_inicial = (ultimo_id or 0) + 1
+        keys = gravar_particoes(fato, id_inicial)
+        print(f"💾 {fato.num_rows} itens enriquecidos em {len(keys)} partição(ões) de data do pedido.")
+
+    novo_ultimo = pc.max(itens["id"]).as_py()
+    if ultimo_id is not None:
+        novo_ultimo = max(novo_ultimo, ultimo_id)
+    salvar_estado({
+        "ultimo_id_item": novo_ultimo,
+        "pendentes": pendentes["id"].to_pylist(),
+        "versoes_dimensoes": versoes,
+        "arquivos": keys,
+        "executado_em": datetime.now().isoformat(timespec="seconds"),
+    })
+    print("\n✅ Fato de itens de pedido atualizado!")
+
+
+if __name__ == "__main__":
+    main()
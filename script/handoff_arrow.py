@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Entrega em memória (Arrow IPC em /dev/shm) entre Bronze e Prata na mesma execução.
+
+Quando o orchestrator_pipeline.py roda com --handoff, ele define
+PIPELINE_RUN_ID para todos os scripts. As etapas Bronze continuam gravando
+o Parquet no MinIO e, além disso, publicam a tabela Arrow em
+
+/dev/shm/pipeline_<run_id>/<sha256 da key>.arrow
+
+As leituras da Prata (leitor_parquet_s3.ler_tabela) procuram primeiro a key
+ali: o arquivo IPC é aberto por memory map, sem cópia, sem round-trip ao
+S3 e sem decodificar Parquet. Sem PIPELINE_RUN_ID (scripts rodando
+sozinhos) nada é publicado e as leituras seguem pelo S3.
+
+O diretório é removido pelo orquestrador ao fim da execução
+(python script/handoff_arrow.py limpar <run_id> faz o mesmo manualmente).
+"""
+
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import pyarrow as pa
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+RUN_ID = os.environ.get("PIPELINE_RUN_ID")
+RAIZ_SHM = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+FOLGA_SHM = 0.2  # mantém ao menos 20% do /dev/shm livre
+
+def diretorio(run_id: str | None = RUN_ID) -> str | None:
+    return os.path.join(RAIZ_SHM, f"pipeline_{run_id}") if run_id else None
+
+def _path(key: str, bucket: str) -> str:
+    nome = hashlib.sha256(f"{bucket}/{key}".encode("utf-8")).hexdigest()
+    return os.path.join(diretorio(), f"{nome}.arrow")
+
+def ativo() -> bool:
+    return RUN_ID is not None
+
+# ============================================================
+# API
+# ============================================================
+def publicar(key: str, table: pa.Table, bucket: str = "data-ingest") -> bool:
+    """Publica a tabela gravada em `key` para as etapas seguintes da execução."""
+    if not ativo():
+        return False
+    os.makedirs(diretorio(), exist_ok=True)
+    livre = shutil.disk_usage(RAIZ_SHM)
+    if table.nbytes > livre.free - livre.total * FOLGA_SHM:
+        print(f"⚠️ /dev/shm sem espaço para {key}; a Prata lerá do S3.")
+        return False
+    path = _path(key, bucket)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+    return True
+
+def consumir(key: str, bucket: str = "data-ingest") -> pa.Table | None:
+    """Tabela publicada nesta execução para `key` (zero-copy), ou None."""
+    if not ativo():
+        return None
+    try:
+        return pa.ipc.open_file(pa.memory_map(_path(key, bucket))).read_all()
+    except FileNotFoundError:
+        return None
+
+def limpar(run_id: str | None = RUN_ID):
+    path = diretorio(run_id)
+    if path and os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "limpar":
+        limpar(sys.argv[2])
+        print(f"🧹 Handoff removido: {diretorio(sys.argv[2])}")
+    else:
+        print("Uso: python script/handoff_arrow.py limpar <run_id>")
+        raise SystemExit(1)
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Histórico SCD tipo 2 do produto na Prata (preço, estoque, nome, categoria...).
+
+O snapshot prata/dbloja/produto/ guarda só o estado atual (o merge
+sobrescreve as linhas). O histórico guarda cada versão de cada produto:
+
+prata/dbloja/produto_historico/atual/produto_atual.parquet
+    versões vigentes (is_current = True), uma por id, ordenadas por id
+prata/dbloja/produto_historico/fechadas/data=YYYYMMDD/produto_fechadas_YYYYMMDD_HHMMSS.parquet
+    versões encerradas na execução (data = dia da execução)
+
+colunas do produto + row_hash, valid_from, valid_to, is_current
+
+A cada merge do produto, o delta da Bronze ganha um hash das colunas
+rastreadas (COLUNAS_RASTREADAS, hash vetorizado do pandas) e é comparado
+com a visão atual: só os ids com hash diferente têm a versão vigente
+encerrada (anexada em fechadas/) e uma nova versão aberta; ids novos só
+abrem versão. valid_from é a data_atualizacao da linha (ou o instante da
+execução, sem ela) e valid_to é o valid_from da versão seguinte.
+
+Consultas:
+- versoes_atuais(ids): visão atual, lida só nos row groups dos ids
+  (arquivo ordenado por id, filtros pelas estatísticas do footer);
+- como_em(instante, ids): estado em uma data, lendo só as partições de
+  fechadas/ a partir do dia pedido (uma versão encerrada depois do
+  instante foi encerrada por uma execução desse dia em diante).
+
+Datas do histórico em UTC, sem fuso.
+
+Uso:
+    python script/historico_produto.py 4711                      # versões do produto 4711
+    python script/historico_produto.py 4711 "2025-11-01 12:00"   # estado em uma data
+"""
+
+import sys
+from collections.abc import Callable
+from datetime import datetime
+from io import BytesIO
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from leitor_parquet_s3 import ler_parquet
+from memoria_compacta import numericos_de_object, tabela_canonica
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+BUCKET = "data-ingest"
+PATH_HISTORICO = "prata/dbloja/produto_historico/"
+KEY_ATUAL = f"{PATH_HISTORICO}atual/produto_atual.parquet"
+PATH_FECHADAS = f"{PATH_HISTORICO}fechadas/"
+
+COLUNAS_RASTREADAS = ["nome", "descricao", "preco", "estoque", "id_categoria"]
+COLUNAS_TEXTO = {"nome", "descricao"}
+COLUNAS_VERSAO = ["row_hash", "valid_from", "valid_to", "is_current"]
+LINHAS_ROW_GROUP = 10_000   # row groups pequenos: busca por id lê só o trecho do id
+
+# ============================================================
+# HASH DE LINHA
+# ============================================================
+def ultima_versao_por_id(df: pd.DataFrame) -> pd.DataFrame:
+    """Uma linha por id (a de data_atualizacao mais recente; empate: a última do arquivo)."""
+    if not df["id"].duplicated().any():
+        return df
+    if "data_atualizacao" in df.columns:
+        df = df.sort_values("data_atualizacao", kind="stable", na_position="first")
+    return df.drop_duplicates("id", keep="last")
+
+def row_hash(df: pd.DataFrame) -> np.ndarray:
+    """Hash (int64) das colunas rastreadas, independente dos dtypes em memória."""
+    colunas = {}
+    for col in COLUNAS_RASTREADAS:
+        s = df[col] if col in df.columns else pd.Series(pd.NA, index=df.index)
+        if col in COLUNAS_TEXTO:
+            colunas[col] = s.astype("string").fillna("\x00").astype(object)
+        else:
+            colunas[col] = pd.to_numeric(s, errors="coerce").astype("float64")
+    hashes = pd.util.hash_pandas_object(pd.DataFrame(colunas, index=df.index), index=False)
+    return hashes.to_numpy().view("int64")
+
+# ============================================================
+# LEITURA E ESCRITA
+# ============================================================
+def _existe(s3, key: str) -> bool:
+    try:
+        s3.head_object(Bucket=BUCKET, Key=key)
+        return True
+    except s3.exceptions.ClientError:
+        return False
+
+def _gravar(s3, df: pd.DataFrame, key: str):
+    table = tabela_canonica(pa.Table.from_pandas(numericos_de_object(df), preserve_index=False))
+    buf = BytesIO()
+    pq.write_table(table, buf, row_group_size=LINHAS_ROW_GROUP)
+    s3.put_object(Bucket=BUCKET, Key=key, Body=buf.getvalue())
+
+def _listar(s3, prefix: str) -> list[str]:
+    keys = []
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET, Prefix=prefix):
+        keys.extend(o["Key"] for o in page.get("Contents", []) if o["Key"].endswith(".parquet"))
+    return sorted(keys)
+
+def versoes_atuais(ids=None, columns=None) -> pd.DataFrame:
+    """Visão atual (uma versão vigente por id); com ids, só os row groups que podem contê-los."""
+    filters = [("id", "in", [int(i) for i in ids])] if ids is not None else None
+    return ler_parquet(KEY_ATUAL, columns=columns, filters=filters, bucket=BUCKET)
+
+def versoes_fechadas(s3, desde: str | None = None, ids=None) -> pd.DataFrame:
+    """Versões encerradas; com `desde` (YYYYMMDD), só as execuções a partir desse dia."""
+    keys = _listar(s3, f"{PATH_FECHADAS}data=")
+    if desde:
+        keys = [k for k in keys if k.split("/data=")[1][:8] >= desde]
+    filters = [("id", "in", [int(i) for i in ids])] if ids is not None else None
+    partes = [ler_parquet(k, filters=filters, bucket=BUCKET) for k in keys]
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+
+def _utc(s: pd.Series) -> pd.Series:
+    """Datas em UTC sem fuso (as que já vêm sem fuso são tratadas como UTC)."""
+    s = pd.to_datetime(s)
+    return s.dt.tz_convert("UTC").dt.tz_localize(None) if s.dt.tz is not None else s
+
+def como_em(s3, instante, ids=None) -> pd.DataFrame:
+    """Estado dos produtos em `instante`: a versão com valid_from <= instante < valid_to."""
+    t = _utc(pd.Series([pd.Timestamp(instante)])).iloc[0]
+    atuais = versoes_atuais(ids)
+    fechadas = versoes_fechadas(s3, desde=t.strftime("%Y%m%d"), ids=ids)
+    candidatas = pd.concat([fechadas, atuais], ignore_index=True)
+    if candidatas.empty:
+        return candidatas
+    inicio, fim = _utc(candidatas["valid_from"]), _utc(candidatas["valid_to"])
+    vigente = (inicio <= t) & (fim.isna() | (fim > t))
+    return candidatas[vigente].sort_values("id").reset_index(drop=True)
+
+# ============================================================
+# ATUALIZAÇÃO (chamada pelo merge do produto)
+# ============================================================
+def _valid_from(df: pd.DataFrame, agora: pd.Timestamp) -> pd.Series:
+    if "data_atualizacao" in df.columns:
+        return _utc(df["data_atualizacao"]).fillna(agora)
+    return pd.Series(agora, index=df.index)
+
+def _abrir_versoes(df: pd.DataFrame, agora: pd.Timestamp) -> pd.DataFrame:
+    novas = df.copy()
+    novas["row_hash"] = row_hash(novas)
+    novas["valid_from"] = _valid_from(novas, agora)
+    novas["valid_to"] = pd.Series(pd.NaT, index=novas.index, dtype=novas["valid_from"].dtype)
+    novas["is_current"] = True
+    return novas
+
+def completar_com_atual(delta: pd.DataFrame, atual: pd.DataFrame) -> pd.DataFrame:
+    """Nulos do delta ficam com o valor da versão vigente (mesma regra do merge da Prata)."""
+    colunas = [c for c in atual.columns if c not in COLUNAS_VERSAO and c != "id"]
+    vigentes = atual.set_index("id")[colunas].reindex(delta["id"].to_numpy())
+    vigentes.index = delta.index
+    completo = delta.copy()
+    for col in colunas:
+        completo[col] = completo[col].combine_first(vigentes[col]) if col in completo.columns else vigentes[col]
+    return completo
+
+def atualizar_historico(s3, df_delta: pd.DataFrame, run_date: str, run_time: str,
+                        base: Callable[[], pd.DataFrame] | None = None) -> dict:
+    """Encerra e abre versões só dos ids alterados no delta.
+
+    Sem visão atual (primeira execução), `base()` (o snapshot da Prata
+    recém-gravado) abre a primeira versão de todos os produtos.
+    """
+    agora = pd.Timestamp(datetime.strptime(f"{run_date}{run_time}", "%Y%m%d%H%M%S"))
+    if not _existe(s3, KEY_ATUAL):
+        inicial = ultima_versao_por_id(base() if base is not None else df_delta)
+        atual = _abrir_versoes(inicial, agora).sort_values("id")
+        _gravar(s3, atual, KEY_ATUAL)
+        print(f"🕰️ Histórico do produto iniciado com {len(atual)} versões.")
+        return {"abertas": len(atual), "encerradas": 0}
+
+    atual = versoes_atuais()
+    delta = completar_com_atual(ultima_versao_por_id(df_delta), atual)
+    comparacao = pd.DataFrame({"id": delta["id"].to_numpy(), "h": row_hash(delta)}).merge(
+        atual[["id", "row_hash"]].astype({"row_hash": "Int64"}), on="id", how="left")
+    existe = comparacao["row_hash"].notna().to_numpy()
+    mudou = existe & (comparacao["row_hash"] != comparacao["h"]).fillna(False).to_numpy(dtype=bool)
+    abrir = delta[~existe | mudou]
+    if abrir.empty:
+        print("🕰️ Histórico do produto: nenhuma versão nova.")
+        return {"abertas": 0, "encerradas": 0}
+
+    novas = _abrir_versoes(abrir, agora)
+    ids_mudaram = delta.loc[mudou, "id"].to_numpy()
+    encerrar = atual["id"].isin(ids_mudaram)
+    fechadas = atual[encerrar].copy()
+    if not fechadas.empty:
+        fim = novas.set_index("id")["valid_from"].reindex(fechadas["id"]).to_numpy()
+        fechadas["valid_to"] = pd.Series(fim, index=fechadas.index).astype(fechadas["valid_from"].dtype)
+        fechadas["is_current"] = False
+        _gravar(s3, fechadas, f"{PATH_FECHADAS}data={run_date}/produto_fechadas_{run_date}_{run_time}.parquet")
+
+    colunas = list(dict.fromkeys(list(atual.columns) + list(novas.columns)))
+    atual = pd.concat([atual[~encerrar].reindex(columns=colunas), novas.reindex(columns=colunas)],
+                      ignore_index=True).sort_values("id")
+    _gravar(s3, atual, KEY_ATUAL)
+    print(f"🕰️ Histórico do produto: {len(novas)} versões abertas, {len(fechadas)} encerradas.")
+    return {"abertas": len(novas), "encerradas": len(fechadas)}
+
+
+if __name__ == "__main__":
+    from new_script_silver import s3 as cliente_s3
+    if not sys.argv[1:]:
+        print("Uso: python script/historico_produto.py <id> [instante]")
+        raise SystemExit(1)
+    id_produto = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        df = como_em(cliente_s3, sys.argv[2], ids=[id_produto])
+    else:
+        df = pd.concat([versoes_fechadas(cliente_s3, ids=[id_produto]), versoes_atuais([id_produto])],
+                       ignore_index=True).sort_values("valid_from")
+    print(df.to_string(index=False) if not df.empty else f"⚠️ Produto {id_produto} sem histórico.")
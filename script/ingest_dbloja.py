@@ -10,6 +10,9 @@ from io import BytesIO
 import pandas as pd, re, os
 from datetime import datetime
 import re, json
+import pyarrow as pa
+
+from handoff_arrow import publicar
 
 # === CONFIGURAÇÕES ===
 SQL_FILE = "sql/Script-DDL-dbloja.sql"
@@ -83,6 +86,7 @@ def main():
     # Geração e upload dos arquivos parquet
     for table, tbl_data in data.items():
         df = pd.DataFrame(tbl_data["rows"]).convert_dtypes()
+        table_arrow = pa.Table.from_pandas(df, preserve_index=False)
         parquet = BytesIO()
         df.to_parquet(parquet, index=False)
         parquet.seek(0)
@@ -95,6 +99,7 @@ def main():
             length=len(parquet.getvalue()),
             content_type="application/octet-stream"
         )
+        publicar(object_name, table_arrow, BUCKET_NAME)
         print(f"✅ {table} enviada -> {object_name}")
 
     print("🏁 Ingestão incremental concluída com sucesso!")
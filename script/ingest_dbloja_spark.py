@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Extração Bronze do db_loja com Spark (engine alternativa ao pandas).
+
+Lê as tabelas via JDBC em paralelo, particionando pela coluna `id`
+(partitionColumn/lowerBound/upperBound/numPartitions), e grava Parquet
+particionado direto no MinIO via s3a:
+
+s3a://data-ingest/bronze/dbloja/data=YYYYMMDD/{tabela}_YYYYMMDD_HHMMSS.parquet/part-*.parquet
+
+Em `local[*]` as partições usam todos os núcleos; em cluster são
+distribuídas entre os executores. Se o spark_session_service.py estiver
+no ar, a extração usa o driver compartilhado em vez de subir uma JVM.
+
+Uso:
+    python script/ingest_dbloja_spark.py                 # todas as tabelas full load
+    python script/ingest_dbloja_spark.py pedido_itens    # apenas as informadas
+"""
+
+import sys
+from datetime import datetime
+from pyspark.sql import SparkSession
+
+from spark_session_service import get_spark, paralelismo
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+BUCKET = "data-ingest"
+BASE_PATH = "bronze/dbloja/"
+
+DB_CONFIG = {
+    "host": "db",
+    "port": 5432,
+    "database": "mydb",
+    "user": "myuser",
+    "password": "mypassword"
+}
+JDBC_URL = f"jdbc:postgresql://{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+JDBC_PROPS = {
+    "driver": "org.postgresql.Driver",
+    "user": DB_CONFIG["user"],
+    "password": DB_CONFIG["password"],
+}
+
+# Colunas extraídas por tabela (mesmas consultas do controle_produto.py)
+COLUNAS_TABELAS = {
+    "categorias_produto": "id, nome, descricao",
+    "cliente": "id, nome, email, telefone, data_cadastro",
+    "pedido_cabecalho": "id, id_cliente, data_pedido, valor_total",
+    "pedido_itens": "id, id_pedido, id_produto, quantidade, preco_unitario",
+}
+
+# Ajustes de leitura JDBC
+FETCH_SIZE = 10000              # linhas por round-trip do driver JDBC
+LINHAS_POR_PARTICAO = 500000    # alvo de linhas por partição/arquivo
+MAX_PARTICOES = 64              # limite de conexões simultâneas no Postgres
+
+# ============================================================
+# EXTRAÇÃO
+# ============================================================
+def limites_id(spark: SparkSession, tabela: str):
+    """Retorna (min_id, max_id, total_linhas) calculados no Postgres."""
+    query = f"(SELECT MIN(id) AS min_id, MAX(id) AS max_id, COUNT(*) AS total FROM db_loja.{tabela}) t"
+    row = spark.read.jdbc(url=JDBC_URL, table=query, properties=JDBC_PROPS).first()
+    return row["min_id"], row["max_id"], row["total"]
+
+def calcular_particoes(spark: SparkSession, total: int) -> int:
+    """Nº de partições: proporcional ao volume, ao menos o paralelismo disponível."""
+    por_volume = -(-total // LINHAS_POR_PARTICAO)
+    return max(1, min(MAX_PARTICOES, max(por_volume, paralelismo(spark))))
+
+def extrair_tabela_spark(spark: SparkSession, tabela: str, data_execucao: str, hora_execucao: str):
+    """Lê a tabela em faixas de id paralelas e grava Parquet particionado na Bronze."""
+    colunas = COLUNAS_TABELAS[tabela]
+    min_id, max_id, total = limites_id(spark, tabela)
+    caminho = f"s3a://{BUCKET}/{BASE_PATH}data={data_execucao}/{tabela}_{data_execucao}_{hora_execucao}.parquet"
+
+    reader = (
+        spark.read.format("jdbc")
+        .option("url", JDBC_URL)
+        .option("driver", JDBC_PROPS["driver"])
+        .option("user", JDBC_PROPS["user"])
+        .option("password", JDBC_PROPS["password"])
+        .option("dbtable", f"(SELECT {colunas} FROM db_loja.{tabela}) t")
+        .option("fetchsize", FETCH_SIZE)
+    )
+    if total and min_id is not None:
+        num_particoes = calcular_particoes(spark, total)
+        reader = (
+            reader
+            .option("partitionColumn", "id")
+            .option("lowerBound", int(min_id))
+            .option("upperBound", int(max_id) + 1)
+            .option("numPartitions", num_particoes)
+        )
+    else:
+        num_particoes = 1
+
+    df = reader.load()
+    df.write.mode("overwrite").parquet(caminho)
+    print(f"💾 {tabela} salva com {total} registros em {num_particoes} partições: {caminho}")
+
+def extrair_tabelas_spark(tabelas, data_execucao: str, hora_execucao: str | None = None):
+    """Extrai várias tabelas reutilizando uma única SparkSession."""
+    hora_execucao = hora_execucao or datetime.now().strftime("%H%M%S")
+    spark = get_spark("IngestDbLojaBronze")
+    try:
+        for tabela in tabelas:
+            extrair_tabela_spark(spark, tabela, data_execucao, hora_execucao)
+    finally:
+        spark.stop()
+
+# ============================================================
+# EXECUÇÃO PRINCIPAL
+# ============================================================
+def main():
+    tabelas = sys.argv[1:] or list(COLUNAS_TABELAS)
+    desconhecidas = [t for t in tabelas if t not in COLUNAS_TABELAS]
+    if desconhecidas:
+        print(f"❌ Tabelas não suportadas: {', '.join(desconhecidas)}")
+        raise SystemExit(1)
+
+    data_execucao = datetime.now().strftime("%Y%m%d")
+    print(f"🚀 Extração Spark (JDBC particionado) → s3a://{BUCKET}/{BASE_PATH}data={data_execucao}/")
+    extrair_tabelas_spark(tabelas, data_execucao)
+    print("\n✅ Extração Spark concluída com sucesso!")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,87 +1,95 @@
 # -*- coding: utf-8 -*-
 """
-Ingestão da API pública BrasilAPI (IBGE-UF)
+Ingestão da API pública BrasilAPI (IBGE-UF e municípios por UF)
 -> https://brasilapi.com.br/api/ibge/uf/v1
+-> https://brasilapi.com.br/api/ibge/municipios/v1/{uf}
 
 Salva o resultado em JSON no MinIO:
 bronze/ibge/data=YYYYMMDD/ibge-uf_YYYYMMDD_HHMMSS.json
+bronze/ibge/data=YYYYMMDD/ibge-municipios_YYYYMMDD_HHMMSS.json
+
+A coleta usa ingestao_api.ingerir: requisição condicional (ETag /
+Last-Modified) e nenhum arquivo novo quando a API responde 304 ou devolve
+o mesmo conteúdo da última coleta.
+
+Os municípios são buscados a partir da lista de UFs gravada acima, com as
+requisições por UF em paralelo (até CONCORRENCIA simultâneas) e limitadas
+a TAXA requisições/s (token bucket). As respostas são consolidadas em um
+único objeto por execução, uma linha por município com sigla_uf.
+
+Uso:
+    python script/ingest_ibge_brasilapi_to_minio.py
+    python script/ingest_ibge_brasilapi_to_minio.py --base-url http://127.0.0.1:8000 --taxa 5 --concorrencia 4
 """
 
-from minio import Minio
-from datetime import datetime
-from io import BytesIO
-import requests
+import argparse
 import json
+from concurrent.futures import ThreadPoolExecutor
+
+from ingestao_api import BUCKET, LimiteTaxa, TIMEOUT, criar_sessao, gravar_se_mudou, ingerir, s3
 
 # === CONFIGURAÇÕES ===
-BUCKET_NAME = "data-ingest"       # bucket no MinIO
 PREFIX = "bronze/ibge"            # pasta dentro do bucket
-API_URL = "https://brasilapi.com.br/api/ibge/uf/v1"
+BASE_URL = "https://brasilapi.com.br"
+PATH_UF = "/api/ibge/uf/v1"
+PATH_MUNICIPIOS = "/api/ibge/municipios/v1/{uf}"
 
-# Conexão MinIO (igual ao seu ambiente)
-MINIO_ENDPOINT = "minio:9000"
-MINIO_ACCESS_KEY = "minioadmin"
-MINIO_SECRET_KEY = "minioadmin"
-SECURE_CONNECTION = False
+CONCORRENCIA = 8                  # requisições simultâneas
+TAXA = 10.0                       # requisições por segundo
+RAJADA = 5                        # requisições liberadas de uma vez
 
 
-def main():
-    print("🌐 Iniciando coleta da API pública BrasilAPI (IBGE-UF)...")
+def buscar_municipios(base_url: str, siglas: list[str], concorrencia: int = CONCORRENCIA,
+                      taxa: float = TAXA, rajada: int = RAJADA) -> list[dict]:
+    """Municípios de todas as UFs, em paralelo sob limite de taxa. Falha se alguma UF falhar."""
+    sessao = criar_sessao(conexoes=concorrencia)
+    limite = LimiteTaxa(taxa, rajada)
 
-    # 1. Requisição à API
-    try:
-        response = requests.get(API_URL, timeout=15)
-        response.raise_for_status()
-        data = response.json()
-        print(f"✅ Dados obtidos com sucesso: {len(data)} registros encontrados.")
-    except Exception as e:
-        print(f"❌ Erro ao consultar a API: {e}")
-        return
+    def buscar(sigla):
+        limite.aguardar()
+        resposta = sessao.get(f"{base_url}{PATH_MUNICIPIOS.format(uf=sigla)}", timeout=TIMEOUT)
+        resposta.raise_for_status()
+        return [{"sigla_uf": sigla, **m} for m in resposta.json()]
 
-    # 2. Preparar nomes e datas
-    date_str = datetime.now().strftime("%Y%m%d")
-    time_str = datetime.now().strftime("%H%M%S")
-    object_name = f"{PREFIX}/data={date_str}/ibge-uf_{date_str}_{time_str}.json"
+    with ThreadPoolExecutor(max_workers=concorrencia, thread_name_prefix="ibge") as pool:
+        por_uf = list(pool.map(buscar, siglas))
+    return [m for municipios in por_uf for m in municipios]
 
-    # 3. Converter para JSON bytes
-    json_bytes = json.dumps(data, indent=4, ensure_ascii=False).encode("utf-8")
 
-    # 4. Conectar ao MinIO
-    print("🚀 Conectando ao MinIO...")
-    client = Minio(
-        MINIO_ENDPOINT,
-        access_key=MINIO_ACCESS_KEY,
-        secret_key=MINIO_SECRET_KEY,
-        secure=SECURE_CONNECTION
-    )
+def ingerir_municipios(uf_key: str, base_url: str = BASE_URL, prefixo: str = PREFIX,
+                       concorrencia: int = CONCORRENCIA, taxa: float = TAXA, rajada: int = RAJADA) -> dict:
+    """Lê a lista de UFs em `uf_key` e grava o consolidado de municípios (se mudou)."""
+    ufs = json.loads(s3.get_object(Bucket=BUCKET, Key=uf_key)["Body"].read().decode("utf-8"))
+    siglas = sorted(uf["sigla"] for uf in ufs)
+    print(f"🏙️ Buscando municípios de {len(siglas)} UFs ({concorrencia} simultâneas, {taxa:g} req/s)...")
 
-    try:
-        if not client.bucket_exists(BUCKET_NAME):
-            client.make_bucket(BUCKET_NAME)
-            print(f"🪣 Bucket '{BUCKET_NAME}' criado.")
-        else:
-            print(f"🪣 Bucket '{BUCKET_NAME}' já existe.")
-    except Exception as e:
-        print(f"❌ Erro ao verificar/criar bucket: {e}")
-        return
+    municipios = buscar_municipios(base_url, siglas, concorrencia, taxa, rajada)
+    print(f"✅ {len(municipios)} municípios obtidos.")
+    corpo = json.dumps(municipios, ensure_ascii=False).encode("utf-8")
+    return gravar_se_mudou(f"{base_url}{PATH_MUNICIPIOS}", prefixo, "ibge-municipios", corpo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestão BrasilAPI (IBGE) para a Bronze")
+    parser.add_argument("--base-url", default=BASE_URL, help="ex.: servidor local de teste")
+    parser.add_argument("--concorrencia", type=int, default=CONCORRENCIA)
+    parser.add_argument("--taxa", type=float, default=TAXA, help="requisições por segundo")
+    parser.add_argument("--rajada", type=int, default=RAJADA)
+    args = parser.parse_args()
+
+    print("🌐 Iniciando coleta da API pública BrasilAPI (IBGE-UF)...")
 
-    # 5. Upload para o MinIO
     try:
-        print(f"📤 Enviando arquivo para {object_name} ...")
-        client.put_object(
-            BUCKET_NAME,
-            object_name,
-            BytesIO(json_bytes),
-            length=len(json_bytes),
-            content_type="application/json"
-        )
-        print("✅ Upload concluído com sucesso!")
+        resultado = ingerir(f"{args.base_url}{PATH_UF}", PREFIX, "ibge-uf")
+        municipios = ingerir_municipios(resultado["key"], args.base_url, PREFIX,
+                                        args.concorrencia, args.taxa, args.rajada)
     except Exception as e:
-        print(f"❌ Erro durante o upload para o MinIO: {e}")
+        print(f"❌ Erro ao coletar a API: {e}")
         return
 
     print("\n🏁 Processo finalizado com sucesso!")
-    print(f"📂 Caminho no bucket: {BUCKET_NAME}/{object_name}")
+    print(f"📂 UFs: {resultado['status']} | Objeto atual: {resultado['key']}")
+    print(f"📂 Municípios: {municipios['status']} | Objeto atual: {municipios['key']}")
 
 
 if __name__ == "__main__":
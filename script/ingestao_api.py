@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+Componente reutilizável de ingestão de APIs HTTP para a Bronze.
+
+- Uma sessão HTTP compartilhada (pool de conexões keep-alive) com retries
+  e backoff exponencial para 429/5xx e erros de conexão, respeitando
+  Retry-After.
+- Requisições condicionais: o ETag/Last-Modified da última resposta fica
+  em bronze/controle_http/<endpoint>.json e é enviado como
+  If-None-Match/If-Modified-Since. Resposta 304 = nada é gravado.
+- Sem suporte a cache no servidor, o sha256 do payload é comparado com o
+  da última gravação: payload idêntico também não gera objeto novo.
+- O corpo é transmitido em blocos direto para o MinIO (multipart upload
+  a partir de TAMANHO_PARTE); se o hash final for igual ao anterior, o
+  upload é abortado sem criar objeto.
+
+Para fan-out (várias chamadas consolidadas em um objeto), LimiteTaxa
+limita a taxa de requisições (token bucket) e gravar_se_mudou aplica a
+mesma regra de hash ao payload consolidado.
+
+O estado é guardado por URL. src/teste_ingestao_api.py exercita tudo
+contra um servidor HTTP local.
+
+Uso:
+    from ingestao_api import ingerir
+    r = ingerir("https://brasilapi.com.br/api/ibge/uf/v1", "bronze/ibge", "ibge-uf")
+    r["status"]  # "gravado", "nao_modificado" ou "identico"
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from datetime import datetime
+import boto3
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+BUCKET = "data-ingest"
+PATH_CONTROLE = "bronze/controle_http/"
+
+TIMEOUT = (5, 30)                 # (conexão, leitura) em segundos
+TENTATIVAS = 5
+BACKOFF = 0.5                     # 0.5s, 1s, 2s, 4s...
+TAMANHO_BLOCO = 256 * 1024        # leitura do corpo da resposta
+TAMANHO_PARTE = 8 * 1024 * 1024   # parte do multipart upload (mínimo do S3: 5 MB)
+
+s3 = boto3.client(
+    "s3",
+    endpoint_url="http://minio:9000",
+    aws_access_key_id="minioadmin",
+    aws_secret_access_key="minioadmin",
+    region_name="us-east-1"
+)
+
+# ============================================================
+# SESSÃO HTTP
+# ============================================================
+def criar_sessao(tentativas: int = TENTATIVAS, backoff: float = BACKOFF, conexoes: int = 20) -> requests.Session:
+    """Sessão com pool de conexões e retries com backoff exponencial."""
+    retry = Retry(
+        total=tentativas,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=conexoes, pool_maxsize=conexoes)
+    sessao = requests.Session()
+    sessao.mount("http://", adapter)
+    sessao.mount("https://", adapter)
+    sessao.headers.update({"Accept": "application/json", "User-Agent": "pipeline-data-ingest/1.0"})
+    return sessao
+
+_sessao = None
+
+def sessao_padrao() -> requests.Session:
+    """Sessão única do processo, reaproveitada por todas as ingestões."""
+    global _sessao
+    if _sessao is None:
+        _sessao = criar_sessao()
+    return _sessao
+
+class LimiteTaxa:
+    """Token bucket thread-safe: até `taxa` requisições/s, com rajadas de até `rajada`."""
+
+    def __init__(self, taxa: float, rajada: int = 1):
+        self.taxa = taxa
+        self.capacidade = max(rajada, 1)
+        self.tokens = float(self.capacidade)
+        self.ultimo = time.monotonic()
+        self.trava = threading.Lock()
+
+    def aguardar(self):
+        """Bloqueia até haver um token disponível e o consome."""
+        while True:
+            with self.trava:
+                agora = time.monotonic()
+                self.tokens = min(self.capacidade, self.tokens + (agora - self.ultimo) * self.taxa)
+                self.ultimo = agora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                espera = (1 - self.tokens) / self.taxa
+            time.sleep(espera)
+
+# ============================================================
+# ESTADO POR ENDPOINT
+# ============================================================
+def chave_estado(url: str) -> str:
+    legivel = re.sub(r"[^a-zA-Z0-9]+", "_", url.split("://", 1)[-1]).strip("_")[:80]
+    return f"{PATH_CONTROLE}{legivel}_{hashlib.sha256(url.encode('utf-8')).hexdigest()[:12]}.json"
+
+def ler_estado(url: str, cliente=None) -> dict:
+    cliente = cliente or s3
+    try:
+        obj = cliente.get_object(Bucket=BUCKET, Key=chave_estado(url))
+        return json.loads(obj["Body"].read().decode("utf-8"))
+    except cliente.exceptions.NoSuchKey:
+        return {}
+
+def salvar_estado(url: str, estado: dict, cliente=None):
+    (cliente or s3).put_object(
+        Bucket=BUCKET, Key=chave_estado(url),
+        Body=json.dumps({"url": url, **estado}, indent=2).encode("utf-8"),
+    )
+
+# ============================================================
+# ENVIO EM FLUXO PARA O MINIO
+# ============================================================
+def transmitir(resposta: requests.Response, key: str, sha_anterior: str | None,
+               content_type: str, cliente=None) -> tuple[str, int, bool]:
+    """Envia o corpo em blocos para `key`. Retorna (sha256, bytes, gravado).
+
+    Corpos até TAMANHO_PARTE vão num único PUT; acima disso, multipart
+    upload parte a parte. Com hash igual ao anterior, nada é confirmado.
+    """
+    cliente = cliente or s3
+    sha = hashlib.sha256()
+    buffer = bytearray()
+    total, upload_id, partes = 0, None, []
+
+    def enviar_parte():
+        nonlocal upload_id
+        if upload_id is None:
+            upload_id = cliente.create_multipart_upload(Bucket=BUCKET, Key=key, ContentType=content_type)["UploadId"]
+        numero = len(partes) + 1
+        r = cliente.upload_part(Bucket=BUCKET, Key=key, UploadId=upload_id, PartNumber=numero, Body=bytes(buffer))
+        partes.append({"ETag": r["ETag"], "PartNumber": numero})
+        buffer.clear()
+
+    try:
+        for bloco in resposta.iter_content(TAMANHO_BLOCO):
+            sha.update(bloco)
+            buffer += bloco
+            total += len(bloco)
+            if len(buffer) >= TAMANHO_PARTE:
+                enviar_parte()
+        digest = sha.hexdigest()
+
+        if digest == sha_anterior:
+            if upload_id:
+                cliente.abort_multipart_upload(Bucket=BUCKET, Key=key, UploadId=upload_id)
+            return digest, total, False
+        if upload_id:
+            if buffer:
+                enviar_parte()
+            cliente.complete_multipart_upload(
+                Bucket=BUCKET, Key=key, UploadId=upload_id, MultipartUpload={"Parts": partes},
+            )
+        else:
+            cliente.put_object(Bucket=BUCKET, Key=key, Body=bytes(buffer), ContentType=content_type)
+        return digest, total, True
+    except BaseException:
+        if upload_id:
+            cliente.abort_multipart_upload(Bucket=BUCKET, Key=key, UploadId=upload_id)
+        raise
+
+# ============================================================
+# INGESTÃO
+# ============================================================
+def gravar_se_mudou(identificador: str, prefixo: str, nome: str, corpo: bytes,
+                    extensao: str = "json", content_type: str = "application/json", cliente=None) -> dict:
+    """Grava um payload já montado (ex.: consolidação de várias chamadas) só se o sha256 mudou.
+
+    `identificador` faz o papel da URL no estado de controle.
+    """
+    estado = ler_estado(identificador, cliente)
+    agora = datetime.now()
+    sha = hashlib.sha256(corpo).hexdigest()
+    gravado = sha != estado.get("sha256")
+    key = estado.get("key")
+    if gravado:
+        data, hora = agora.strftime("%Y%m%d"), agora.strftime("%H%M%S")
+        key = f"{prefixo}/data={data}/{nome}_{data}_{hora}.{extensao}"
+        (cliente or s3).put_object(Bucket=BUCKET, Key=key, Body=corpo, ContentType=content_type)
+    salvar_estado(identificador, {
+        "sha256": sha,
+        "key": key,
+        "bytes": len(corpo),
+        "verificado_em": agora.isoformat(timespec="seconds"),
+        "gravado_em": agora.isoformat(timespec="seconds") if gravado else estado.get("gravado_em"),
+    }, cliente)
+    if not gravado:
+        print(f"♻️ {nome}: payload idêntico ao anterior ({len(corpo)} bytes). Bronze mantida: {key}")
+        return {"status": "identico", "key": key, "bytes": len(corpo), "sha256": sha}
+    print(f"💾 {nome}: {len(corpo)} bytes gravados em {key}")
+    return {"status": "gravado", "key": key, "bytes": len(corpo), "sha256": sha}
+
+def ingerir(url: str, prefixo: str, nome: str, extensao: str = "json",
+            sessao: requests.Session | None = None, cliente=None, params: dict | None = None) -> dict:
+    """Baixa `url` para {prefixo}/data=YYYYMMDD/{nome}_YYYYMMDD_HHMMSS.{extensao}, só se mudou.
+
+    Retorna {"status", "key", "bytes", "sha256"}; key é o objeto com o
+    conteúdo atual (o novo ou o da última gravação).
+    """
+    sessao = sessao or sessao_padrao()
+    estado = ler_estado(url, cliente)
+    agora = datetime.now()
+
+    headers = {}
+    if estado.get("etag"):
+        headers["If-None-Match"] = estado["etag"]
+    if estado.get("last_modified"):
+        headers["If-Modified-Since"] = estado["last_modified"]
+
+    with sessao.get(url, headers=headers, params=params, stream=True, timeout=TIMEOUT) as resposta:
+        if resposta.status_code == 304:
+            estado["verificado_em"] = agora.isoformat(timespec="seconds")
+            salvar_estado(url, estado, cliente)
+            print(f"♻️ {nome}: não modificado (304). Bronze mantida: {estado.get('key')}")
+            return {"status": "nao_modificado", "key": estado.get("key"), "bytes": 0, "sha256": estado.get("sha256")}
+        resposta.raise_for_status()
+
+        data, hora = agora.strftime("%Y%m%d"), agora.strftime("%H%M%S")
+        key = f"{prefixo}/data={data}/{nome}_{data}_{hora}.{extensao}"
+        content_type = resposta.headers.get("Content-Type", "application/octet-stream").split(";")[0]
+        sha, tamanho, gravado = transmitir(resposta, key, estado.get("sha256"), content_type, cliente)
+        etag, last_modified = resposta.headers.get("ETag"), resposta.headers.get("Last-Modified")
+
+    novo_estado = {
+        "etag": etag,
+        "last_modified": last_modified,
+        "sha256": sha,
+        "key": key if gravado else estado.get("key"),
+        "bytes": tamanho,
+        "verificado_em": agora.isoformat(timespec="seconds"),
+        "gravado_em": agora.isoformat(timespec="seconds") if gravado else estado.get("gravado_em"),
+    }
+    salvar_estado(url, novo_estado, cliente)
+    if not gravado:
+        print(f"♻️ {nome}: payload idêntico ao anterior ({tamanho} bytes). Bronze mantida: {novo_estado['key']}")
+        return {"status": "identico", "key": novo_estado["key"], "bytes": tamanho, "sha256": sha}
+    print(f"💾 {nome}: {tamanho} bytes gravados em {key}")
+    return {"status": "gravado", "key": key, "bytes": tamanho, "sha256": sha}
@@ -4,12 +4,11 @@ Pipeline - Camada Bronze (Raw)
 Responsável por:
 1️⃣ Extrair dados do PostgreSQL (db_loja)
 2️⃣ Copiar arquivos JSON locais (Fonte 2)
-3️⃣ Fazer requisição de API pública (Fonte 3)
+3️⃣ Fazer requisição de API pública (Fonte 3), via ingestao_api.ingerir
 4️⃣ Salvar todos em MinIO sob o caminho data-ingest/bronze/...
 """
 
 import os
-import json
 import pandas as pd
 import boto3
 import psycopg2
@@ -17,6 +16,9 @@ import requests
 from datetime import date
 from io import StringIO
 
+from ingest_ibge_brasilapi_to_minio import BASE_URL, PATH_UF, PREFIX as PREFIX_IBGE
+from ingestao_api import ingerir
+
 # ==============================
 # CONFIGURAÇÕES GERAIS
 # ==============================
@@ -96,15 +98,12 @@ for key, fname in json_files.items():
 # ==============================
 print("\n🌎 Iniciando ingestão da API BrasilAPI...")
 
-url = "https://brasilapi.com.br/api/ibge/uf/v1"
-response = requests.get(url)
-if response.status_code == 200:
-    data = response.json()
-    json_bytes = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
-    path = f"{PREFIX}api/ibge_uf/data_ingestao={DATA_INGESTAO}/uf.json"
-    s3.put_object(Bucket=BUCKET, Key=path, Body=json_bytes)
-    print(f"✅ API IBGE -> {path}")
-else:
-    print(f"❌ Erro na API IBGE: {response.status_code}")
+# mesma coleta do ingest_ibge_brasilapi_to_minio.py: requisição condicional, estado por
+# URL em bronze/controle_http/ e objeto novo só quando o conteúdo muda
+try:
+    resultado = ingerir(f"{BASE_URL}{PATH_UF}", PREFIX_IBGE, "ibge-uf")
+    print(f"✅ API IBGE ({resultado['status']}) -> {resultado['key']}")
+except requests.RequestException as e:
+    print(f"❌ Erro na API IBGE: {e}")
 
 print("\n🏁 Ingestão Bronze finalizada.")
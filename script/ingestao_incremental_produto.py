@@ -3,6 +3,8 @@ import pandas as pd
 from io import BytesIO
 from datetime import datetime
 
+from leitor_parquet_s3 import ler_parquet
+
 # ============================================================
 # CONFIGURAÇÕES
 # ============================================================
@@ -56,10 +58,9 @@ def listar_arquivos_bronze():
                 arquivos.append(nome)
     return sorted(arquivos)
 
-def ler_parquet_do_s3(path):
-    """Lê Parquet direto do MinIO."""
-    obj = s3.get_object(Bucket=BUCKET, Key=path)
-    return pd.read_parquet(BytesIO(obj["Body"].read()))
+def ler_parquet_do_s3(path, columns=None, filters=None):
+    """Lê Parquet direto do MinIO (range requests, com projeção e filtros)."""
+    return ler_parquet(path, columns=columns, filters=filters, bucket=BUCKET)
 
 # ============================================================
 # ETAPA 1: LOCALIZAR O ARQUIVO MAIS RECENTE NA BRONZE
@@ -77,7 +78,9 @@ print(f"📦 Arquivo mais recente da Bronze: {arquivo_recente}")
 # ETAPA 2: LER E APLICAR INCREMENTO
 # ============================================================
 marca_dagua_anterior = ler_watermark()
-df = ler_parquet_do_s3(arquivo_recente)
+# o filtro da marca d'água descarta row groups antigos já na leitura
+filtro = [("data_atualizacao", ">", marca_dagua_anterior)] if marca_dagua_anterior else None
+df = ler_parquet_do_s3(arquivo_recente, filters=filtro)
 
 if df.empty:
     print("⚠️ O arquivo da Bronze está vazio, nada a processar.")
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Leitura colunar de Parquet no MinIO com HTTP range requests.
+
+Em vez de baixar o objeto inteiro (get_object + BytesIO), abre o arquivo
+pelo S3FileSystem do pyarrow e busca só o necessário:
+- footer (metadados) lido uma vez por versão do objeto (tamanho + mtime) e
+  mantido em cache no processo;
+- row groups descartados pelas estatísticas min/max quando há filtros;
+- apenas os column chunks das colunas pedidas.
+
+Dentro de uma execução do orquestrador com --handoff, tabelas publicadas
+pela Bronze em /dev/shm (handoff_arrow.py) são usadas direto, sem S3.
+Objetos já presentes no cache em disco (cache_s3.py) são lidos localmente
+(memory map); leituras completas, sem projeção nem filtro, populam o cache.
+
+iterar_lotes lê o arquivo em lotes de linhas (modo com orçamento de
+memória da Prata, ver memoria_compacta.py); ler_row_groups e
+ler_intervalo atendem as buscas pontuais (busca_pontual.py).
+
+Filtros usam o formato do pyarrow: [("coluna", "op", valor), ...] (AND),
+com op em =, ==, !=, <, <=, >, >=, in, not in.
+
+Exemplo:
+    ler_parquet("bronze/dbloja/data=20251101/produto_20251101_101500.parquet",
+                columns=["id", "preco"],
+                filters=[("data_atualizacao", ">", "2025-11-01 14:10:42")])
+"""
+
+from datetime import datetime
+import boto3
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+import cache_s3
+import handoff_arrow
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+BUCKET = "data-ingest"
+MINIO_ENDPOINT = "minio:9000"
+
+S3FS = fs.S3FileSystem(
+    endpoint_override=MINIO_ENDPOINT,
+    scheme="http",
+    access_key="minioadmin",
+    secret_key="minioadmin",
+    region="us-east-1",
+)
+
+s3 = boto3.client(
+    "s3",
+    endpoint_url=f"http://{MINIO_ENDPOINT}",
+    aws_access_key_id="minioadmin",
+    aws_secret_access_key="minioadmin",
+    region_name="us-east-1"
+)
+
+MAX_FOOTERS = 2048
+_footers = {}  # (path, tamanho, mtime) -> FileMetaData
+
+# ============================================================
+# FOOTER EM CACHE
+# ============================================================
+def _versao(arquivo, path: str) -> tuple:
+    """Chave do footer em cache. Alguns objetos são regravados no mesmo nome (cubos da
+    Ouro, saídas da compactação), às vezes com o mesmo tamanho: no S3 a chave inclui o
+    mtime do objeto. Cópias locais do cache_s3 já têm o ETag no nome do arquivo."""
+    if isinstance(arquivo, pa.MemoryMappedFile):
+        return path, arquivo.size()
+    info = S3FS.get_file_info(path)
+    return path, info.size, info.mtime_ns
+
+def _footer(arquivo, path: str) -> pq.FileMetaData:
+    """Metadados do arquivo, em cache por versão do objeto (tamanho + mtime)."""
+    chave = _versao(arquivo, path)
+    md = _footers.get(chave)
+    if md is None:
+        md = pq.ParquetFile(arquivo).metadata
+        if len(_footers) >= MAX_FOOTERS:
+            _footers.pop(next(iter(_footers)))
+        _footers[chave] = md
+    return md
+
+# ============================================================
+# FILTROS
+# ============================================================
+def _normalizar_valor(valor, tipo: pa.DataType):
+    """Converte o valor do filtro para o tipo da coluna (ex.: texto -> timestamp)."""
+    if isinstance(valor, (list, tuple, set)):
+        return [_normalizar_valor(v, tipo) for v in valor]
+    if pa.types.is_timestamp(tipo) and isinstance(valor, (str, datetime, pd.Timestamp)):
+        ts = pd.Timestamp(valor)
+        if tipo.tz and ts.tzinfo is None:
+            ts = ts.tz_localize("UTC")
+        elif not tipo.tz and ts.tzinfo is not None:
+            ts = ts.tz_convert("UTC").tz_localize(None)
+        return ts.to_pydatetime()
+    return valor
+
+def _row_group_pode_ter(stats, op: str, valor) -> bool:
+    """False só quando as estatísticas garantem que nenhuma linha atende ao filtro."""
+    if stats is None or not stats.has_min_max:
+        return True
+    lo, hi = stats.min, stats.max
+    try:
+        if op in ("=", "=="):
+            return lo <= valor <= hi
+        if op == ">":
+            return hi > valor
+        if op == ">=":
+            return hi >= valor
+        if op == "<":
+            return lo < valor
+        if op == "<=":
+            return lo <= valor
+        if op == "in":
+            return any(lo <= v <= hi for v in valor)
+    except TypeError:
+        pass
+    return True
+
+def _selecionar_row_groups(md: pq.FileMetaData, schema: pa.Schema, filters) -> list[int]:
+    indices = {md.schema.column(i).path: i for i in range(md.num_columns)}
+    selecionados = []
+    for rg in range(md.num_row_groups):
+        row_group = md.row_group(rg)
+        manter = True
+        for col, op, valor in filters or []:
+            if col not in indices or schema.get_field_index(col) < 0:
+                continue
+            valor = _normalizar_valor(valor, schema.field(col).type)
+            if not _row_group_pode_ter(row_group.column(indices[col]).statistics, op, valor):
+                manter = False
+                break
+        if manter:
+            selecionados.append(rg)
+    return selecionados
+
+def _aplicar_filtros(table: pa.Table, filters) -> pa.Table:
+    if not filters or table.num_rows == 0:
+        return table
+    normalizados = [
+        (col, op, _normalizar_valor(valor, table.schema.field(col).type))
+        for col, op, valor in filters
+        if table.schema.get_field_index(col) >= 0
+    ]
+    if not normalizados:
+        return table
+    return table.filter(pq.filters_to_expression(normalizados))
+
+# ============================================================
+# LEITURA
+# ============================================================
+def _abrir(key: str, bucket: str, leitura_completa: bool):
+    """(arquivo, path): cópia local do cache quando houver; senão o objeto no S3 por ranges."""
+    if cache_s3.ATIVO:
+        try:
+            if leitura_completa:
+                local = cache_s3.caminho_local(s3, bucket, key)
+            else:
+                local = cache_s3.em_cache(s3, bucket, key)
+            if local:
+                return pa.memory_map(local), local
+        except (FileNotFoundError, OSError) as e:
+            print(f"⚠️ Cache local indisponível para {key}: {e}")
+    path = f"{bucket}/{key}"
+    return S3FS.open_input_file(path), path
+
+def ler_tabela(key: str, columns=None, filters=None, bucket: str = BUCKET) -> pa.Table:
+    """Lê um Parquet do MinIO como tabela Arrow buscando só footer, row groups e colunas necessários."""
+    publicado = handoff_arrow.consumir(key, bucket)
+    if publicado is not None:
+        table = _aplicar_filtros(publicado, filters)
+        return table.select(list(columns)) if columns is not None else table
+
+    arquivo, path = _abrir(key, bucket, leitura_completa=columns is None and not filters)
+    with arquivo:
+        md = _footer(arquivo, path)
+        pf = pq.ParquetFile(arquivo, metadata=md)
+        schema = pf.schema_arrow
+        colunas_leitura = None
+        if columns is not None:
+            extras = [c for c, _, _ in filters or [] if c not in columns and schema.get_field_index(c) >= 0]
+            colunas_leitura = list(dict.fromkeys(list(columns) + extras))
+        row_groups = _selecionar_row_groups(md, schema, filters)
+        table = pf.read_row_groups(row_groups, columns=colunas_leitura)
+    table = _aplicar_filtros(table, filters)
+    if columns is not None:
+        table = table.select(list(columns))
+    return table
+
+def ler_schema(key: str, bucket: str = BUCKET) -> pa.Schema:
+    """Schema Arrow do arquivo lendo só o footer (ou o handoff da execução)."""
+    publicado = handoff_arrow.consumir(key, bucket)
+    if publicado is not None:
+        return publicado.schema
+    arquivo, path = _abrir(key, bucket, leitura_completa=False)
+    with arquivo:
+        return _footer(arquivo, path).schema.to_arrow_schema()
+
+def ler_metadados(key: str, bucket: str = BUCKET) -> pq.FileMetaData:
+    """Metadados do footer (linhas, row groups, schema), em cache no processo."""
+    arquivo, path = _abrir(key, bucket, leitura_completa=False)
+    with arquivo:
+        return _footer(arquivo, path)
+
+def ler_row_groups(key: str, row_groups: list[int], columns=None, bucket: str = BUCKET) -> pa.Table:
+    """Lê só os row groups indicados (busca pontual, ver busca_pontual.py)."""
+    arquivo, path = _abrir(key, bucket, leitura_completa=False)
+    with arquivo:
+        pf = pq.ParquetFile(arquivo, metadata=_footer(arquivo, path))
+        return pf.read_row_groups(row_groups, columns=columns)
+
+def ler_intervalo(key: str, inicio: int, tamanho: int, bucket: str = BUCKET) -> bytes:
+    """Bytes [inicio, inicio + tamanho) do objeto, por range request (ou da cópia local)."""
+    arquivo, _ = _abrir(key, bucket, leitura_completa=False)
+    with arquivo:
+        return arquivo.read_at(tamanho, inicio)
+
+def ler_parquet(key: str, columns=None, filters=None, bucket: str = BUCKET) -> pd.DataFrame:
+    """Mesmo que ler_tabela, retornando DataFrame do pandas."""
+    return ler_tabela(key, columns=columns, filters=filters, bucket=bucket).to_pandas()
+
+def iterar_lotes(key: str, columns=None, filters=None, bucket: str = BUCKET,
+                 linhas: int = 100_000):
+    """Gera o Parquet em RecordBatches de até `linhas` linhas, sem materializar o arquivo inteiro."""
+    publicado = handoff_arrow.consumir(key, bucket)
+    if publicado is not None:
+        table = _aplicar_filtros(publicado, filters)
+        table = table.select(list(columns)) if columns is not None else table
+        yield from table.to_batches(max_chunksize=linhas)
+        return
+
+    arquivo, path = _abrir(key, bucket, leitura_completa=False)
+    with arquivo:
+        md = _footer(arquivo, path)
+        pf = pq.ParquetFile(arquivo, metadata=md)
+        schema = pf.schema_arrow
+        colunas_leitura = None
+        if columns is not None:
+            extras = [c for c, _, _ in filters or [] if c not in columns and schema.get_field_index(c) >= 0]
+            colunas_leitura = list(dict.fromkeys(list(columns) + extras))
+        row_groups = _selecionar_row_groups(md, schema, filters)
+        if not row_groups:
+            return
+        for batch in pf.iter_batches(batch_size=linhas, row_groups=row_groups, columns=colunas_leitura):
+            table = _aplicar_filtros(pa.Table.from_batches([batch]), filters)
+            if columns is not None:
+                table = table.select(list(columns))
+            yield from table.to_batches()
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Modo com orçamento de memória para a Prata: tipos compactos e processamento em lotes.
+
+Sem o modo, os DataFrames da Prata usam strings em object e int64/float64
+em tudo. Com um orçamento (por execução ou por tabela):
+- compactar(): strings em Arrow (string[pyarrow]), colunas de baixa
+  cardinalidade (status, tipo, sigla, banco...) como categoria, inteiros e
+  floats reduzidos ao menor tipo que guarda os valores sem perda;
+- quando a estimativa de memória da tabela passa do orçamento, a Prata
+  troca para o modo em lotes: lê a Bronze em lotes de LINHAS_LOTE linhas
+  (leitor_parquet_s3.iterar_lotes) e grava cada lote direto no Parquet
+  de saída (gravar_lotes), sem materializar a tabela inteira.
+
+Os tipos compactos valem só em memória: com o modo ligado, tabela_canonica()
+volta ao schema normal (int64, float64, string) ao gravar, então o Parquet
+da Prata é o mesmo com ou sem orçamento. Sem o modo, a tabela é gravada
+com os tipos que já tem.
+
+Orçamento por execução: SILVER_ORCAMENTO_MB=2048 (ou --orcamento-mb no
+new_script_silver.py); por tabela: ORCAMENTO_TABELAS no new_script_silver.py.
+"""
+
+import os
+import tempfile
+from typing import Callable, Iterable
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+ORCAMENTO_MB = int(os.environ.get("SILVER_ORCAMENTO_MB", "0"))   # 0 = modo desligado
+LINHAS_LOTE = int(os.environ.get("SILVER_LINHAS_LOTE", "100000"))
+
+# Colunas tratadas como categoria (também como sufixo: conta.banco, status_pedido...)
+COLUNAS_CATEGORICAS = {"status", "tipo", "sigla", "sigla_uf", "banco", "categoria"}
+CARDINALIDADE_MAX = 0.05    # demais strings viram categoria com até 5% de valores distintos
+LINHAS_MIN_CATEGORIA = 1000
+
+def orcamento_bytes(orcamento_mb: int | None = None) -> int | None:
+    mb = ORCAMENTO_MB if orcamento_mb is None else orcamento_mb
+    return mb * 2**20 if mb else None
+
+# ============================================================
+# TIPOS COMPACTOS
+# ============================================================
+def _categorica(nome: str) -> bool:
+    nome = nome.lower()
+    return any(nome == c or nome.endswith(f"_{c}") or nome.endswith(f".{c}") or nome.startswith(f"{c}_")
+               for c in COLUNAS_CATEGORICAS)
+
+def _menor_inteiro(s: pd.Series) -> pd.Series:
+    lo, hi = s.min(), s.max()
+    if pd.isna(lo):
+        return s
+    nulavel = isinstance(s.dtype, pd.api.extensions.ExtensionDtype)
+    for tipo in ("int8", "int16", "int32"):
+        info = np.iinfo(tipo)
+        if info.min <= lo and hi <= info.max:
+            return s.astype(tipo.capitalize() if nulavel else tipo)
+    return s
+
+def _menor_float(s: pd.Series) -> pd.Series:
+    reduzido = s.astype("float32")
+    if np.array_equal(reduzido.to_numpy(dtype="float64"), s.to_numpy(dtype="float64"), equal_nan=True):
+        return reduzido
+    return s
+
+def compactar(df: pd.DataFrame) -> pd.DataFrame:
+    """Reduz a memória do DataFrame sem alterar valores (retorna um novo DataFrame)."""
+    df = df.copy(deep=False)
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_bool_dtype(s) or isinstance(s.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_integer_dtype(s):
+            df[col] = _menor_inteiro(s)
+        elif pd.api.types.is_float_dtype(s):
+            df[col] = _menor_float(s)
+        elif pd.api.types.is_string_dtype(s) and pd.api.types.infer_dtype(s, skipna=True) in ("string", "empty"):
+            distintos = s.nunique(dropna=True)
+            if _categorica(str(col)) or (len(s) >= LINHAS_MIN_CATEGORIA and distintos <= CARDINALIDADE_MAX * len(s)):
+                df[col] = s.astype("category")
+            else:
+                df[col] = s.astype("string[pyarrow]")
+    return df
+
+def memoria_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 2**20
+
+# ============================================================
+# ESCRITA
+# ============================================================
+def numericos_de_object(df: pd.DataFrame, fallback_string: bool = False) -> pd.DataFrame:
+    """Colunas object totalmente numéricas viram número; as demais ficam como estão
+    (ou viram string, com fallback_string). Não altera o DataFrame recebido."""
+    colunas = [c for c in df.columns if pd.api.types.is_object_dtype(df[c])]
+    if not colunas:
+        return df
+    df = df.copy(deep=False)
+    for col in colunas:
+        try:
+            df[col] = pd.to_numeric(df[col])
+        except (ValueError, TypeError):
+            if fallback_string:
+                df[col] = df[col].astype("string")
+    return df
+
+def _tipo_canonico(tipo: pa.DataType) -> pa.DataType:
+    if pa.types.is_dictionary(tipo):
+        return _tipo_canonico(tipo.value_type)
+    if pa.types.is_integer(tipo):
+        return pa.int64()
+    if pa.types.is_floating(tipo):
+        return pa.float64()
+    if pa.types.is_large_string(tipo):
+        return pa.string()
+    return tipo
+
+def tabela_canonica(table: pa.Table) -> pa.Table:
+    """Desfaz os tipos compactos (int8/16/32, float32, dicionário) antes de gravar."""
+    schema = pa.schema([f.with_type(_tipo_canonico(f.type)) for f in table.schema])
+    return table if schema.equals(table.schema) else table.cast(schema)
+
+def _no_schema(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """Converte um lote para o schema do arquivo; colunas de texto aceitam qualquer tipo."""
+    colunas = []
+    for f in schema:
+        col = table.column(f.name) if f.name in table.column_names else pa.nulls(table.num_rows, f.type)
+        colunas.append(col.cast(f.type))
+    return pa.Table.from_arrays(colunas, schema=schema)
+
+def gravar_lotes(lotes: Iterable[pd.DataFrame], key: str, s3, bucket: str,
+                 opcoes_parquet: Callable[[pa.Schema], dict] | None = None) -> int:
+    """Grava os lotes em um único Parquet (arquivo temporário local + upload multipart).
+
+    O schema é o do primeiro lote não vazio (colunas só com nulos nele viram
+    string); os seguintes são convertidos para ele, com as colunas de texto do
+    schema recebendo qualquer valor como texto. Os tipos das colunas fora do
+    SCHEMA_TIPOS vêm fixados de antemão (tipos_extras no new_script_silver.py).
+    opcoes_parquet(schema) devolve opções extras do ParquetWriter (row_group_size
+    vale para cada write_table). Retorna o total de linhas gravadas.
+    """
+    linhas, writer, row_group_size = 0, None, None
+    with tempfile.NamedTemporaryFile(suffix=".parquet") as tmp:
+        try:
+            for df in lotes:
+                if df.empty and writer is not None:
+                    continue
+                table = tabela_canonica(pa.Table.from_pandas(df, preserve_index=False))
+                if writer is None:
+                    schema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f
+                                        for f in table.schema])
+                    table = table.cast(schema)
+                    opcoes = dict(opcoes_parquet(table.schema)) if opcoes_parquet else {}
+                    row_group_size = opcoes.pop("row_group_size", None)
+                    writer = pq.ParquetWriter(tmp.name, table.schema, **opcoes)
+                elif not table.schema.equals(writer.schema):
+                    table = _no_schema(table, writer.schema)
+                writer.write_table(table, row_group_size=row_group_size)
+                linhas += table.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            return 0
+        s3.upload_file(tmp.name, bucket, key)
+    print(f"💾 Salvo em lotes: {key}  ({linhas} linhas)")
+    return linhas
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Camada Ouro (Gold) - cubos de vendas diários mantidos de forma incremental.
+
+Lê da Prata apenas os itens de pedido novos desde a última execução
+(id > marca d'água, filtro empurrado para os row groups), descobre os
+dias afetados (inclusive dias antigos, para itens que chegaram atrasados)
+e re-agrega somente esses dias. Itens cujo cabeçalho ainda não chegou
+ficam na lista de pendentes do controle e são relidos (por id) na próxima
+execução; a marca d'água avança até o maior id lido. Cabeçalhos são lidos só na faixa de
+id_pedido dos itens novos e, para os dias afetados, só na faixa de
+data_pedido deles; os itens desses dias vêm por filtro de id_pedido:
+
+ouro/vendas_dia_produto/data=YYYYMMDD/vendas_dia_produto_YYYYMMDD.parquet
+    dia × produto × categoria: quantidade, receita, itens, pedidos, clientes distintos
+ouro/vendas_dia_cliente/data=YYYYMMDD/vendas_dia_cliente_YYYYMMDD.parquet
+    dia × cliente: quantidade, receita, itens, pedidos
+
+O controle da execução fica em ouro/controle/vendas_estado.json.
+"""
+
+import json
+from datetime import datetime, timedelta
+from io import BytesIO
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from new_script_silver import (
+    s3, BUCKET, apply_schema, latest_silver_snapshot_keys, list_parquets, read_parquets_s3,
+)
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+PATH_OURO = "ouro/"
+ESTADO_KEY = f"{PATH_OURO}controle/vendas_estado.json"
+CUBO_PRODUTO = "vendas_dia_produto"
+CUBO_CLIENTE = "vendas_dia_cliente"
+
+# ============================================================
+# FUNÇÕES DE SUPORTE
+# ============================================================
+def ler_estado() -> dict:
+    """Lê o estado da última execução (marca d'água de pedido_itens.id)."""
+    try:
+        obj = s3.get_object(Bucket=BUCKET, Key=ESTADO_KEY)
+        estado = json.loads(obj["Body"].read().decode("utf-8"))
+        print(f"🕒 Último item agregado: id={estado.get('ultimo_id_item')}")
+        return estado
+    except s3.exceptions.NoSuchKey:
+        print("⚠️ Nenhum estado encontrado. Agregação inicial será executada.")
+        return {}
+
+def salvar_estado(estado: dict):
+    s3.put_object(Bucket=BUCKET, Key=ESTADO_KEY, Body=json.dumps(estado, indent=2).encode("utf-8"))
+    print(f"💧 Estado atualizado: {estado}")
+
+def ler_silver(table: str, columns=None, filters=None) -> pd.DataFrame:
+    """Lê o snapshot mais recente da tabela na Prata (vazio se não houver), só nas
+    colunas e row groups pedidos."""
+    keys = latest_silver_snapshot_keys(table)
+    if not keys:
+        return pd.DataFrame()
+    return apply_schema(table, pd.concat(read_parquets_s3(keys, columns=columns, filters=filters), ignore_index=True))
+
+def escrever_dia(df: pd.DataFrame, cubo: str, dia: str):
+    """Substitui a partição do dia no cubo (um arquivo pequeno por dia)."""
+    prefix = f"{PATH_OURO}{cubo}/data={dia}/"
+    antigos = list_parquets(prefix)
+    key = f"{prefix}{cubo}_{dia}.parquet"
+    buf = BytesIO()
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), buf)
+    s3.put_object(Bucket=BUCKET, Key=key, Body=buf.getvalue())
+    sobras = [{"Key": k} for k in antigos if k != key]
+    if sobras:
+        s3.delete_objects(Bucket=BUCKET, Delete={"Objects": sobras})
+
+# ============================================================
+# AGREGAÇÕES
+# ============================================================
+def agregar_dia_produto(fatos: pd.DataFrame) -> pd.DataFrame:
+    return (
+        fatos.groupby(["dia", "id_produto", "id_categoria", "categoria"], dropna=False)
+        .agg(
+            quantidade=("quantidade", "sum"),
+            receita=("receita", "sum"),
+            itens=("id", "count"),
+            pedidos=("id_pedido", "nunique"),
+            clientes_distintos=("id_cliente", "nunique"),
+        )
+        .reset_index()
+    )
+
+def agregar_dia_cliente(fatos: pd.DataFrame) -> pd.DataFrame:
+    return (
+        fatos.groupby(["dia", "id_cliente"], dropna=False)
+        .agg(
+            quantidade=("quantidade", "sum"),
+            receita=("receita", "sum"),
+            itens=("id", "count"),
+            pedidos=("id_pedido", "nunique"),
+        )
+        .reset_index()
+    )
+
+def montar_fatos(itens: pd.DataFrame, pedidos: pd.DataFrame,
+                 produtos: pd.DataFrame, categorias: pd.DataFrame) -> pd.DataFrame:
+    """Itens enriquecidos com dia, cliente, categoria e receita."""
+    fatos = itens.merge(
+        pedidos[["id", "id_cliente", "data_pedido"]].rename(columns={"id": "id_pedido"}),
+        on="id_pedido", how="inner",
+    )
+    fatos["dia"] = fatos["data_pedido"].dt.strftime("%Y%m%d")
+    fatos["receita"] = fatos["quantidade"].astype("float64") * fatos["preco_unitario"]
+    if not produtos.empty:
+        fatos = fatos.merge(
+            produtos[["id", "id_categoria"]].rename(columns={"id": "id_produto"}),
+            on="id_produto", how="left",
+        )
+    else:
+        fatos["id_categoria"] = pd.NA
+    if not categorias.empty:
+        fatos = fatos.merge(
+            categorias[["id", "nome"]].rename(columns={"id": "id_categoria", "nome": "categoria"}),
+            on="id_categoria", how="left",
+        )
+    else:
+        fatos["categoria"] = pd.NA
+    return fatos
+
+# ============================================================
+# EXECUÇÃO PRINCIPAL
+# ============================================================
+def main():
+    print("=== CAMADA OURO: VENDAS DIÁRIAS (incremental) ===")
+    estado = ler_estado()
+    ultimo_id = estado.get("ultimo_id_item")
+
+    colunas_itens = ["id", "id_pedido", "id_produto", "quantidade", "preco_unitario"]
+    colunas_pedidos = ["id", "id_cliente", "data_pedido"]
+    novos = ler_silver("pedido_itens", columns=colunas_itens,
+                       filters=[("id", ">", ultimo_id)] if ultimo_id is not None else None)
+    if estado.get("pendentes"):
+        aguardando = ler_silver("pedido_itens", columns=colunas_itens, filters=[("id", "in", estado["pendentes"])])
+        novos = pd.concat([aguardando, novos], ignore_index=True)
+    if novos.empty:
+        print("✅ Nenhum item novo desde a última execução.")
+        return
+    lidos = novos
+
+    ids_pedido = novos["id_pedido"].dropna()
+    pedidos = ler_silver(
+        "pedido_cabecalho", columns=colunas_pedidos,
+        filters=[("id", ">=", int(ids_pedido.min())), ("id", "<=", int(ids_pedido.max()))],
+    ) if not ids_pedido.empty else pd.DataFrame()
+    if pedidos.empty:
+        print("⚠️ Prata sem pedido_cabecalho para os itens novos. Nada a agregar.")
+        return
+
+    # itens cujo pedido ainda não chegou ficam para a próxima execução
+    com_pedido = novos["id_pedido"].isin(pedidos["id"])
+    pendentes = novos[~com_pedido]
+    novos = novos[com_pedido]
+    if not pendentes.empty:
+        print(f"⏳ {len(pendentes)} itens sem cabeçalho de pedido; serão reprocessados depois.")
+
+    dias_novos = novos.merge(
+        pedidos[["id", "data_pedido"]].rename(columns={"id": "id_pedido"}), on="id_pedido"
+    )["data_pedido"].dt.strftime("%Y%m%d")
+    dias_afetados = sorted(set(dias_novos.dropna()))
+    print(f"📊 {len(novos)} itens novos afetando {len(dias_afetados)} dia(s).")
+
+    if dias_afetados:
+        # re-agrega os dias afetados por completo (corrige contagens distintas): cabeçalhos
+        # na faixa de data_pedido dos dias, itens só desses pedidos
+        fim = datetime.strptime(dias_afetados[-1], "%Y%m%d") + timedelta(days=1)
+        pedidos_dias = ler_silver("pedido_cabecalho", columns=colunas_pedidos, filters=[
+            ("data_pedido", ">=", datetime.strptime(dias_afetados[0], "%Y%m%d")), ("data_pedido", "<", fim),
+        ])
+        pedidos_dias = pedidos_dias[pedidos_dias["data_pedido"].dt.strftime("%Y%m%d").isin(dias_afetados)]
+        itens_dias = ler_silver("pedido_itens", columns=colunas_itens,
+                                filters=[("id_pedido", "in", [int(i) for i in pedidos_dias["id"]])])
+        ids_produto = [int(i) for i in itens_dias["id_produto"].dropna().unique()]
+        produtos = ler_silver("produto", columns=["id", "id_categoria"],
+                              filters=[("id", "in", ids_produto)]) if ids_produto else pd.DataFrame()
+        ids_categoria = [int(i) for i in produtos["id_categoria"].dropna().unique()] if not produtos.empty else []
+        categorias = ler_silver("categorias_produto", columns=["id", "nome"],
+                                filters=[("id", "in", ids_categoria)]) if ids_categoria else pd.DataFrame()
+        fatos = montar_fatos(itens_dias, pedidos_dias, produtos, categorias)
+
+        cubo_produto = agregar_dia_produto(fatos)
+        cubo_cliente = agregar_dia_cliente(fatos)
+        for dia in dias_afetados:
+            escrever_dia(cubo_produto[cubo_produto["dia"] == dia], CUBO_PRODUTO, dia)
+            escrever_dia(cubo_cliente[cubo_cliente["dia"] == dia], CUBO_CLIENTE, dia)
+            print(f"💾 Dia {dia} atualizado.")
+
+    novo_ultimo = int(lidos["id"].max())
+    if ultimo_id is not None:
+        novo_ultimo = max(novo_ultimo, ultimo_id)
+    salvar_estado({
+        "ultimo_id_item": novo_ultimo,
+        "pendentes": [int(i) for i in pendentes["id"]],
+        "dias_atualizados": dias_afetados,
+        "executado_em": datetime.now().isoformat(timespec="seconds"),
+    })
+    print("\n✅ Camada Ouro atualizada com sucesso!")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,38 @@
+import argparse
 import boto3
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import time
 import pandas as pd
 import pyarrow.parquet as pq
 import pyarrow as pa
+import pyarrow.compute as pc
 from io import BytesIO
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from datetime import datetime
 
+from busca_pontual import opcoes_escrita, ordenar
+from leitor_parquet_s3 import iterar_lotes, ler_metadados, ler_parquet
+from memoria_compacta import (LINHAS_LOTE, ORCAMENTO_MB, compactar, gravar_lotes, memoria_mb,
+                              numericos_de_object, orcamento_bytes, tabela_canonica)
+from historico_produto import atualizar_historico, ultima_versao_por_id
+from qualidade_prata import verificar_gravacao
+from s3_async import ler_todos, listar_prefixos
+from schema_bronze import exigir_compativel
+from snapshots_prata import registrar_snapshot, snapshot_do_arquivo
+
 # ===================== CONFIG =====================
 BUCKET = "data-ingest"
 PATH_BRONZE = "bronze/dbloja/"
 PATH_PRATA  = "prata/dbloja/"
 WATERMARK_KEY = "prata/dbloja/controle/watermark_produto.txt"
+MANIFESTO_COMPACTACAO = "_compactacao.json"  # gravado por compactar_particoes.py
+MANIFESTO_FAIXAS = "_manifesto.json"         # gravado por extracao_faixas.py ao fim da extração
+SUCESSO_SPARK = "_SUCCESS"                   # gravado pelo Spark ao confirmar o dataset
+ENTRADAS_PREFIX = "prata/dbloja/controle/entradas/"  # arquivos Bronze usados no último full load
 
 s3 = boto3.client(
     "s3",
@@ -21,53 +44,142 @@ s3 = boto3.client(
 
 # ===================== HELPERS S3 =====================
 def list_parquets(prefix: str):
-    """Lista todos os .parquet em um prefixo (ordenados)."""
-    res = s3.list_objects_v2(Bucket=BUCKET, Prefix=prefix)
-    if "Contents" not in res:
-        return []
-    return sorted([o["Key"] for o in res["Contents"] if o["Key"].endswith(".parquet")])
-
-def read_parquet_s3(key: str) -> pd.DataFrame:
-    obj = s3.get_object(Bucket=BUCKET, Key=key)
-    return pd.read_parquet(BytesIO(obj["Body"].read()))
-
-def write_parquet_s3(df: pd.DataFrame, key: str):
-    df = df.where(pd.notnull(df), None)
-    for col in df.columns:
-        if pd.api.types.is_object_dtype(df[col]):
-            try:
-                df[col] = pd.to_numeric(df[col], errors="ignore")
-            except Exception:
-                pass
+    """Lista todos os .parquet em um prefixo (ordenados), já considerando compactações
+    e só com datasets em partes ({tabela}_D_T.parquet/part-*) confirmados.
+
+    Para prefixos "…/data=" as partições são descobertas com Delimiter e
+    listadas em paralelo (s3_async), em vez de uma paginação sequencial.
+    """
+    objetos, particoes = [], [prefix]
+    if prefix.endswith("data="):
+        particoes = []
+        for page in s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET, Prefix=prefix, Delimiter="/"):
+            particoes.extend(p["Prefix"] for p in page.get("CommonPrefixes", []))
+            objetos.extend(o["Key"] for o in page.get("Contents", []))
+    for chaves in listar_prefixos(s3, BUCKET, particoes).values():
+        objetos.extend(chaves)
+
+    keys = aplicar_datasets(objetos)
+    manifestos = [k for k in objetos if k.endswith(MANIFESTO_COMPACTACAO)]
+    return sorted(aplicar_compactacao(keys, manifestos))
+
+def aplicar_datasets(objetos: list[str]) -> list[str]:
+    """Parquets da listagem, sem partes de datasets não confirmados.
+
+    Um dataset em partes (pasta terminada em .parquet) só é lido depois do
+    commit: com _manifesto.json (extracao_faixas.py), só as partes que ele
+    lista; sem manifesto, só se o Spark gravou o _SUCCESS. Partes de uma
+    extração que falhou ou ainda está rodando ficam de fora.
+    """
+    presentes = set(objetos)
+    keys, datasets = [], {}
+    for k in objetos:
+        if not k.endswith(".parquet"):
+            continue
+        pasta = k.rsplit("/", 1)[0]
+        if pasta.endswith(".parquet"):
+            datasets.setdefault(pasta, []).append(k)
+        else:
+            keys.append(k)
+    for pasta, partes in datasets.items():
+        if f"{pasta}/{MANIFESTO_FAIXAS}" in presentes:
+            obj = s3.get_object(Bucket=BUCKET, Key=f"{pasta}/{MANIFESTO_FAIXAS}")
+            listadas = {p["key"] for p in json.loads(obj["Body"].read().decode("utf-8"))["partes"]}
+            keys.extend(k for k in partes if k in listadas)
+        elif f"{pasta}/{SUCESSO_SPARK}" in presentes:
+            keys.extend(partes)
+    return keys
+
+def aplicar_compactacao(keys: list[str], manifestos: list[str]) -> list[str]:
+    """Esconde arquivos já substituídos pela compactação e saídas ainda não confirmadas.
+
+    O manifesto da partição é o ponto de commit: enquanto ele não lista um
+    arquivo "compactado", esse arquivo é ignorado; depois disso, os arquivos
+    pequenos que ele substituiu deixam de ser lidos (mesmo antes de apagados).
+    """
+    if not manifestos and not any("compactado" in k for k in keys):
+        return keys
+    confirmados, substituidos = set(), set()
+    for m in manifestos:
+        dados = json.loads(s3.get_object(Bucket=BUCKET, Key=m)["Body"].read().decode("utf-8"))
+        confirmados.update(dados.get("arquivos", []))
+        substituidos.update(dados.get("substitui", []))
+    return [k for k in keys if k not in substituidos and ("compactado" not in k or k in confirmados)]
+
+def read_parquet_s3(key: str, columns=None, filters=None) -> pd.DataFrame:
+    """Lê Parquet do MinIO por range requests (só colunas/row groups necessários)."""
+    return ler_parquet(key, columns=columns, filters=filters, bucket=BUCKET)
+
+def read_parquets_s3(keys: list[str], columns=None, filters=None) -> list[pd.DataFrame]:
+    """Lê vários Parquets em paralelo (s3_async), devolvendo na ordem das keys."""
+    return ler_todos(lambda k: read_parquet_s3(k, columns=columns, filters=filters), keys)
+
+def write_parquet_s3(df: pd.DataFrame, key: str, compacto: bool = False):
+    """Grava na Prata; com compacto (DataFrame saído do compactar), volta ao schema normal."""
+    # nulos (NaN/None/NA) já viram null no Arrow: sem df.where, que copiava tudo para object
+    df = numericos_de_object(df)
     buf = BytesIO()
     table = pa.Table.from_pandas(df, preserve_index=False, safe=True)
-    pq.write_table(table, buf)
+    if compacto:
+        table = tabela_canonica(table)
+    # entidades de busca pontual: ordenadas pela chave, com bloom filters e page index
+    table = ordenar(key, table)
+    pq.write_table(table, buf, **opcoes_escrita(key, table.schema))
     s3.put_object(Bucket=BUCKET, Key=key, Body=buf.getvalue())
     print(f"💾 Salvo: {key}  ({len(df)} linhas)")
+    verificar_gravacao(key, table)
 
-def latest_silver_snapshot_key(table: str) -> str | None:
-    """Retorna o arquivo mais recente da PRATA para a tabela, se existir."""
-    keys = list_parquets(f"{PATH_PRATA}{table}/data=")
-    return keys[-1] if keys else None
+def latest_silver_snapshot_keys(table: str) -> list[str]:
+    """Retorna os arquivos do snapshot mais recente da PRATA para a tabela."""
+    return snapshot_mais_recente(f"{PATH_PRATA}{table}/")
+
+def snapshot_mais_recente(prefixo: str) -> list[str]:
+    """Arquivos do snapshot mais recente sob prefixo/data= (Prata db_loja ou JSON).
+
+    Snapshots do pandas são um único arquivo; os da engine Spark são os
+    part-*.parquet de um dataset {tabela}_D_T.parquet/ (ou, no layout
+    antigo, direto na partição data=). O mais recente é o de maior
+    instante D_T da execução que o gravou, não o último na ordem das keys
+    ("part-" ordena entre nomes de tabela quando as engines dividem o dia).
+    """
+    keys = list_parquets(f"{prefixo}data=")
+    if not keys:
+        return []
+    snapshots = {}
+    for k in keys:
+        snapshots.setdefault(snapshot_do_arquivo(k), []).append(k)
+    return snapshots[max(snapshots)]
 
 # ===================== SCHEMA =====================
-def apply_schema(table: str, df: pd.DataFrame) -> pd.DataFrame:
-    types = {
-        "produto": {
-            "id": "Int64", "nome": "string", "descricao": "string",
-            "preco": "float64", "estoque": "Int64", "id_categoria": "Int64",
-            "data_criacao": "datetime64[ns]", "data_atualizacao": "datetime64[ns]"
-        },
-        "categorias_produto": {"id": "Int64", "nome": "string", "descricao": "string"},
-        "cliente": {"id": "Int64", "nome": "string", "email": "string",
-                    "telefone": "string", "data_cadastro": "datetime64[ns]"},
-        "pedido_cabecalho": {"id": "Int64", "id_cliente": "Int64",
-                             "data_pedido": "datetime64[ns]", "valor_total": "float64"},
-        "pedido_itens": {"id": "Int64", "id_pedido": "Int64", "id_produto": "Int64",
-                         "quantidade": "Int64", "preco_unitario": "float64"},
-    }
-    if table in types:
-        for col, typ in types[table].items():
+SCHEMA_TIPOS = {
+    "produto": {
+        "id": "Int64", "nome": "string", "descricao": "string",
+        "preco": "float64", "estoque": "Int64", "id_categoria": "Int64",
+        "data_criacao": "datetime64[ns]", "data_atualizacao": "datetime64[ns]"
+    },
+    "categorias_produto": {"id": "Int64", "nome": "string", "descricao": "string"},
+    "cliente": {"id": "Int64", "nome": "string", "email": "string",
+                "telefone": "string", "data_cadastro": "datetime64[ns]"},
+    "pedido_cabecalho": {"id": "Int64", "id_cliente": "Int64",
+                         "data_pedido": "datetime64[ns]", "valor_total": "float64"},
+    "pedido_itens": {"id": "Int64", "id_pedido": "Int64", "id_produto": "Int64",
+                     "quantidade": "Int64", "preco_unitario": "float64"},
+}
+
+def apply_schema(table: str, df: pd.DataFrame, extras: dict | None = None) -> pd.DataFrame:
+    """Tipa as colunas de SCHEMA_TIPOS; as demais colunas object viram Int64 (só dígitos) ou string.
+
+    `extras` ({coluna: "Int64" | "string"}, de tipos_extras) fixa o tipo das colunas fora
+    de SCHEMA_TIPOS: no modo em lotes a inferência por lote daria tipos diferentes entre lotes.
+    """
+    for col, typ in (extras or {}).items():
+        if col in df.columns:
+            if typ == "Int64":
+                df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+            else:
+                df[col] = df[col].astype("string")
+    if table in SCHEMA_TIPOS:
+        for col, typ in SCHEMA_TIPOS[table].items():
             if col in df.columns:
                 try:
                     if typ == "Int64":
@@ -89,58 +201,420 @@ def apply_schema(table: str, df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 # ===================== FULL LOAD =====================
-def silver_full_from_bronze(table: str, run_date: str, run_time: str):
-    print(f"\n🚀 FULL LOAD: {table}")
-    bronze_files = list_parquets(f"{PATH_BRONZE}data=")
-    bronze_files = [k for k in bronze_files if f"/{table}_" in k]
+def assinatura_entradas(keys: list[str]) -> str:
+    return hashlib.sha256("\n".join(sorted(keys)).encode("utf-8")).hexdigest()
+
+def ler_entradas(table: str) -> dict:
+    try:
+        obj = s3.get_object(Bucket=BUCKET, Key=f"{ENTRADAS_PREFIX}{table}.json")
+        return json.loads(obj["Body"].read().decode("utf-8"))
+    except s3.exceptions.NoSuchKey:
+        return {}
+
+def entradas_inalteradas(table: str, keys: list[str]) -> bool:
+    """True se o último full load da tabela leu exatamente estes arquivos da Bronze.
+
+    Tabelas sem alteração na origem não ganham arquivo novo na Bronze
+    (fingerprint do controle_produto.py), então a Prata também é mantida.
+    """
+    if not latest_silver_snapshot_keys(table):
+        return False
+    return ler_entradas(table).get("assinatura") == assinatura_entradas(keys)
+
+def registrar_entradas(table: str, keys: list[str], **extras):
+    registro = {
+        "assinatura": assinatura_entradas(keys),
+        "arquivos": len(keys),
+        "ultimo": max(keys),
+        "processado_em": datetime.now().isoformat(timespec="seconds"),
+        **extras,
+    }
+    s3.put_object(Bucket=BUCKET, Key=f"{ENTRADAS_PREFIX}{table}.json",
+                  Body=json.dumps(registro, indent=2).encode("utf-8"))
+
+def arquivos_bronze(table: str, alteracoes: bool = False) -> list[str]:
+    """Arquivos da tabela na Bronze: extrações completas ou conjuntos de alterações (diff_dbloja.py)."""
+    marca_alt = f"/{table}_alteracoes_"
+    keys = [k for k in list_parquets(f"{PATH_BRONZE}data=") if f"/{table}_" in k]
+    if alteracoes:
+        return [k for k in keys if marca_alt in k]
+    return [k for k in keys if marca_alt not in k]
+
+def lote_do_arquivo(key: str) -> str:
+    """YYYYMMDD_HHMMSS do nome do arquivo na Bronze (também para part-files do Spark)."""
+    m = re.search(r"_(\d{8}_\d{6})", key.split("/data=", 1)[1])
+    return m.group(1) if m else ""
+
+def tipos_extras(keys: list[str], table: str) -> dict:
+    """Tipo das colunas de texto fora de SCHEMA_TIPOS, decidido uma vez para todos os arquivos.
+
+    Mesma regra do apply_schema sobre a tabela inteira: Int64 se todos os valores
+    (de todos os arquivos) forem dígitos ou nulos, senão string. Só as colunas de
+    texto são relidas (projeção), lote a lote.
+    """
+    def e_texto(tipo: pa.DataType) -> bool:
+        return pa.types.is_string(tipo) or pa.types.is_large_string(tipo)
+
+    declaradas = set(SCHEMA_TIPOS.get(table, {}))
+    schemas = {k: ler_metadados(k, bucket=BUCKET).schema.to_arrow_schema() for k in keys}
+    texto = sorted({f.name for sch in schemas.values() for f in sch if f.name not in declaradas and e_texto(f.type)})
+    if not texto:
+        return {}
+    digitos = dict.fromkeys(texto, True)
+    for key, schema in schemas.items():
+        tipos = {col: schema.field(col).type for col in texto if schema.get_field_index(col) >= 0}
+        for col, tipo in tipos.items():
+            if not (e_texto(tipo) or pa.types.is_integer(tipo)):
+                digitos[col] = False  # float, data... misturados com texto: fica string
+        colunas = [col for col, tipo in tipos.items() if digitos[col] and e_texto(tipo)]
+        if not colunas:
+            continue
+        for batch in iterar_lotes(key, columns=colunas, bucket=BUCKET, linhas=LINHAS_LOTE):
+            for col in colunas:
+                if digitos[col] and pc.all(pc.utf8_is_digit(batch.column(col))).as_py() is False:
+                    digitos[col] = False
+    return {col: "Int64" if ok else "string" for col, ok in digitos.items()}
+
+def lotes_bronze(keys: list[str], table: str, filters=None):
+    """DataFrames tipados e compactos de LINHAS_LOTE linhas, arquivo a arquivo (mesmos tipos em todos)."""
+    extras = tipos_extras(keys, table)
+    for key in keys:
+        for batch in iterar_lotes(key, filters=filters, bucket=BUCKET, linhas=LINHAS_LOTE):
+            yield compactar(apply_schema(table, batch.to_pandas(), extras))
+
+def silver_full_from_bronze(table: str, run_date: str, run_time: str,
+                            compacto: bool = False, em_lotes: bool = False):
+    print(f"\n🚀 FULL LOAD: {table}{' (em lotes)' if em_lotes else ''}")
+    bronze_files = arquivos_bronze(table)
     if not bronze_files:
         print(f"⚠️ Bronze sem arquivos para {table}.")
         return
-    dfs = [read_parquet_s3(k) for k in bronze_files]
+    if entradas_inalteradas(table, bronze_files):
+        print(f"⏭️ {table}: nenhum arquivo novo na Bronze. Snapshot da Prata mantido.")
+        return
+    exigir_compativel(f"dbloja_{table}", bronze_files[-1])
+    # novo formato de pasta
+    key = f"{PATH_PRATA}{table}/data={run_date}/{table}_{run_date}_{run_time}.parquet"
+    if em_lotes:
+        gravar_lotes(lotes_bronze(bronze_files, table), key, s3, BUCKET,
+                     opcoes_parquet=lambda schema: opcoes_escrita(key, schema, ordenado=False))
+        verificar_gravacao(key)
+        registrar_snapshot(table, [key], run_date, run_time)
+        registrar_entradas(table, bronze_files)
+        return
+
+    dfs = read_parquets_s3(bronze_files)
     df = apply_schema(table, pd.concat(dfs, ignore_index=True))
+    del dfs
+    if compacto:
+        df = compactar(df)
+        print(f"🧮 {table}: {memoria_mb(df):,.1f} MB em memória (tipos compactos)")
+    write_parquet_s3(df, key, compacto)
+    registrar_snapshot(table, [key], run_date, run_time)
+    registrar_entradas(table, bronze_files)
 
-    # novo formato de pasta
+# ===================== ALTERAÇÕES (ROW-HASH) =====================
+def aplicar_alteracoes(df_silver: pd.DataFrame, df_alt: pd.DataFrame) -> pd.DataFrame:
+    """Aplica I/U/D por id; a última alteração (_lote) de cada id prevalece."""
+    df_alt = df_alt.sort_values("_lote", kind="stable").drop_duplicates("id", keep="last")
+    upserts = df_alt[df_alt["_operacao"] != "D"].drop(columns=["_operacao", "_lote"])
+    mantidos = df_silver[~df_silver["id"].isin(df_alt["id"])]
+    return pd.concat([mantidos, upserts], ignore_index=True).sort_values("id").reset_index(drop=True)
+
+def aplicar_alteracoes_em_lotes(lotes, df_alt: pd.DataFrame):
+    """Versão em lotes de aplicar_alteracoes: os upserts saem no último lote (sem reordenar por id)."""
+    df_alt = df_alt.sort_values("_lote", kind="stable").drop_duplicates("id", keep="last")
+    ids = df_alt["id"]
+    for df in lotes:
+        yield df[~df["id"].isin(ids)]
+    yield df_alt[df_alt["_operacao"] != "D"].drop(columns=["_operacao", "_lote"])
+
+def silver_diff_from_bronze(table: str, run_date: str, run_time: str,
+                            compacto: bool = False, em_lotes: bool = False):
+    """Prata de tabela em modo diferença: snapshot anterior + alterações novas.
+
+    A base é a extração completa mais recente da Bronze; enquanto ela não
+    muda, só as linhas de alterações com _lote posterior ao último aplicado
+    são lidas (filtro empurrado para os row groups).
+    """
+    print(f"\n🚀 ALTERAÇÕES (ROW-HASH): {table}")
+    completos = arquivos_bronze(table)
+    if not completos:
+        print(f"⚠️ Bronze sem extração completa para {table}.")
+        return
+    lote_base = max(lote_do_arquivo(k) for k in completos)
+    base_keys = [k for k in completos if lote_do_arquivo(k) == lote_base]
+    exigir_compativel(f"dbloja_{table}", base_keys[-1])
+
+    registro = ler_entradas(table)
+    snapshot = latest_silver_snapshot_keys(table)
+    incremental = bool(snapshot) and registro.get("lote_base") == lote_base
+    desde = registro.get("ultimo_lote", lote_base) if incremental else lote_base
+
+    alt_keys = [k for k in arquivos_bronze(table, alteracoes=True) if k.split("/data=")[1][:8] >= desde[:8]]
+    dfs_alt = [d for d in read_parquets_s3(alt_keys, filters=[("_lote", ">", desde)]) if not d.empty]
+    df_alt = pd.concat(dfs_alt, ignore_index=True) if dfs_alt else pd.DataFrame()
+    if incremental and df_alt.empty:
+        print(f"⏭️ {table}: nenhuma alteração nova na Bronze. Snapshot da Prata mantido.")
+        return
+
+    origem = snapshot if incremental else base_keys
     key = f"{PATH_PRATA}{table}/data={run_date}/{table}_{run_date}_{run_time}.parquet"
-    write_parquet_s3(df, key)
+    if not df_alt.empty:
+        print(f"🔁 {len(df_alt)} alterações a aplicar ({df_alt['_operacao'].value_counts().to_dict()})")
+    if em_lotes:
+        lotes = lotes_bronze(origem, table)
+        if not df_alt.empty:
+            lotes = aplicar_alteracoes_em_lotes(lotes, apply_schema(table, df_alt))
+        gravar_lotes(lotes, key, s3, BUCKET,
+                     opcoes_parquet=lambda schema: opcoes_escrita(key, schema, ordenado=False))
+        verificar_gravacao(key)
+    else:
+        df = apply_schema(table, pd.concat(read_parquets_s3(origem), ignore_index=True))
+        if not df_alt.empty:
+            df = aplicar_alteracoes(df, apply_schema(table, df_alt))
+        df = apply_schema(table, df)
+        write_parquet_s3(compactar(df) if compacto else df, key, compacto)
+    registrar_snapshot(table, [key], run_date, run_time)
+    registrar_entradas(
+        table, base_keys, lote_base=lote_base,
+        ultimo_lote=df_alt["_lote"].max() if not df_alt.empty else desde,
+    )
 
 # ===================== INCREMENTAL PRODUTO =====================
-def silver_merge_produto_from_bronze(run_date: str, run_time: str):
-    print("\n🚀 INCREMENTAL (MERGE) : produto")
+def merge_produto(df_silver: pd.DataFrame, df_delta: pd.DataFrame) -> pd.DataFrame:
+    """Upsert por id: valores não nulos do delta sobrescrevem a Prata; ids novos são anexados.
+
+    ids repetidos (no delta ou na Prata) ficam só com a última versão: set_index/update
+    com índice duplicado não atualiza as linhas certas.
+    """
+    s = ultima_versao_por_id(df_silver).set_index("id")
+    d = ultima_versao_por_id(df_delta).set_index("id")
+    # colunas novas do delta (evolução compatível do schema) entram anuláveis
+    for col in d.columns.difference(s.columns):
+        s[col] = pd.Series(index=s.index, dtype=d[col].dtype)
+    s.update(d)
+    novos = d.loc[~d.index.isin(s.index)]
+    return pd.concat([s, novos]).reset_index()
+
+def merge_produto_em_lotes(lotes, df_delta: pd.DataFrame):
+    """Versão em lotes de merge_produto: atualiza cada lote do snapshot; ids novos saem no fim."""
+    d = ultima_versao_por_id(df_delta).set_index("id")
+    existentes = set()
+    for df in lotes:
+        s = ultima_versao_por_id(df).set_index("id")
+        for col in d.columns.difference(s.columns):
+            s[col] = pd.Series(index=s.index, dtype=d[col].dtype)
+        existentes.update(s.index.intersection(d.index))
+        s.update(d)
+        yield compactar(s.reset_index())
+    yield d.loc[~d.index.isin(existentes)].reset_index()
+
+def silver_merge_produto_from_bronze(run_date: str, run_time: str,
+                                     compacto: bool = False, em_lotes: bool = False):
+    print(f"\n🚀 INCREMENTAL (MERGE) : produto{' (em lotes)' if em_lotes else ''}")
     bronze_files = list_parquets(f"{PATH_BRONZE}data=")
     bronze_prod = [k for k in bronze_files if "/produto_" in k]
     if not bronze_prod:
         print("⚠️ Bronze sem arquivos de produto.")
         return
     delta_key = bronze_prod[-1]
+    exigir_compativel("dbloja_produto", delta_key)
     df_delta = apply_schema("produto", read_parquet_s3(delta_key))
 
-    last_snap_key = latest_silver_snapshot_key("produto")
-    if last_snap_key:
-        df_silver = apply_schema("produto", read_parquet_s3(last_snap_key))
-        s = df_silver.set_index("id")
-        d = df_delta.set_index("id")
-        s.update(d)
-        novos = d.loc[~d.index.isin(s.index)]
-        df_final = pd.concat([s, novos]).reset_index()
+    last_snap_keys = latest_silver_snapshot_keys("produto")
+    key = f"{PATH_PRATA}produto/data={run_date}/produto_{run_date}_{run_time}.parquet"
+    if em_lotes and last_snap_keys:
+        # sem compactar antes do update: valores do delta podem não caber no tipo reduzido
+        extras = tipos_extras(last_snap_keys, "produto")
+        lotes = (apply_schema("produto", b.to_pandas(), extras)
+                 for k in last_snap_keys for b in iterar_lotes(k, bucket=BUCKET, linhas=LINHAS_LOTE))
+        gravar_lotes(merge_produto_em_lotes(lotes, df_delta), key, s3, BUCKET,
+                     opcoes_parquet=lambda schema: opcoes_escrita(key, schema, ordenado=False))
+        verificar_gravacao(key)
+        registrar_snapshot("produto", [key], run_date, run_time)
+        atualizar_historico(s3, df_delta, run_date, run_time,
+                            base=lambda: apply_schema("produto", read_parquet_s3(key)))
+        return
+    if last_snap_keys:
+        df_silver = apply_schema("produto", pd.concat(read_parquets_s3(last_snap_keys), ignore_index=True))
+        df_final = merge_produto(df_silver, df_delta)
     else:
         print("ℹ️ Não há snapshot anterior na Prata. Criando o primeiro snapshot.")
         df_final = df_delta
 
-    key = f"{PATH_PRATA}produto/data={run_date}/produto_{run_date}_{run_time}.parquet"
-    write_parquet_s3(apply_schema("produto", df_final), key)
+    df_final = apply_schema("produto", df_final)
+    write_parquet_s3(compactar(df_final) if compacto else df_final, key, compacto)
+    registrar_snapshot("produto", [key], run_date, run_time)
+    atualizar_historico(s3, df_delta, run_date, run_time, base=lambda: df_final)
+
+def historico_produto_spark(run_date: str, run_time: str):
+    """Histórico SCD2 do produto quando o merge roda na engine Spark (mesmo delta da Bronze)."""
+    bronze_prod = [k for k in list_parquets(f"{PATH_BRONZE}data=") if "/produto_" in k]
+    snap_keys = latest_silver_snapshot_keys("produto")
+    if not bronze_prod or not snap_keys:
+        return
+    df_delta = apply_schema("produto", read_parquet_s3(bronze_prod[-1]))
+    atualizar_historico(s3, df_delta, run_date, run_time,
+                        base=lambda: apply_schema("produto", pd.concat(read_parquets_s3(snap_keys), ignore_index=True)))
+
+# ===================== EXECUÇÃO PARALELA =====================
+TABELAS_SILVER = ["categorias_produto", "cliente", "pedido_cabecalho", "pedido_itens", "produto"]
+MAX_PROCESSOS = 4
+FATOR_MEMORIA = 10      # bytes em memória (pandas) por byte de Parquet lido
+FRACAO_MEMORIA = 0.7    # fração da memória disponível reservada para as tabelas
+# Orçamento de memória (MB) por tabela; sobrepõe o da execução (SILVER_ORCAMENTO_MB / --orcamento-mb).
+# Com orçamento, a tabela usa tipos compactos e, se a estimativa passar dele, roda em lotes.
+ORCAMENTO_TABELAS = {}
+
+def memoria_disponivel() -> int:
+    """Memória disponível em bytes (MemAvailable do /proc/meminfo)."""
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as f:
+            for linha in f:
+                if linha.startswith("MemAvailable:"):
+                    return int(linha.split()[1]) * 1024
+    except OSError:
+        pass
+    return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+
+def estimar_memoria(tables: list[str]) -> dict:
+    """Pico de memória estimado por tabela, proporcional ao Parquet que ela lê."""
+    tamanhos = {}
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET, Prefix=f"{PATH_BRONZE}data="):
+        for o in page.get("Contents", []):
+            tamanhos[o["Key"]] = o["Size"]
+    estimativas = {}
+    for tbl in tables:
+        keys = [k for k in tamanhos if f"/{tbl}_" in k]
+        if tbl == "produto":
+            # merge: último delta da Bronze + snapshot atual da Prata
+            keys = sorted(keys)[-1:]
+            lidos = sum(s3.head_object(Bucket=BUCKET, Key=k)["ContentLength"] for k in latest_silver_snapshot_keys(tbl))
+        else:
+            lidos = 0
+        estimativas[tbl] = (lidos + sum(tamanhos[k] for k in keys)) * FATOR_MEMORIA
+    return estimativas
+
+def orcamentos_por_tabela(tables: list[str], orcamento_mb: int | None = None) -> dict:
+    """{tabela: orçamento em bytes ou None (modo desligado)}."""
+    return {t: orcamento_bytes(ORCAMENTO_TABELAS.get(t, orcamento_mb)) for t in tables}
+
+def processar_tabela(tbl: str, run_date: str, run_time: str,
+                     orcamento: int | None = None, estimativa: int = 0) -> dict:
+    """Processa uma tabela e devolve o resultado (o erro não interrompe as demais)."""
+    inicio = time.time()
+    modo = {"compacto": orcamento is not None, "em_lotes": orcamento is not None and estimativa > orcamento}
+    try:
+        if tbl == "produto":
+            silver_merge_produto_from_bronze(run_date, run_time, **modo)
+        elif arquivos_bronze(tbl, alteracoes=True):
+            silver_diff_from_bronze(tbl, run_date, run_time, **modo)
+        else:
+            silver_full_from_bronze(tbl, run_date, run_time, **modo)
+        return {"tabela": tbl, "ok": True, "segundos": time.time() - inicio, **modo}
+    except Exception as e:
+        return {"tabela": tbl, "ok": False, "erro": repr(e), "segundos": time.time() - inicio}
+
+def run_silver_pandas(tables: list[str], run_date: str, run_time: str, processos: int | None = None,
+                      orcamento_mb: int | None = None) -> list[dict]:
+    """Distribui as tabelas em um pool de processos respeitando o orçamento de memória.
+
+    As maiores entram primeiro; uma tabela só começa se couber no orçamento
+    junto com as que já estão rodando (ou se for a única em execução).
+    Tabelas com orçamento próprio (modo compacto/em lotes) reservam no
+    máximo esse orçamento.
+    """
+    processos = processos or min(MAX_PROCESSOS, os.cpu_count() or 1, max(len(tables), 1))
+    estimativas = estimar_memoria(tables)
+    orcamentos = orcamentos_por_tabela(tables, orcamento_mb)
+    for tbl, limite in orcamentos.items():
+        if limite is not None and estimativas[tbl] > limite:
+            print(f"🧮 {tbl}: estimativa {estimativas[tbl] / 2**20:,.0f} MB > orçamento "
+                  f"{limite / 2**20:,.0f} MB → processamento em lotes")
+    reservas = {t: min(estimativas[t], orcamentos[t] or estimativas[t]) for t in tables}
+    orcamento = int(memoria_disponivel() * FRACAO_MEMORIA)
+    fila = sorted(tables, key=lambda t: reservas[t], reverse=True)
+    print(f"🧮 Orçamento de memória: {orcamento / 2**20:,.0f} MB | "
+          + ", ".join(f"{t}≈{reservas[t] / 2**20:,.0f} MB" for t in fila))
+
+    resultados, em_execucao = [], {}
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processos, mp_context=contexto, max_tasks_per_child=1) as pool:
+        while fila or em_execucao:
+            reservado = sum(reservas[t] for t in em_execucao.values())
+            for tbl in list(fila):
+                if len(em_execucao) >= processos:
+                    break
+                if em_execucao and reservado + reservas[tbl] > orcamento:
+                    continue
+                fila.remove(tbl)
+                futuro = pool.submit(processar_tabela, tbl, run_date, run_time, orcamentos[tbl], estimativas[tbl])
+                em_execucao[futuro] = tbl
+                reservado += reservas[tbl]
+
+            prontos, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                tbl = em_execucao.pop(futuro)
+                try:
+                    r = futuro.result()
+                except Exception as e:  # processo morto (ex.: OOM)
+                    r = {"tabela": tbl, "ok": False, "erro": repr(e), "segundos": 0.0}
+                resultados.append(r)
+                icone = "✅" if r["ok"] else "❌"
+                print(f"{icone} {tbl} ({r['segundos']:.1f}s){'' if r['ok'] else ' ' + r['erro']}")
+    return resultados
 
 # ===================== MAIN =====================
+# Engine por tabela: "pandas" (padrão) ou "spark" (new_script_silver_spark.py) para tabelas grandes.
+ENGINE_SILVER = {
+    "categorias_produto": "pandas",
+    "cliente": "pandas",
+    "pedido_cabecalho": "pandas",
+    "pedido_itens": "pandas",
+    "produto": "pandas",
+}
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga da Prata (db_loja)")
+    parser.add_argument("--orcamento-mb", type=int, default=ORCAMENTO_MB or None,
+                        help="orçamento de memória por tabela (tipos compactos e lotes); padrão: SILVER_ORCAMENTO_MB")
+    args = parser.parse_args()
+
     print("=== INICIANDO CARGA PARA PRATA (estrutura por tabela) ===")
     run_date = datetime.now().strftime("%Y%m%d")
     run_time = datetime.now().strftime("%H%M%S")
 
-    # FULL LOAD
-    for tbl in ["categorias_produto", "cliente", "pedido_cabecalho", "pedido_itens"]:
-        silver_full_from_bronze(tbl, run_date, run_time)
+    # tabelas com alterações row-hash na Bronze seguem pelo pandas: só o delta é lido
+    spark_tables = [
+        t for t in TABELAS_SILVER
+        if ENGINE_SILVER.get(t) == "spark" and (t == "produto" or not arquivos_bronze(t, alteracoes=True))
+    ]
+    pandas_tables = [t for t in TABELAS_SILVER if t not in spark_tables]
+
+    resultados = run_silver_pandas(pandas_tables, run_date, run_time, orcamento_mb=args.orcamento_mb) if pandas_tables else []
+
+    if spark_tables:
+        from new_script_silver_spark import run_silver_spark
+        print(f"\n⚡ Processando com Spark: {', '.join(spark_tables)}")
+        inicio = time.time()
+        try:
+            run_silver_spark(spark_tables, run_date, run_time)
+            for t in spark_tables:
+                registrar_snapshot(t, latest_silver_snapshot_keys(t), run_date, run_time)
+            if "produto" in spark_tables:
+                historico_produto_spark(run_date, run_time)
+            resultados += [{"tabela": t, "ok": True, "segundos": time.time() - inicio} for t in spark_tables]
+        except Exception as e:
+            resultados += [{"tabela": t, "ok": False, "erro": repr(e), "segundos": time.time() - inicio}
+                           for t in spark_tables]
 
-    # INCREMENTAL produto
-    silver_merge_produto_from_bronze(run_date, run_time)
+    falhas = [r for r in resultados if not r["ok"]]
+    if falhas:
+        print("\n❌ Tabelas com falha:")
+        for r in falhas:
+            print(f"   - {r['tabela']}: {r['erro']}")
+        raise SystemExit(1)
 
     print("\n✅ Finalizado! Estrutura de saída:")
     print(f"👉 {PATH_PRATA}<tabela>/data={run_date}/<tabela>_{run_date}_{run_time}.parquet")
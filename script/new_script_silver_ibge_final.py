@@ -7,12 +7,16 @@ import pyarrow.parquet as pq
 from datetime import datetime
 import re
 
+from cache_s3 import obter
+from schema_bronze import exigir_compativel
+
 # ============================================================
 # CONFIGURAÇÕES
 # ============================================================
 BUCKET = "data-ingest"
 PATH_BRONZE_IBGE = "bronze/ibge/"
 PATH_SILVER_IBGE = "prata/ibge_uf/"
+PATH_SILVER_MUNICIPIOS = "prata/ibge_municipios/"
 
 s3 = boto3.client(
     "s3",
@@ -27,10 +31,10 @@ s3 = boto3.client(
 # ============================================================
 def list_keys(prefix: str):
     """Lista objetos dentro de um prefixo S3."""
-    res = s3.list_objects_v2(Bucket=BUCKET, Prefix=prefix)
-    if "Contents" not in res:
-        return []
-    return [o["Key"] for o in res["Contents"]]
+    keys = []
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET, Prefix=prefix):
+        keys.extend(o["Key"] for o in page.get("Contents", []))
+    return keys
 
 def latest_date_folder(prefix: str) -> str | None:
     """Detecta automaticamente a última pasta data=YYYYMMDD."""
@@ -43,10 +47,19 @@ def latest_date_folder(prefix: str) -> str | None:
             dates.add(m.group(1))
     return sorted(dates)[-1] if dates else None
 
+def arquivo_atual(padrao: str, ate: str, prefixo: str = PATH_BRONZE_IBGE) -> str | None:
+    """Arquivo mais recente da fonte em qualquer partição data= até `ate`.
+
+    A Bronze só ganha arquivo novo quando o payload muda (ingestao_api), então
+    UFs e municípios podem estar em partições diferentes.
+    """
+    pat = re.compile(rf"/data=(\d{{8}})/{padrao}[^/]*\.json$")
+    keys = [k for k in list_keys(prefixo) if (m := pat.search(k)) and m.group(1) <= ate]
+    return max(keys) if keys else None
+
 def read_json_from_s3(key: str):
     """Lê e carrega um JSON diretamente do MinIO."""
-    obj = s3.get_object(Bucket=BUCKET, Key=key)
-    return json.loads(obj["Body"].read().decode("utf-8"))
+    return json.loads(obter(s3, BUCKET, key).decode("utf-8"))
 
 def write_parquet_s3(df: pd.DataFrame, key: str):
     """Salva DataFrame como arquivo Parquet no S3."""
@@ -68,27 +81,25 @@ def delete_prefix(prefix: str):
 # ============================================================
 # PROCESSAMENTO IBGE → ibge_uf/
 # ============================================================
-def process_ibge_uf():
+def process_ibge_uf(run_date: str | None = None, run_time: str | None = None):
     print("=== PROCESSAMENTO IBGE (UF) → CAMADA PRATA ===")
 
-    # Detecta a pasta data=YYYYMMDD mais recente
-    run_date = latest_date_folder(PATH_BRONZE_IBGE)
+    # Sem data informada (backfill_prata.py), usa a pasta data=YYYYMMDD mais recente
+    run_date = run_date or latest_date_folder(PATH_BRONZE_IBGE)
     if not run_date:
         print("❌ Nenhuma pasta data=YYYYMMDD encontrada em bronze/ibge/")
         raise SystemExit(1)
 
-    run_time = datetime.now().strftime("%H%M%S")
+    run_time = run_time or datetime.now().strftime("%H%M%S")
 
-    prefix = f"{PATH_BRONZE_IBGE}data={run_date}/"
-    # 🔍 Aceita arquivos ibge-uf_*, ibge_uf_*, ou uf_*
-    keys = [k for k in list_keys(prefix) if re.search(r"(ibge[-_]?uf)", k) and k.endswith(".json")]
-
-    if not keys:
-        print(f"⚠️ Nenhum arquivo ibge-uf_*.json encontrado em {prefix}")
+    # 🔍 Aceita arquivos ibge-uf_* ou ibge_uf_*, da partição mais recente que tiver um
+    key = arquivo_atual(r"ibge[-_]?uf_", run_date)
+    if not key:
+        print(f"⚠️ Nenhum arquivo ibge-uf_*.json encontrado em {PATH_BRONZE_IBGE} até data={run_date}")
         return
 
-    key = sorted(keys)[-1]
     print(f"📄 Lendo arquivo: {key}")
+    exigir_compativel("ibge_uf", key)
 
     # Lê o JSON
     data = read_json_from_s3(key)
@@ -120,8 +131,50 @@ def process_ibge_uf():
     print("\n✅ Processamento IBGE concluído com sucesso!")
     print(f"📁 Saída: {key_out}")
 
+    process_ibge_municipios(run_date, run_time, df)
+
+# ============================================================
+# PROCESSAMENTO IBGE → ibge_municipios/
+# ============================================================
+def montar_municipios(data: list, df_uf: pd.DataFrame) -> pd.DataFrame:
+    """Aplica o schema aos municípios e junta os dados da UF (id_uf, nome_uf) pela sigla."""
+    df = pd.DataFrame(data, columns=["codigo_ibge", "nome", "sigla_uf"])
+    df["codigo_ibge"] = pd.to_numeric(df["codigo_ibge"], errors="coerce").astype("Int64")
+    df["nome"] = df["nome"].astype("string")
+    df["sigla_uf"] = df["sigla_uf"].astype("string")
+
+    ufs = df_uf.rename(columns={"id": "id_uf", "sigla": "sigla_uf", "nome": "nome_uf"})
+    df = df.merge(ufs[["sigla_uf", "id_uf", "nome_uf"]], on="sigla_uf", how="left")
+    return df.sort_values("codigo_ibge", ignore_index=True)
+
+def process_ibge_municipios(run_date: str, run_time: str, df_uf: pd.DataFrame):
+    """Consolidado de municípios mais recente até run_date, com a UF já juntada."""
+    key = arquivo_atual("ibge-municipios_", run_date)
+    if not key:
+        print(f"⚠️ Nenhum arquivo ibge-municipios_*.json encontrado em {PATH_BRONZE_IBGE} até data={run_date}")
+        return
+
+    print(f"📄 Lendo arquivo: {key}")
+    exigir_compativel("ibge_municipios", key)
+    data = read_json_from_s3(key)
+    if not isinstance(data, list):
+        print("❌ O arquivo JSON de municípios não é um array de objetos válido.")
+        raise SystemExit(1)
+
+    df = montar_municipios(data, df_uf)
+    sem_uf = int(df["id_uf"].isna().sum())
+    if sem_uf:
+        print(f"⚠️ {sem_uf} município(s) com sigla_uf fora da lista de UFs.")
+
+    silver_prefix = f"{PATH_SILVER_MUNICIPIOS}data={run_date}/"
+    delete_prefix(silver_prefix)
+    write_parquet_s3(df, f"{silver_prefix}ibge_municipios_{run_date}_{run_time}.parquet")
+
 # ============================================================
 # EXECUÇÃO PRINCIPAL
 # ============================================================
 if __name__ == "__main__":
     process_ibge_uf()
+
+    from backfill_prata import registrar_particao
+    registrar_particao("ibge", latest_date_folder(PATH_BRONZE_IBGE))
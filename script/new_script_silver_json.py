@@ -7,6 +7,13 @@ import pyarrow.parquet as pq
 from datetime import datetime
 import re
 
+from busca_pontual import opcoes_escrita, ordenar
+from cache_s3 import obter
+from memoria_compacta import ORCAMENTO_MB, compactar, numericos_de_object, tabela_canonica
+from qualidade_prata import verificar_gravacao
+from schema_bronze import exigir_compativel
+from s3_async import ler_todos
+
 # ============================================================
 # CONFIGURAÇÕES
 # ============================================================
@@ -43,24 +50,34 @@ def latest_date_folder(prefix: str) -> str | None:
     return sorted(dates)[-1] if dates else None
 
 def read_json_from_s3(key: str):
-    obj = s3.get_object(Bucket=BUCKET, Key=key)
-    return json.loads(obj["Body"].read().decode("utf-8"))
+    return json.loads(obter(s3, BUCKET, key).decode("utf-8"))
+
+def prefetch_jsons(run_date: str):
+    """Baixa em paralelo (s3_async) o JSON mais recente de cada domínio para o cache local."""
+    keys = [k for k in list_keys(f"{PATH_BRONZE_JSON}data={run_date}/") if k.endswith(".json")]
+    ultimos = [sorted(k for k in keys if nome in k)[-1] for nome in ("extrato", "pedidos", "produtos", "tags")
+               if any(nome in k for k in keys)]
+    ler_todos(lambda k: obter(s3, BUCKET, k), ultimos)
 
 def write_parquet_s3(df: pd.DataFrame, key: str):
-    """Salva DataFrame em Parquet no S3."""
-    df = df.where(pd.notnull(df), None)
-    for col in df.columns:
-        if pd.api.types.is_object_dtype(df[col]):
-            try:
-                df[col] = pd.to_numeric(df[col], errors="ignore")
-            except Exception:
-                df[col] = df[col].astype("string")
+    """Salva DataFrame em Parquet no S3.
+
+    Com orçamento de memória (SILVER_ORCAMENTO_MB), o DataFrame é compactado
+    antes da conversão; o schema gravado é o mesmo nos dois modos.
+    """
+    df = numericos_de_object(df)
+    if ORCAMENTO_MB:
+        df = compactar(df)
 
     buf = BytesIO()
     table = pa.Table.from_pandas(df, preserve_index=False, safe=True)
-    pq.write_table(table, buf)
+    if ORCAMENTO_MB:
+        table = tabela_canonica(table)
+    table = ordenar(key, table)
+    pq.write_table(table, buf, **opcoes_escrita(key, table.schema))
     s3.put_object(Bucket=BUCKET, Key=key, Body=buf.getvalue())
     print(f"💾 salvo: {key} ({len(df)} linhas)")
+    verificar_gravacao(key, table)
 
 def delete_prefix(prefix: str):
     """Apaga todos os arquivos de um prefixo (usado para overwrite)."""
@@ -82,6 +99,7 @@ def process_extrato(run_date: str, run_time: str):
         return
 
     key = sorted(keys)[-1]
+    exigir_compativel("json_extrato", key)
     data = read_json_from_s3(key)
     if isinstance(data, dict):
         data = [data]
@@ -94,13 +112,22 @@ def process_extrato(run_date: str, run_time: str):
     df = pd.json_normalize(
         data,
         record_path=["transacoes"],
-        meta=["id_extrato", "cliente_id", "numero_conta"],
+        meta=["id_extrato", "cliente_id", "numero_conta",
+              ["saldos", "saldo_anterior"], ["saldos", "saldo_atual"]],
         errors="ignore"
     )
 
     for c in ("id_extrato", "cliente_id"):
         if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce").astype("Int64")
+            # ids alfanuméricos (EXT-2024-10-001) ficam como texto em vez de virar nulo
+            numerico = pd.to_numeric(df[c], errors="coerce")
+            if numerico.notna().sum() == df[c].notna().sum():
+                df[c] = numerico.astype("Int64")
+            else:
+                df[c] = df[c].astype("string")
+    for c in ("saldos.saldo_anterior", "saldos.saldo_atual"):
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
     if "numero_conta" in df.columns:
         df["numero_conta"] = df["numero_conta"].astype("string")
 
@@ -120,6 +147,7 @@ def process_pedidos(run_date: str, run_time: str):
         return
 
     key = sorted(keys)[-1]
+    exigir_compativel("json_pedidos", key)
     data = read_json_from_s3(key)
     if isinstance(data, dict):
         data = [data]
@@ -160,6 +188,7 @@ def process_produtos(run_date: str, run_time: str):
         return
 
     key = sorted(keys)[-1]
+    exigir_compativel("json_produtos", key)
     data = read_json_from_s3(key)
 
     # Acessa chave 'produtos'
@@ -191,6 +220,7 @@ def process_tags(run_date: str, run_time: str):
         return
 
     key = sorted(keys)[-1]
+    exigir_compativel("json_tags", key)
     data = read_json_from_s3(key)
     df = pd.json_normalize(data)
 
@@ -215,11 +245,15 @@ if __name__ == "__main__":
         raise SystemExit(1)
 
     run_time = datetime.now().strftime("%H%M%S")
+    prefetch_jsons(run_date)
 
     process_extrato(run_date, run_time)
     process_pedidos(run_date, run_time)
     process_produtos(run_date, run_time)
     process_tags(run_date, run_time)
 
+    from backfill_prata import registrar_particao
+    registrar_particao("json", run_date)
+
     print("\n✅ Processamento concluído com sucesso!")
     print(f"📁 Saída organizada em: {PATH_PRATA_JSON}")
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Engine Spark para a camada Prata do db_loja (tabelas grandes).
+
+Mesma lógica do new_script_silver.py (tipagem, full refresh e merge de
+produto), executada como operações de DataFrame do Spark sobre Parquet
+em s3a. Cada execução grava um dataset próprio na partição do dia, ao lado
+dos snapshots do pandas (nada é sobrescrito):
+
+s3a://data-ingest/prata/dbloja/<tabela>/data=YYYYMMDD/<tabela>_YYYYMMDD_HHMMSS.parquet/part-*.parquet
+
+O dataset só passa a ser lido depois do _SUCCESS gravado pelo Spark
+(aplicar_datasets no new_script_silver.py).
+
+A escolha da engine por tabela fica em ENGINE_SILVER (new_script_silver.py).
+A paridade com o pandas é verificada por src/teste_paridade_silver.py.
+"""
+
+import sys
+from datetime import datetime
+from pyspark.sql import DataFrame, SparkSession, Window
+from pyspark.sql import functions as F
+
+from spark_session_service import get_spark, tabela_referencia
+from new_script_silver import (
+    BUCKET, PATH_BRONZE, PATH_PRATA, SCHEMA_TIPOS,
+    list_parquets, latest_silver_snapshot_keys, arquivos_bronze, entradas_inalteradas, registrar_entradas,
+)
+
+# Tipos pandas (SCHEMA_TIPOS) -> tipos Spark
+TIPOS_SPARK = {
+    "Int64": "bigint",
+    "float64": "double",
+    "string": "string",
+    "datetime64[ns]": "timestamp",
+}
+
+# ===================== HELPERS S3A =====================
+def s3a(key: str) -> str:
+    return f"s3a://{BUCKET}/{key}"
+
+def read_parquets_spark(spark: SparkSession, keys: list[str]) -> DataFrame:
+    """Lê vários Parquets; se os schemas divergirem, unifica por nome como string."""
+    paths = [s3a(k) for k in keys]
+    dfs = [spark.read.parquet(p) for p in paths]
+    if len({df.schema.simpleString() for df in dfs}) == 1:
+        return spark.read.parquet(*paths)
+    dfs = [df.select([F.col(c).cast("string").alias(c) for c in df.columns]) for df in dfs]
+    out = dfs[0]
+    for df in dfs[1:]:
+        out = out.unionByName(df, allowMissingColumns=True)
+    return out
+
+def write_partition_spark(df: DataFrame, table: str, run_date: str, run_time: str):
+    """Grava o snapshot como dataset próprio em data=run_date (confirmado pelo _SUCCESS)."""
+    path = s3a(f"{PATH_PRATA}{table}/data={run_date}/{table}_{run_date}_{run_time}.parquet")
+    df.write.mode("overwrite").parquet(path)
+    print(f"💾 Salvo: {path}/")
+
+# ===================== SCHEMA =====================
+def apply_schema_spark(table: str, df: DataFrame) -> DataFrame:
+    """Equivalente Spark do apply_schema do pandas."""
+    tipos = SCHEMA_TIPOS.get(table, {})
+    for col, typ in tipos.items():
+        if col not in df.columns:
+            continue
+        if typ == "datetime64[ns]":
+            df = df.withColumn(col, F.to_timestamp(F.col(col)))
+        else:
+            df = df.withColumn(col, F.col(col).cast(TIPOS_SPARK[typ]))
+
+    # qualquer string restante: se todos os valores forem dígitos vira inteiro
+    extras = [c for c, t in df.dtypes if c not in tipos and t == "string"]
+    if extras:
+        flags = df.agg(*[
+            F.min(F.when(F.col(c).isNull(), F.lit(True)).otherwise(F.col(c).rlike(r"^\d+$"))).alias(c)
+            for c in extras
+        ]).first()
+        for c in extras:
+            if flags[c] is not False:
+                df = df.withColumn(c, F.col(c).cast("bigint"))
+    return df
+
+# ===================== FULL LOAD =====================
+def silver_full_from_bronze_spark(spark: SparkSession, table: str, run_date: str, run_time: str):
+    print(f"\n🚀 FULL LOAD (Spark): {table}")
+    bronze_files = arquivos_bronze(table)
+    if not bronze_files:
+        print(f"⚠️ Bronze sem arquivos para {table}.")
+        return
+    if entradas_inalteradas(table, bronze_files):
+        print(f"⏭️ {table}: nenhum arquivo novo na Bronze. Snapshot da Prata mantido.")
+        return
+    df = apply_schema_spark(table, read_parquets_spark(spark, bronze_files))
+    write_partition_spark(df, table, run_date, run_time)
+    registrar_entradas(table, bronze_files)
+
+# ===================== INCREMENTAL PRODUTO =====================
+def ultima_versao_por_id_spark(df: DataFrame) -> DataFrame:
+    """Equivalente Spark do ultima_versao_por_id (historico_produto.py): uma linha por id,
+    a de data_atualizacao mais recente (nulos primeiro); empate: a última na ordem de leitura."""
+    ordem = "__ordem"
+    df = df.withColumn(ordem, F.monotonically_increasing_id())
+    criterio = [F.col(ordem).desc()]
+    if "data_atualizacao" in df.columns:
+        criterio.insert(0, F.col("data_atualizacao").desc_nulls_last())
+    janela = Window.partitionBy("id").orderBy(*criterio)
+    return (
+        df.withColumn("__n", F.row_number().over(janela))
+        .filter(F.col("__n") == 1)
+        .orderBy(ordem)
+        .drop("__n", ordem)
+    )
+
+def merge_produto_spark(df_silver: DataFrame, df_delta: DataFrame) -> DataFrame:
+    """Upsert por id: valores não nulos do delta sobrescrevem a Prata; ids novos são anexados.
+
+    ids repetidos (no delta ou na Prata) ficam só com a última versão, como no merge_produto.
+    """
+    df_silver = ultima_versao_por_id_spark(df_silver)
+    df_delta = ultima_versao_por_id_spark(df_delta)
+    cols_silver = [c for c in df_silver.columns if c != "id"]
+    cols_delta = [c for c in df_delta.columns if c != "id"]
+    s = df_silver.alias("s")
+    d = df_delta.alias("d")
+    joined = s.join(d, on="id", how="full_outer")
+
+    select = [F.col("id")]
+    for c in cols_silver:
+        if c in cols_delta:
+            select.append(F.coalesce(F.col(f"d.{c}"), F.col(f"s.{c}")).alias(c))
+        else:
+            select.append(F.col(f"s.{c}").alias(c))
+    select += [F.col(f"d.{c}").alias(c) for c in cols_delta if c not in cols_silver]
+    return joined.select(select)
+
+def silver_merge_produto_from_bronze_spark(spark: SparkSession, run_date: str, run_time: str):
+    print("\n🚀 INCREMENTAL (MERGE, Spark) : produto")
+    bronze_prod = [k for k in list_parquets(f"{PATH_BRONZE}data=") if "/produto_" in k]
+    if not bronze_prod:
+        print("⚠️ Bronze sem arquivos de produto.")
+        return
+    df_delta = apply_schema_spark("produto", spark.read.parquet(s3a(bronze_prod[-1])))
+
+    last_snap_keys = latest_silver_snapshot_keys("produto")
+    if last_snap_keys:
+        # snapshot atual em cache no serviço Spark (spark_session_service.py), se houver
+        df_silver = tabela_referencia(spark, "produto", last_snap_keys)
+        if df_silver is None:
+            df_silver = read_parquets_spark(spark, last_snap_keys)
+        df_silver = apply_schema_spark("produto", df_silver)
+        df_final = merge_produto_spark(df_silver, df_delta)
+    else:
+        print("ℹ️ Não há snapshot anterior na Prata. Criando o primeiro snapshot.")
+        df_final = df_delta
+
+    write_partition_spark(apply_schema_spark("produto", df_final), "produto", run_date, run_time)
+
+# ===================== EXECUÇÃO =====================
+def run_silver_spark(tables: list[str], run_date: str, run_time: str):
+    """Processa as tabelas informadas em uma única SparkSession."""
+    spark = get_spark("SilverDbLojaSpark")
+    try:
+        for tbl in tables:
+            if tbl == "produto":
+                silver_merge_produto_from_bronze_spark(spark, run_date, run_time)
+            else:
+                silver_full_from_bronze_spark(spark, tbl, run_date, run_time)
+    finally:
+        spark.stop()
+
+
+if __name__ == "__main__":
+    tables = sys.argv[1:] or ["categorias_produto", "cliente", "pedido_cabecalho", "pedido_itens", "produto"]
+    print("=== INICIANDO CARGA PARA PRATA (Spark) ===")
+    agora = datetime.now()
+    run_silver_spark(tables, agora.strftime("%Y%m%d"), agora.strftime("%H%M%S"))
+    print("\n✅ Finalizado!")
@@ -1,7 +1,14 @@
 # orchestrator_pipeline.py
+# Uso: python script/orchestrator_pipeline.py [--handoff]
+#   --handoff: a Bronze publica as tabelas Arrow em /dev/shm e a Prata as lê
+#              dali na mesma execução (ver handoff_arrow.py)
+import os
 import subprocess
+import sys
 from datetime import datetime
 
+from handoff_arrow import limpar
+
 scripts = [
     # Camada BRONZE
     #("Ingest_bronze_script.py", "📦 Extraindo dados do SQL DDL"),
@@ -16,20 +23,34 @@ scripts = [
     ("new_script_silver.py", "⚙️ Transformação DB_LOJA (Silver)"),
     ("new_script_silver_json.py", "⚙️ Transformação JSON (Silver)"),
     ("new_script_silver_ibge_final.py", "⚙️ Transformação IBGE (Silver)"),
+    ("fato_pedido_itens.py", "🧩 Fato de itens de pedido (Silver)"),
+
+    # Camada OURO
+    ("new_script_gold.py", "🏆 Cubos de vendas diários (Gold)"),
 ]
 
-def run_pipeline():
+def run_pipeline(handoff: bool = False):
     print(f"🚀 Iniciando pipeline completo às {datetime.now()}\n")
-    for script, desc in scripts:
-        print(f"=== {desc} ===")
-        try:
-            subprocess.run(["python", f"script/{script}"], check=True)
-        except subprocess.CalledProcessError:
-            print(f"❌ Erro ao executar {script}, abortando pipeline.")
-            break
-        print(f"✅ {script} finalizado.\n")
+    env = dict(os.environ)
+    run_id = None
+    if handoff:
+        run_id = datetime.now().strftime("%Y%m%d%H%M%S")
+        env["PIPELINE_RUN_ID"] = run_id
+        print(f"🧠 Handoff Arrow em memória ativo (run_id={run_id})\n")
+    try:
+        for script, desc in scripts:
+            print(f"=== {desc} ===")
+            try:
+                subprocess.run(["python", f"script/{script}"], check=True, env=env)
+            except subprocess.CalledProcessError:
+                print(f"❌ Erro ao executar {script}, abortando pipeline.")
+                break
+            print(f"✅ {script} finalizado.\n")
+    finally:
+        if run_id:
+            limpar(run_id)
 
     print("\n🏁 Pipeline completo executado com sucesso!")
 
 if __name__ == "__main__":
-    run_pipeline()
+    run_pipeline(handoff="--handoff" in sys.argv[1:])
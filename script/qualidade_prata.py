@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+Regras de qualidade e integridade referencial da Prata, avaliadas com Arrow compute.
+
+As regras são declaradas por tabela em REGRAS e avaliadas a cada gravação
+da Prata (write_parquet_s3 do db_loja e dos JSONs), sobre a própria tabela
+Arrow que acabou de ser gravada (ou, no modo em lotes, lendo do arquivo só
+as colunas usadas pelas regras):
+
+- nao_nulo   colunas sem nulos
+- unico      combinação de colunas sem repetição (group_by + count)
+- fk         valores presentes na chave da tabela referenciada (is_in, hash)
+- faixa      valores entre min e max
+- agregado   total = base + soma(valor) dos filhos por chave
+             (ex.: valor_total do pedido = Σ quantidade × preco_unitario dos
+             itens; saldo_atual = saldo_anterior + Σ valor das transações),
+             com group_by + hash join
+
+As tabelas referenciadas são lidas do snapshot mais recente da Prata, só
+com as colunas necessárias, e ficam em cache no processo.
+
+As violações vão para uma tabela compacta, uma linha por violação:
+prata/qualidade/violacoes/data=YYYYMMDD/<tabela>_YYYYMMDD_HHMMSS.parquet
+    tabela, regra, coluna, chave, valor, detectado_em
+
+A verificação só reporta: não bloqueia a gravação.
+
+Uso:
+    python script/qualidade_prata.py pedido_itens      # avalia o snapshot atual
+"""
+
+import re
+import sys
+import time
+from datetime import datetime
+from io import BytesIO
+import boto3
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from leitor_parquet_s3 import ler_schema, ler_tabela
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+BUCKET = "data-ingest"
+PATH_VIOLACOES = "prata/qualidade/violacoes/"
+TOLERANCIA = 0.01
+
+# tabela -> (prefixo na Prata, coluna de identificação usada no relatório)
+TABELAS = {
+    "categorias_produto": ("prata/dbloja/categorias_produto/", "id"),
+    "cliente": ("prata/dbloja/cliente/", "id"),
+    "pedido_cabecalho": ("prata/dbloja/pedido_cabecalho/", "id"),
+    "pedido_itens": ("prata/dbloja/pedido_itens/", "id"),
+    "produto": ("prata/dbloja/produto/", "id"),
+    "transacoes": ("prata/json/transacoes/", "id_transacao"),
+}
+
+REGRAS = {
+    "categorias_produto": [
+        {"regra": "nao_nulo", "colunas": ["id", "nome"]},
+        {"regra": "unico", "colunas": ["id"]},
+    ],
+    "cliente": [
+        {"regra": "nao_nulo", "colunas": ["id", "nome"]},
+        {"regra": "unico", "colunas": ["id"]},
+    ],
+    "produto": [
+        {"regra": "nao_nulo", "colunas": ["id", "nome"]},
+        {"regra": "unico", "colunas": ["id"]},
+        {"regra": "fk", "coluna": "id_categoria", "referencia": ("categorias_produto", "id")},
+        {"regra": "faixa", "coluna": "preco", "min": 0},
+        {"regra": "faixa", "coluna": "estoque", "min": 0},
+    ],
+    "pedido_cabecalho": [
+        {"regra": "nao_nulo", "colunas": ["id", "id_cliente", "data_pedido"]},
+        {"regra": "unico", "colunas": ["id"]},
+        {"regra": "fk", "coluna": "id_cliente", "referencia": ("cliente", "id")},
+        {"regra": "faixa", "coluna": "valor_total", "min": 0},
+        {"regra": "agregado", "chave": "id", "total": "valor_total",
+         "filhos": {"tabela": "pedido_itens", "chave": "id_pedido", "valor": ["quantidade", "preco_unitario"]}},
+    ],
+    "pedido_itens": [
+        {"regra": "nao_nulo", "colunas": ["id", "id_pedido", "id_produto"]},
+        {"regra": "unico", "colunas": ["id"]},
+        {"regra": "fk", "coluna": "id_pedido", "referencia": ("pedido_cabecalho", "id")},
+        {"regra": "fk", "coluna": "id_produto", "referencia": ("produto", "id")},
+        {"regra": "faixa", "coluna": "quantidade", "min": 1},
+        {"regra": "faixa", "coluna": "preco_unitario", "min": 0},
+    ],
+    "transacoes": [
+        {"regra": "nao_nulo", "colunas": ["id_transacao", "id_extrato", "valor"]},
+        {"regra": "unico", "colunas": ["id_transacao"]},
+        {"regra": "agregado", "chave": "id_extrato", "total": "saldos.saldo_atual",
+         "base": "saldos.saldo_anterior", "filhos": {"chave": "id_extrato", "valor": ["valor"]}},
+    ],
+}
+
+SCHEMA_VIOLACOES = pa.schema([
+    ("tabela", pa.string()),
+    ("regra", pa.string()),
+    ("coluna", pa.string()),
+    ("chave", pa.string()),
+    ("valor", pa.string()),
+    ("detectado_em", pa.timestamp("s")),
+])
+
+PADRAO_KEY = re.compile(r"^prata/(?:dbloja|json)/([^/]+)/data=(\d{8})/[^/]*_(\d{6})\.parquet$")
+
+s3 = boto3.client(
+    "s3",
+    endpoint_url="http://minio:9000",
+    aws_access_key_id="minioadmin",
+    aws_secret_access_key="minioadmin",
+    region_name="us-east-1"
+)
+
+_referencias = {}  # (tabela, colunas, arquivos do snapshot) -> pa.Table
+
+# ============================================================
+# REFERÊNCIAS
+# ============================================================
+def snapshot_atual(tabela: str) -> list[str]:
+    """Arquivos do snapshot atual da tabela na Prata: mesma resolução da carga da Prata
+    (compactações, datasets confirmados e instante da execução)."""
+    from new_script_silver import snapshot_mais_recente  # o new_script_silver importa este módulo
+    return snapshot_mais_recente(TABELAS[tabela][0])
+
+def referencia(tabela: str, colunas: list[str]) -> pa.Table | None:
+    """Colunas da tabela referenciada (snapshot atual), em cache enquanto o snapshot não muda."""
+    arquivos = tuple(snapshot_atual(tabela))
+    if not arquivos:
+        return None
+    chave = (tabela, tuple(colunas), arquivos)
+    if chave not in _referencias:
+        _referencias[chave] = pa.concat_tables(
+            [ler_tabela(k, columns=colunas, bucket=BUCKET) for k in arquivos], promote_options="permissive"
+        )
+    return _referencias[chave]
+
+# ============================================================
+# REGRAS
+# ============================================================
+def _como_texto(valores) -> pa.Array:
+    return pc.cast(valores, pa.string()) if not pa.types.is_string(valores.type) else valores
+
+def _violacoes(ids, regra: str, coluna: str, valores) -> dict:
+    return {"regra": regra, "coluna": coluna, "chave": _como_texto(ids), "valor": _como_texto(valores)}
+
+def _numero(table: pa.Table, coluna: str):
+    return pc.cast(table[coluna], pa.float64())
+
+def regra_nao_nulo(table, regra, id_col):
+    for coluna in regra["colunas"]:
+        mascara = pc.is_null(table[coluna])
+        yield _violacoes(pc.filter(table[id_col], mascara), "nao_nulo", coluna,
+                         pa.nulls(pc.sum(mascara).as_py() or 0, pa.string()))
+
+def regra_unico(table, regra, id_col):
+    colunas = regra["colunas"]
+    contagem = table.select(colunas).group_by(colunas).aggregate([([], "count_all")])
+    repetidos = contagem.filter(pc.greater(contagem["count_all"], 1))
+    chave = repetidos[colunas[0]] if len(colunas) == 1 else pc.binary_join_element_wise(
+        *[_como_texto(repetidos[c]) for c in colunas], "|")
+    yield _violacoes(chave, "unico", ",".join(colunas), repetidos["count_all"])
+
+def regra_fk(table, regra, id_col):
+    tabela_ref, coluna_ref = regra["referencia"]
+    ref = referencia(tabela_ref, [coluna_ref])
+    if ref is None:
+        print(f"⚠️ FK {regra['coluna']} → {tabela_ref}.{coluna_ref}: tabela referenciada sem snapshot na Prata.")
+        return
+    valores = table[regra["coluna"]]
+    chaves = pc.unique(ref[coluna_ref].combine_chunks()).cast(valores.type)
+    mascara = pc.and_(pc.is_valid(valores), pc.invert(pc.is_in(valores, value_set=chaves)))
+    yield _violacoes(pc.filter(table[id_col], mascara), "fk", regra["coluna"], pc.filter(valores, mascara))
+
+def regra_faixa(table, regra, id_col):
+    valores = table[regra["coluna"]]
+    fora = pa.array([False] * table.num_rows) if table.num_rows else pa.array([], pa.bool_())
+    if "min" in regra:
+        fora = pc.or_(fora, pc.fill_null(pc.less(valores, regra["min"]), False))
+    if "max" in regra:
+        fora = pc.or_(fora, pc.fill_null(pc.greater(valores, regra["max"]), False))
+    yield _violacoes(pc.filter(table[id_col], fora), "faixa", regra["coluna"], pc.filter(valores, fora))
+
+def regra_agregado(table, regra, id_col):
+    filhos = regra["filhos"]
+    colunas_filho = [filhos["chave"], *filhos["valor"]]
+    fonte = referencia(filhos["tabela"], colunas_filho) if "tabela" in filhos else table.select(colunas_filho)
+    if fonte is None:
+        print(f"⚠️ Agregado {regra['total']}: {filhos['tabela']} sem snapshot na Prata.")
+        return
+    valor = _numero(fonte, filhos["valor"][0])
+    for coluna in filhos["valor"][1:]:
+        valor = pc.multiply(valor, _numero(fonte, coluna))
+    somas = (pa.table({"_chave": fonte[filhos["chave"]], "_valor": valor})
+             .group_by("_chave").aggregate([("_valor", "sum")]))
+
+    colunas_pai = {"_chave": table[regra["chave"]], "_total": _numero(table, regra["total"])}
+    if "base" in regra:
+        colunas_pai["_base"] = _numero(table, regra["base"])
+    pais = pa.table(colunas_pai)
+    pais = pais.filter(pc.is_valid(pais["_chave"])).group_by("_chave").aggregate(
+        [(c, "min") for c in colunas_pai if c != "_chave"])
+    somas = somas.cast(pa.schema([("_chave", pais["_chave"].type), ("_valor_sum", pa.float64())]))
+    unidos = pais.join(somas, keys="_chave", join_type="left outer")
+
+    esperado = pc.fill_null(unidos["_valor_sum"], 0.0)
+    if "base" in regra:
+        esperado = pc.add(esperado, pc.fill_null(unidos["_base_min"], 0.0))
+    diferenca = pc.abs(pc.subtract(unidos["_total_min"], esperado))
+    mascara = pc.fill_null(pc.greater(diferenca, regra.get("tolerancia", TOLERANCIA)), False)
+    descricao = pc.binary_join_element_wise(
+        _como_texto(pc.filter(unidos["_total_min"], mascara)),
+        _como_texto(pc.round(pc.filter(esperado, mascara), 2)), " != ")
+    yield _violacoes(pc.filter(unidos["_chave"], mascara), "agregado", regra["total"], descricao)
+
+AVALIADORES = {
+    "nao_nulo": regra_nao_nulo,
+    "unico": regra_unico,
+    "fk": regra_fk,
+    "faixa": regra_faixa,
+    "agregado": regra_agregado,
+}
+
+def colunas_usadas(tabela: str) -> list[str]:
+    colunas = [TABELAS[tabela][1]]
+    for regra in REGRAS.get(tabela, []):
+        colunas += regra.get("colunas", [])
+        colunas += [regra[c] for c in ("coluna", "chave", "total", "base") if c in regra]
+        if "filhos" in regra and "tabela" not in regra["filhos"]:
+            colunas += [regra["filhos"]["chave"], *regra["filhos"]["valor"]]
+    return list(dict.fromkeys(colunas))
+
+# ============================================================
+# AVALIAÇÃO
+# ============================================================
+def avaliar(tabela: str, table: pa.Table) -> tuple[pa.Table, dict]:
+    """(violações, {regra:coluna: quantidade}) de todas as regras da tabela."""
+    id_col = TABELAS[tabela][1]
+    agora = datetime.now().replace(microsecond=0)
+    partes, resumo = [], {}
+    for regra in REGRAS.get(tabela, []):
+        colunas = [regra[c] for c in ("coluna", "chave", "total", "base") if c in regra] + regra.get("colunas", [])
+        faltando = [c for c in colunas if c not in table.column_names]
+        if faltando:
+            print(f"⚠️ {tabela}: regra {regra['regra']} ignorada (colunas ausentes: {faltando})")
+            continue
+        for v in AVALIADORES[regra["regra"]](table, regra, id_col):
+            n = len(v["chave"])
+            resumo[f"{v['regra']}:{v['coluna']}"] = resumo.get(f"{v['regra']}:{v['coluna']}", 0) + n
+            if n:
+                partes.append(pa.table({
+                    "tabela": pa.array([tabela] * n, pa.string()),
+                    "regra": pa.array([v["regra"]] * n, pa.string()),
+                    "coluna": pa.array([v["coluna"]] * n, pa.string()),
+                    "chave": v["chave"],
+                    "valor": v["valor"],
+                    "detectado_em": pa.array([agora] * n, pa.timestamp("s")),
+                }, schema=SCHEMA_VIOLACOES))
+    violacoes = pa.concat_tables(partes) if partes else SCHEMA_VIOLACOES.empty_table()
+    return violacoes, resumo
+
+def verificar(tabela: str, table: pa.Table, run_date: str, run_time: str) -> dict:
+    """Avalia as regras e grava as violações na Prata. Retorna o resumo por regra."""
+    inicio = time.time()
+    violacoes, resumo = avaliar(tabela, table)
+    total = violacoes.num_rows
+    if total:
+        key = f"{PATH_VIOLACOES}data={run_date}/{tabela}_{run_date}_{run_time}.parquet"
+        buf = BytesIO()
+        pq.write_table(violacoes, buf)
+        s3.put_object(Bucket=BUCKET, Key=key, Body=buf.getvalue())
+        detalhes = ", ".join(f"{r}={n}" for r, n in resumo.items() if n)
+        print(f"⚠️ Qualidade {tabela}: {total} violação(ões) ({detalhes}) → {key}")
+    else:
+        print(f"✅ Qualidade {tabela}: {len(resumo)} verificações sem violações "
+              f"({table.num_rows} linhas, {time.time() - inicio:.2f}s)")
+    return resumo
+
+def verificar_gravacao(key: str, table: pa.Table | None = None) -> dict | None:
+    """Gancho das gravações da Prata: identifica a tabela pela key e avalia as regras.
+
+    Sem `table` (gravação em lotes), lê do arquivo gravado só as colunas das regras.
+    """
+    m = PADRAO_KEY.match(key)
+    if not m or m.group(1) not in REGRAS:
+        return None
+    tabela, run_date, run_time = m.groups()
+    try:
+        if table is None:
+            disponiveis = ler_schema(key, bucket=BUCKET).names
+            table = ler_tabela(key, columns=[c for c in colunas_usadas(tabela) if c in disponiveis], bucket=BUCKET)
+        return verificar(tabela, table, run_date, run_time)
+    except Exception as e:  # a verificação nunca derruba a gravação
+        print(f"⚠️ Qualidade {tabela}: verificação falhou: {e!r}")
+        return None
+
+
+if __name__ == "__main__":
+    for tabela in sys.argv[1:] or list(REGRAS):
+        arquivos = snapshot_atual(tabela)
+        if not arquivos:
+            print(f"⚠️ {tabela}: sem snapshot na Prata.")
+            continue
+        dados = pa.concat_tables([ler_tabela(k, bucket=BUCKET) for k in arquivos], promote_options="permissive")
+        m = PADRAO_KEY.match(arquivos[-1])
+        run_date, run_time = (m.group(2), m.group(3)) if m else (datetime.now().strftime("%Y%m%d"), "000000")
+        verificar(tabela, dados, run_date, run_time)
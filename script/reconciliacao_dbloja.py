@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""
+Reconciliação Postgres (db_loja) × Prata por faixas de id, sem trazer as linhas.
+
+Para cada tabela, os dois lados calculam os mesmos agregados por faixa de
+id: contagem e um hash de linha somado (independente da ordem).
+- Postgres: GROUP BY no próprio banco, só os agregados voltam;
+- Prata: o snapshot atual é lido só com as colunas comparadas
+  (leitor_parquet_s3), os hashes de linha são calculados vetorizados
+  (Arrow/numpy) e ficam em somas acumuladas ordenadas por id, então
+  qualquer faixa sai em O(log n).
+
+Primeiro compara blocos de TAMANHO_BLOCO ids; só os blocos divergentes
+são bisseccionados (uma consulta por nível, todas as metades juntas) até
+faixas de até LINHAS_FOLHA ids, e só nessas folhas os hashes de linha
+são buscados no Postgres para apontar os ids ausentes, sobrando ou
+divergentes.
+
+Hash de linha = Σ peso(coluna) × valor(coluna) mod PRIMO, com valor:
+inteiros como estão, numéricos em centavos, textos pelos 28 primeiros
+bits do md5, datas em epoch (segundos, UTC), nulos = -1.
+
+Relatório em prata/dbloja/controle/reconciliacao/{tabela}_YYYYMMDD_HHMMSS.json.
+Sai com código 1 quando alguma tabela diverge.
+
+Uso:
+    python script/reconciliacao_dbloja.py                 # todas as tabelas
+    python script/reconciliacao_dbloja.py pedido_itens produto
+"""
+
+import hashlib
+import json
+import sys
+import time
+from datetime import datetime
+import boto3
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import create_engine
+
+from leitor_parquet_s3 import ler_schema, ler_tabela
+from new_script_silver import SCHEMA_TIPOS, latest_silver_snapshot_keys
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+BUCKET = "data-ingest"
+PATH_RECONCILIACAO = "prata/dbloja/controle/reconciliacao/"
+
+DB_CONFIG = {
+    "host": "db",
+    "port": 5432,
+    "database": "mydb",
+    "user": "myuser",
+    "password": "mypassword"
+}
+DB_URL = f"postgresql+psycopg2://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+
+TAMANHO_BLOCO = 1_000_000   # ids por bloco na primeira comparação
+LINHAS_FOLHA = 2_000        # faixas até esse tamanho buscam os hashes de linha
+MAX_IDS_RELATORIO = 1000    # ids listados por categoria no relatório
+PRIMO = 2_147_483_647       # 2^31 - 1
+
+s3 = boto3.client(
+    "s3",
+    endpoint_url="http://minio:9000",
+    aws_access_key_id="minioadmin",
+    aws_secret_access_key="minioadmin",
+    region_name="us-east-1"
+)
+engine = create_engine(DB_URL)
+
+# ============================================================
+# COLUNAS E HASH DE LINHA
+# ============================================================
+def colunas(tabela: str) -> dict:
+    """coluna -> inteiro | centavos | texto | epoch, a partir do schema da Prata."""
+    tipos = {}
+    for col, typ in SCHEMA_TIPOS[tabela].items():
+        if typ == "Int64":
+            tipos[col] = "inteiro"
+        elif typ == "float64":
+            tipos[col] = "centavos"
+        elif "datetime" in typ:
+            tipos[col] = "epoch"
+        else:
+            tipos[col] = "texto"
+    return tipos
+
+def peso(coluna: str) -> int:
+    """Peso fixo por coluna (o mesmo nos dois lados)."""
+    return int(hashlib.md5(coluna.encode("utf-8")).hexdigest()[:7], 16) + 1
+
+def _valor_sql(coluna: str, tipo: str) -> str:
+    if tipo == "centavos":
+        expr = f"round({coluna} * 100)::bigint"
+    elif tipo == "epoch":
+        expr = f"floor(extract(epoch from {coluna}))::bigint"
+    elif tipo == "texto":
+        expr = f"('x' || lpad(substr(md5({coluna}::text), 1, 7), 8, '0'))::bit(32)::bigint"
+    else:
+        expr = f"{coluna}::bigint"
+    return f"coalesce({expr}, -1)"
+
+def hash_linha_sql(tabela: str) -> str:
+    termos = [
+        f"(mod(mod({_valor_sql(c, t)}, {PRIMO}) + {PRIMO}, {PRIMO}) * {peso(c)}) % {PRIMO}"
+        for c, t in colunas(tabela).items()
+    ]
+    return f"(({' + '.join(termos)}) % {PRIMO})"
+
+def _texto_md5(coluna: pa.ChunkedArray) -> np.ndarray:
+    """md5 só dos valores distintos (dictionary encode), depois expandido por índice."""
+    codificado = pc.dictionary_encode(coluna).combine_chunks()
+    dicionario = np.array(
+        [int(hashlib.md5(v.encode("utf-8")).hexdigest()[:7], 16) for v in codificado.dictionary.to_pylist()] + [-1],
+        dtype="int64",
+    )
+    indices = pc.fill_null(codificado.indices, len(dicionario) - 1)
+    return dicionario[indices.to_numpy()]
+
+def _valor_arrow(coluna: pa.ChunkedArray, tipo: str) -> np.ndarray:
+    if tipo == "texto":
+        return _texto_md5(pc.cast(coluna, pa.string()))
+    if tipo == "epoch":
+        unidade = {"s": 1, "ms": 10**3, "us": 10**6, "ns": 10**9}[coluna.type.unit]
+        inteiros = pc.cast(coluna, pa.int64()).to_numpy(zero_copy_only=False)
+        valores = np.floor_divide(np.nan_to_num(inteiros, nan=0).astype("int64"), unidade)
+    elif tipo == "centavos":
+        valores = np.rint(pc.cast(coluna, pa.float64()).to_numpy(zero_copy_only=False) * 100)
+        valores = np.nan_to_num(valores, nan=0).astype("int64")
+    else:
+        valores = pc.fill_null(pc.cast(coluna, pa.int64()), 0).to_numpy(zero_copy_only=False)
+    nulos = pc.is_null(coluna).to_numpy(zero_copy_only=False)
+    return np.where(nulos, -1, valores)
+
+def hash_linha_arrow(table: pa.Table, tipos: dict) -> np.ndarray:
+    acumulado = np.zeros(table.num_rows, dtype="int64")
+    for col, tipo in tipos.items():
+        v = _valor_arrow(table[col], tipo)
+        acumulado = (acumulado + (v % PRIMO) * peso(col) % PRIMO) % PRIMO
+    return acumulado
+
+# ============================================================
+# LADO PRATA
+# ============================================================
+class IndicePrata:
+    """Hashes de linha do snapshot da Prata ordenados por id, com somas acumuladas."""
+
+    def __init__(self, ids: np.ndarray, hashes: np.ndarray):
+        ordem = np.argsort(ids, kind="stable")
+        self.ids = ids[ordem]
+        self.hashes = hashes[ordem]
+        self._acumulado = np.concatenate([[0], np.cumsum(self.hashes)])
+
+    def agregado(self, inicio: int, fim: int) -> tuple[int, int]:
+        """(linhas, hash) dos ids em [inicio, fim)."""
+        a, b = np.searchsorted(self.ids, [inicio, fim])
+        return int(b - a), int((self._acumulado[b] - self._acumulado[a]) % PRIMO)
+
+    def linhas(self, inicio: int, fim: int) -> pd.DataFrame:
+        a, b = np.searchsorted(self.ids, [inicio, fim])
+        return pd.DataFrame({"id": self.ids[a:b], "h": self.hashes[a:b]})
+
+    def blocos(self) -> pd.DataFrame:
+        bloco = self.ids // TAMANHO_BLOCO
+        df = pd.DataFrame({"bloco": bloco, "h": self.hashes})
+        agg = df.groupby("bloco", sort=True).agg(n=("h", "size"), h=("h", "sum")).reset_index()
+        agg["h"] = agg["h"] % PRIMO
+        return agg
+
+def indice_prata(tabela: str) -> IndicePrata | None:
+    keys = latest_silver_snapshot_keys(tabela)
+    if not keys:
+        return None
+    tipos = colunas(tabela)
+    table = pa.concat_tables(
+        [ler_tabela(k, columns=[c for c in tipos if c in ler_schema(k, bucket=BUCKET).names], bucket=BUCKET)
+         for k in keys],
+        promote_options="permissive",
+    )
+    for col in tipos:
+        if col not in table.column_names:
+            table = table.append_column(col, pa.nulls(table.num_rows, pa.int64()))
+    table = table.filter(pc.is_valid(table["id"]))
+    return IndicePrata(pc.cast(table["id"], pa.int64()).to_numpy(), hash_linha_arrow(table, tipos))
+
+# ============================================================
+# LADO POSTGRES
+# ============================================================
+def blocos_pg(tabela: str) -> pd.DataFrame:
+    query = f"""
+        SELECT floor(id::numeric / {TAMANHO_BLOCO})::bigint AS bloco, count(*) AS n,
+               (sum({hash_linha_sql(tabela)}) % {PRIMO})::bigint AS h
+        FROM db_loja.{tabela}
+        GROUP BY 1
+        ORDER BY 1
+    """
+    return pd.read_sql_query(query, engine).astype({"bloco": "int64", "n": "int64", "h": "int64"})
+
+def faixas_pg(tabela: str, faixas: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """[(linhas, hash)] de cada faixa [inicio, fim), numa única consulta."""
+    query = f"""
+        SELECT r.i, count(t.id) AS n, (coalesce(sum(t.h), 0) % {PRIMO})::bigint AS h
+        FROM unnest(%(inicios)s::bigint[], %(fins)s::bigint[]) WITH ORDINALITY AS r(inicio, fim, i)
+        LEFT JOIN (SELECT id, {hash_linha_sql(tabela)} AS h FROM db_loja.{tabela}) t
+               ON t.id >= r.inicio AND t.id < r.fim
+        GROUP BY r.i
+        ORDER BY r.i
+    """
+    params = {"inicios": [int(a) for a, _ in faixas], "fins": [int(b) for _, b in faixas]}
+    df = pd.read_sql_query(query, engine, params=params)
+    return list(zip(df["n"].astype("int64"), df["h"].astype("int64")))
+
+def linhas_pg(tabela: str, faixas: list[tuple[int, int]]) -> pd.DataFrame:
+    """id, h das linhas nas faixas (só para as folhas da bissecção)."""
+    query = f"""
+        SELECT t.id, t.h
+        FROM unnest(%(inicios)s::bigint[], %(fins)s::bigint[]) AS r(inicio, fim)
+        JOIN (SELECT id, {hash_linha_sql(tabela)} AS h FROM db_loja.{tabela}) t
+          ON t.id >= r.inicio AND t.id < r.fim
+        ORDER BY t.id
+    """
+    params = {"inicios": [int(a) for a, _ in faixas], "fins": [int(b) for _, b in faixas]}
+    return pd.read_sql_query(query, engine, params=params).astype({"id": "int64", "h": "int64"})
+
+# ============================================================
+# RECONCILIAÇÃO
+# ============================================================
+def comparar_linhas(pg: pd.DataFrame, prata: pd.DataFrame) -> dict:
+    duplicados = prata.loc[prata["id"].duplicated(), "id"].unique()
+    m = pg.merge(prata.drop_duplicates("id"), on="id", how="outer", suffixes=("_pg", "_prata"), indicator=True)
+    return {
+        "ausentes_na_prata": m.loc[m["_merge"] == "left_only", "id"].tolist(),
+        "sobrando_na_prata": m.loc[m["_merge"] == "right_only", "id"].tolist(),
+        "divergentes": m.loc[(m["_merge"] == "both") & (m["h_pg"] != m["h_prata"]), "id"].tolist(),
+        "duplicados_na_prata": [int(i) for i in duplicados],
+    }
+
+def reconciliar(tabela: str) -> dict:
+    inicio = time.time()
+    prata = indice_prata(tabela)
+    if prata is None:
+        print(f"⚠️ {tabela}: sem snapshot na Prata.")
+        return {"tabela": tabela, "ok": False, "erro": "sem snapshot na Prata"}
+
+    pg = blocos_pg(tabela)
+    m = pg.merge(prata.blocos(), on="bloco", how="outer", suffixes=("_pg", "_prata")).fillna(-1)
+    divergentes = m.loc[(m["n_pg"] != m["n_prata"]) | (m["h_pg"] != m["h_prata"]), "bloco"].astype("int64")
+    faixas = [(b * TAMANHO_BLOCO, (b + 1) * TAMANHO_BLOCO) for b in divergentes]
+    resultado = {
+        "tabela": tabela,
+        "linhas_postgres": int(pg["n"].sum()),
+        "linhas_prata": len(prata.ids),
+        "blocos": len(m),
+        "blocos_divergentes": len(faixas),
+    }
+
+    consultas, folhas = 1, []
+    while faixas:
+        folhas += [f for f in faixas if f[1] - f[0] <= LINHAS_FOLHA]
+        metades = []
+        for a, b in (f for f in faixas if f[1] - f[0] > LINHAS_FOLHA):
+            meio = (a + b) // 2
+            metades += [(a, meio), (meio, b)]
+        if not metades:
+            break
+        agregados = faixas_pg(tabela, metades)
+        consultas += 1
+        faixas = [f for f, ag in zip(metades, agregados) if prata.agregado(*f) != tuple(int(x) for x in ag)]
+
+    diferencas = {"ausentes_na_prata": [], "sobrando_na_prata": [], "divergentes": [], "duplicados_na_prata": []}
+    if folhas:
+        pg_linhas = linhas_pg(tabela, folhas)
+        consultas += 1
+        prata_linhas = pd.concat([prata.linhas(a, b) for a, b in folhas], ignore_index=True)
+        for chave, ids in comparar_linhas(pg_linhas, prata_linhas).items():
+            diferencas[chave] += ids
+    resultado.update({
+        "faixas_folha": len(folhas),
+        "ids_nas_folhas": sum(b - a for a, b in folhas) if folhas else 0,
+        "consultas_postgres": consultas,
+        "ok": not any(diferencas.values()) and resultado["blocos_divergentes"] == 0,
+        "segundos": round(time.time() - inicio, 2),
+    })
+    resultado.update({k: {"total": len(v), "ids": v[:MAX_IDS_RELATORIO]} for k, v in diferencas.items()})
+    return resultado
+
+def salvar_relatorio(resultado: dict, run_date: str, run_time: str) -> str:
+    key = f"{PATH_RECONCILIACAO}{resultado['tabela']}_{run_date}_{run_time}.json"
+    s3.put_object(Bucket=BUCKET, Key=key, Body=json.dumps(resultado, ensure_ascii=False, indent=2).encode("utf-8"),
+                  ContentType="application/json")
+    return key
+
+
+if __name__ == "__main__":
+    tabelas = sys.argv[1:] or list(SCHEMA_TIPOS)
+    agora = datetime.now()
+    run_date, run_time = agora.strftime("%Y%m%d"), agora.strftime("%H%M%S")
+    divergentes = []
+    for tabela in tabelas:
+        if tabela not in SCHEMA_TIPOS:
+            print(f"❌ Tabela desconhecida: {tabela}")
+            raise SystemExit(1)
+        r = reconciliar(tabela)
+        if "erro" not in r:
+            key = salvar_relatorio(r, run_date, run_time)
+            contagens = {k: r[k]["total"] for k in ("ausentes_na_prata", "sobrando_na_prata",
+                                                  "divergentes", "duplicados_na_prata")}
+            icone = "✅" if r["ok"] else "❌"
+            print(f"{icone} {tabela}: Postgres {r['linhas_postgres']} × Prata {r['linhas_prata']} linhas | "
+                  f"{r['blocos_divergentes']}/{r['blocos']} blocos divergentes | {contagens} | "
+                  f"{r['consultas_postgres']} consulta(s), {r['segundos']}s → {key}")
+        if not r["ok"]:
+            divergentes.append(tabela)
+    if divergentes:
+        print(f"\n❌ Divergências em: {', '.join(divergentes)}")
+        raise SystemExit(1)
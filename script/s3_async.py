@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Leitura concorrente de muitos objetos do MinIO com asyncio.
+
+Ler centenas de arquivos diários um a um soma a latência de cada
+round-trip. Aqui as leituras rodam em paralelo, com:
+- paralelismo limitado (MAX_CONCORRENCIA requisições simultâneas);
+- backpressure: no máximo BUFFER resultados prontos aguardando o
+  consumidor; a busca pausa até ele avançar;
+- entrega em fluxo, na ordem das keys, assim que cada resultado fica pronto.
+
+As chamadas usam o boto3/pyarrow em um pool de threads próprio: o cliente
+boto3 é thread-safe e a decodificação Parquet do pyarrow libera o GIL, então
+download e decodificação se sobrepõem. Qualquer função de leitura por key
+serve (read_parquet_s3, ler_tabela, read_json_from_s3), mantendo cache em
+disco, handoff e range requests de cada uma.
+
+Uso:
+    from s3_async import iterar
+    for key, df in iterar(read_parquet_s3, keys):   # gerador síncrono
+        ...
+
+    async for key, df in buscar(read_parquet_s3, keys):   # em código async
+        ...
+"""
+
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterable, Iterator
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+MAX_CONCORRENCIA = 16   # leituras simultâneas
+BUFFER = 32             # resultados prontos (ou em voo) à frente do consumidor
+
+_FIM = object()
+
+# ============================================================
+# API ASYNC
+# ============================================================
+async def buscar(ler: Callable, keys: Iterable[str], concorrencia: int = MAX_CONCORRENCIA,
+                 buffer: int = BUFFER) -> AsyncIterator[tuple[str, object]]:
+    """Gera (key, ler(key)) na ordem das keys, com até `concorrencia` leituras em paralelo."""
+    semaforo = asyncio.Semaphore(concorrencia)
+    fila = asyncio.Queue(maxsize=max(buffer, 1))
+    loop = asyncio.get_running_loop()
+    # pool dedicado: o executor padrão do asyncio limitaria o paralelismo ao nº de CPUs
+    executor = ThreadPoolExecutor(max_workers=concorrencia, thread_name_prefix="s3_async")
+
+    async def ler_com_limite(key):
+        async with semaforo:
+            return await loop.run_in_executor(executor, ler, key)
+
+    async def produzir():
+        for key in keys:
+            # bloqueia quando o consumidor está BUFFER resultados atrás (backpressure)
+            await fila.put((key, asyncio.create_task(ler_com_limite(key))))
+        await fila.put(_FIM)
+
+    produtor = asyncio.create_task(produzir())
+    try:
+        while True:
+            item = await fila.get()
+            if item is _FIM:
+                break
+            key, tarefa = item
+            yield key, await tarefa
+    finally:
+        produtor.cancel()
+        while not fila.empty():
+            item = fila.get_nowait()
+            if item is not _FIM:
+                item[1].cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+async def listar(s3, bucket: str, prefixos: Iterable[str], concorrencia: int = MAX_CONCORRENCIA) -> dict:
+    """{prefixo: [keys]} listando vários prefixos em paralelo (cada um paginado)."""
+    def listar_um(prefixo):
+        keys = []
+        for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefixo):
+            keys.extend(o["Key"] for o in page.get("Contents", []))
+        return keys
+
+    return {p: keys async for p, keys in buscar(listar_um, list(prefixos), concorrencia)}
+
+# ============================================================
+# PONTE SÍNCRONA
+# ============================================================
+def iterar(ler: Callable, keys: Iterable[str], concorrencia: int = MAX_CONCORRENCIA,
+           buffer: int = BUFFER) -> Iterator[tuple[str, object]]:
+    """Versão síncrona de buscar(): o loop asyncio roda em uma thread e entrega em fluxo."""
+    saida = queue.Queue(maxsize=max(buffer, 1))
+    parar = threading.Event()
+
+    def entregar(item) -> bool:
+        """Põe o item na fila de saída; False se o consumidor já desistiu."""
+        while not parar.is_set():
+            try:
+                saida.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    async def consumir():
+        async for item in buscar(ler, keys, concorrencia, buffer):
+            if not await asyncio.to_thread(entregar, item):
+                return
+
+    def rodar():
+        try:
+            asyncio.run(consumir())
+            entregar((_FIM, None))
+        except BaseException as e:  # repassa o erro para a thread do consumidor
+            entregar((_FIM, e))
+
+    thread = threading.Thread(target=rodar, daemon=True)
+    thread.start()
+    try:
+        while True:
+            key, valor = saida.get()
+            if key is _FIM:
+                if valor is not None:
+                    raise valor
+                return
+            yield key, valor
+    finally:
+        parar.set()
+
+def ler_todos(ler: Callable, keys: list[str], concorrencia: int = MAX_CONCORRENCIA) -> list:
+    """Resultados de ler(key) para todas as keys, na ordem, lidos em paralelo."""
+    return [valor for _, valor in iterar(ler, keys, concorrencia)]
+
+def listar_prefixos(s3, bucket: str, prefixos: Iterable[str], concorrencia: int = MAX_CONCORRENCIA) -> dict:
+    """Versão síncrona de listar()."""
+    return asyncio.run(listar(s3, bucket, prefixos, concorrencia))
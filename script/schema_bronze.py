@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+Schemas versionados das fontes da Bronze e detecção de evolução de schema.
+
+Os JSONs de parceiros e as APIs mudam de formato sem aviso; sem controle,
+a mudança só aparece depois do parse completo (json_normalize gerando
+outras colunas ou pa.Table.from_pandas falhando). Aqui cada fonte tem um
+schema guardado e versionado:
+
+bronze/controle/schemas/<fonte>/v0001.json, v0002.json, ...
+    {"versao", "campos": {caminho: tipo}, "origem", "registrado_em"}
+
+Cada arquivo novo é verificado antes do processamento pesado, de forma barata:
+- JSON: só o início do objeto (range request de BYTES_AMOSTRA) e os
+  primeiros registros completos nele; o objeto inteiro só é lido se o
+  início não contiver nenhum registro completo (ex.: um único documento);
+- Parquet: só o footer (leitor_parquet_s3.ler_schema).
+
+Campos aninhados viram caminhos ("conta.banco", "itens[].sku").
+Resultado da verificação:
+- "novo": primeira vez, registra v0001;
+- "igual": nada muda;
+- "evoluido": mudança compatível (campo novo, campo opcional ausente,
+  int -> float, tipo antes só nulo). Registra uma nova versão com a união
+  dos campos; a Prata segue gravando só as partições novas, com as colunas
+  novas anuláveis (leitores unem por nome);
+- "incompativel": campo obrigatório ausente ou tipo incompatível. Nada é
+  registrado e exigir_compativel levanta SchemaIncompativel (a Prata do
+  db_loja marca só a tabela como falha; as demais seguem).
+
+Uso:
+    python script/schema_bronze.py                          # versões atuais de cada fonte
+    python script/schema_bronze.py json_produtos <key>      # verifica um arquivo
+"""
+
+import json
+import re
+import sys
+from datetime import datetime
+import boto3
+
+from cache_s3 import obter
+from leitor_parquet_s3 import ler_schema
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+BUCKET = "data-ingest"
+PATH_SCHEMAS = "bronze/controle/schemas/"
+BYTES_AMOSTRA = 64 * 1024
+MAX_REGISTROS_AMOSTRA = 200
+
+# fonte -> formato, chave com a lista de registros (JSON) e campos obrigatórios.
+# "tipos": False compara só a presença das colunas (a Prata do db_loja reaplica
+# os tipos com apply_schema e a Bronze pode vir como texto ou já tipada).
+FONTES = {
+    "json_extrato": {"formato": "json", "obrigatorios": ["id_extrato", "transacoes"]},
+    "json_pedidos": {"formato": "json", "obrigatorios": ["id_pedido", "itens"]},
+    "json_produtos": {"formato": "json", "registros": "produtos", "obrigatorios": ["id", "nome"]},
+    "json_tags": {"formato": "json", "obrigatorios": ["produto_id", "tags"]},
+    "ibge_uf": {"formato": "json", "obrigatorios": ["id", "sigla", "nome"]},
+    "ibge_municipios": {"formato": "json", "obrigatorios": ["codigo_ibge", "nome", "sigla_uf"]},
+    "dbloja_categorias_produto": {"formato": "parquet", "tipos": False, "obrigatorios": ["id", "nome"]},
+    "dbloja_cliente": {"formato": "parquet", "tipos": False, "obrigatorios": ["id", "nome"]},
+    "dbloja_pedido_cabecalho": {"formato": "parquet", "tipos": False,
+                                "obrigatorios": ["id", "id_cliente", "data_pedido", "valor_total"]},
+    "dbloja_pedido_itens": {"formato": "parquet", "tipos": False,
+                            "obrigatorios": ["id", "id_pedido", "id_produto", "quantidade", "preco_unitario"]},
+    "dbloja_produto": {"formato": "parquet", "tipos": False, "obrigatorios": ["id", "data_atualizacao"]},
+}
+
+s3 = boto3.client(
+    "s3",
+    endpoint_url="http://minio:9000",
+    aws_access_key_id="minioadmin",
+    aws_secret_access_key="minioadmin",
+    region_name="us-east-1"
+)
+
+_versoes = {}  # fonte -> último schema registrado (cache do processo)
+
+class SchemaIncompativel(Exception):
+    """Arquivo da Bronze com schema que quebra a Prata (campo obrigatório ausente ou tipo incompatível)."""
+
+# ============================================================
+# SCHEMA DE UMA AMOSTRA
+# ============================================================
+def _tipo_json(valor) -> str:
+    if valor is None:
+        return "null"
+    if isinstance(valor, bool):
+        return "bool"
+    if isinstance(valor, (int, float)):
+        return "num"
+    if isinstance(valor, str):
+        return "str"
+    if isinstance(valor, list):
+        return "list"
+    return "dict"
+
+def _unir_tipo(campos: dict, caminho: str, tipo: str):
+    tipos = set(campos.get(caminho, "").split("|")) - {""}
+    tipos.add(tipo)
+    if "list" in tipos and any(t.startswith("list<") for t in tipos):
+        tipos.discard("list")  # lista vazia não acrescenta informação a list<...>
+    campos[caminho] = "|".join(sorted(tipos))
+
+def _achatar(registro: dict, campos: dict, prefixo: str = ""):
+    """Acumula {caminho: tipos} do registro; listas de objetos descem como caminho[]."""
+    for nome, valor in registro.items():
+        caminho = f"{prefixo}{nome}"
+        tipo = _tipo_json(valor)
+        if tipo == "dict" and valor:
+            _achatar(valor, campos, f"{caminho}.")
+            continue
+        if tipo == "list":
+            elementos = {_tipo_json(v) for v in valor} - {"null"}
+            if elementos == {"dict"}:
+                tipo = "list<dict>"
+                for item in valor:
+                    _achatar(item, campos, f"{caminho}[].")
+            elif len(elementos) == 1:
+                tipo = f"list<{elementos.pop()}>"
+        _unir_tipo(campos, caminho, tipo)
+
+def schema_json(registros: list) -> dict:
+    campos = {}
+    for registro in registros:
+        if isinstance(registro, dict):
+            _achatar(registro, campos)
+    return dict(sorted(campos.items()))
+
+def _registros_do_inicio(texto: str, chave_registros: str | None) -> list:
+    """Registros completos no início de um JSON truncado (array de objetos).
+
+    O array precisa ser o documento (ou o valor de chave_registros); um
+    documento único truncado não tem registro completo.
+    """
+    if chave_registros:
+        m = re.search(rf'"{re.escape(chave_registros)}"\s*:\s*\[', texto)
+    else:
+        m = re.match(r"\s*\[", texto)
+    if not m:
+        return []
+    decoder, pos, registros = json.JSONDecoder(), m.end(), []
+    while len(registros) < MAX_REGISTROS_AMOSTRA:
+        while pos < len(texto) and texto[pos] in " \t\r\n,":
+            pos += 1
+        try:
+            registro, pos = decoder.raw_decode(texto, pos)
+        except json.JSONDecodeError:
+            break
+        registros.append(registro)
+    return registros
+
+def amostra_json(key: str, chave_registros: str | None = None) -> tuple[list, str]:
+    """(registros, origem): do início do objeto por range request ou, se preciso, do objeto inteiro."""
+    obj = s3.get_object(Bucket=BUCKET, Key=key, Range=f"bytes=0-{BYTES_AMOSTRA - 1}")
+    bruto = obj["Body"].read()
+    total = int(obj.get("ContentRange", "").rsplit("/", 1)[-1] or len(bruto))
+    if total > len(bruto):
+        registros = _registros_do_inicio(bruto.decode("utf-8", errors="ignore"), chave_registros)
+        if registros:
+            return registros, f"início ({len(bruto)} de {total} bytes)"
+        bruto = obter(s3, BUCKET, key)
+    dados = json.loads(bruto.decode("utf-8"))
+    if chave_registros and isinstance(dados, dict) and chave_registros in dados:
+        dados = dados[chave_registros]
+    registros = dados if isinstance(dados, list) else [dados]
+    return registros[:MAX_REGISTROS_AMOSTRA], "objeto inteiro"
+
+def _tipo_arrow(tipo) -> str:
+    nome = str(tipo)
+    if nome.startswith(("int", "uint", "float", "double", "decimal", "halffloat")):
+        return "num"
+    if nome in ("string", "large_string"):
+        return "str"
+    if nome.startswith("timestamp"):
+        return "timestamp"
+    if nome == "null":
+        return "null"
+    return nome
+
+def schema_parquet(key: str) -> dict:
+    return {f.name: _tipo_arrow(f.type) for f in ler_schema(key, bucket=BUCKET)}
+
+def schema_amostra(fonte: str, key: str) -> tuple[dict, str]:
+    config = FONTES[fonte]
+    if config["formato"] == "parquet":
+        return schema_parquet(key), "footer"
+    registros, origem = amostra_json(key, config.get("registros"))
+    return schema_json(registros), origem
+
+# ============================================================
+# VERSÕES
+# ============================================================
+def ultima_versao(fonte: str) -> dict | None:
+    if fonte not in _versoes:
+        res = s3.list_objects_v2(Bucket=BUCKET, Prefix=f"{PATH_SCHEMAS}{fonte}/")
+        keys = sorted(o["Key"] for o in res.get("Contents", []) if o["Key"].endswith(".json"))
+        _versoes[fonte] = json.loads(s3.get_object(Bucket=BUCKET, Key=keys[-1])["Body"].read()) if keys else None
+    return _versoes[fonte]
+
+def registrar_versao(fonte: str, campos: dict, origem: str) -> dict:
+    anterior = ultima_versao(fonte)
+    versao = {
+        "versao": (anterior["versao"] + 1) if anterior else 1,
+        "campos": campos,
+        "origem": origem,
+        "registrado_em": datetime.now().isoformat(timespec="seconds"),
+    }
+    s3.put_object(Bucket=BUCKET, Key=f"{PATH_SCHEMAS}{fonte}/v{versao['versao']:04d}.json",
+                  Body=json.dumps(versao, indent=2, ensure_ascii=False).encode("utf-8"))
+    _versoes[fonte] = versao
+    return versao
+
+# ============================================================
+# COMPARAÇÃO
+# ============================================================
+def _tipos(tipo: str) -> set:
+    return set(tipo.split("|")) - {"null", ""}
+
+def tipo_compativel(antigo: str, novo: str) -> bool:
+    """Novo tipo cabe no antigo: nulos e listas vazias são compatíveis com tudo."""
+    a, n = _tipos(antigo), _tipos(novo)
+    if not a or not n:
+        return True
+    if "list" in a and all(t.startswith("list") for t in n):
+        return True
+    if "list" in n and all(t.startswith("list") for t in a):
+        n = n - {"list"}
+    return n <= a
+
+def comparar(guardado: dict, novo: dict, obrigatorios: list[str], tipos: bool = True) -> dict:
+    """{"adicionados", "ausentes", "alterados", "incompativeis"} entre dois schemas."""
+    adicionados = sorted(set(novo) - set(guardado))
+    ausentes = sorted(set(guardado) - set(novo))
+    alterados, incompativeis = [], []
+    for campo in sorted(set(guardado) & set(novo)):
+        if guardado[campo] == novo[campo]:
+            continue
+        if not tipos or tipo_compativel(guardado[campo], novo[campo]):
+            alterados.append(campo)
+        else:
+            incompativeis.append(f"{campo}: {guardado[campo]} -> {novo[campo]}")
+    incompativeis += [f"{campo}: obrigatório ausente" for campo in obrigatorios if campo not in novo]
+    return {"adicionados": adicionados, "ausentes": ausentes, "alterados": alterados,
+            "incompativeis": incompativeis}
+
+def _unir(guardado: dict, novo: dict) -> dict:
+    campos = dict(guardado)
+    for campo, tipo in novo.items():
+        if campo in campos:
+            for t in tipo.split("|"):
+                _unir_tipo(campos, campo, t)
+        else:
+            campos[campo] = tipo
+    return dict(sorted(campos.items()))
+
+def verificar(fonte: str, key: str) -> dict:
+    """Compara o schema de `key` com a última versão da fonte e registra a evolução compatível."""
+    config = FONTES[fonte]
+    campos, origem = schema_amostra(fonte, key)
+    guardado = ultima_versao(fonte)
+    if guardado is None:
+        versao = registrar_versao(fonte, campos, key)
+        return {"status": "novo", "versao": versao["versao"], "amostra": origem}
+
+    mudancas = comparar(guardado["campos"], campos, config.get("obrigatorios", []), config.get("tipos", True))
+    if mudancas["incompativeis"]:
+        return {"status": "incompativel", "versao": guardado["versao"], "amostra": origem, **mudancas}
+    # campos ausentes na amostra continuam no schema (podem ser opcionais)
+    unido = _unir(guardado["campos"], campos) if config.get("tipos", True) else {**guardado["campos"], **{
+        c: t for c, t in campos.items() if c not in guardado["campos"]}}
+    if unido == guardado["campos"]:
+        return {"status": "igual", "versao": guardado["versao"], "amostra": origem, **mudancas}
+    versao = registrar_versao(fonte, unido, key)
+    return {"status": "evoluido", "versao": versao["versao"], "amostra": origem, **mudancas}
+
+def exigir_compativel(fonte: str, key: str) -> dict:
+    """verificar() que levanta SchemaIncompativel (antes do processamento pesado) se a mudança quebra a Prata."""
+    r = verificar(fonte, key)
+    if r["status"] == "incompativel":
+        print(f"❌ Schema incompatível em {key} (fonte {fonte}, v{r['versao']:04d}):")
+        for problema in r["incompativeis"]:
+            print(f"   - {problema}")
+        raise SchemaIncompativel(f"{fonte}: {key} ({'; '.join(r['incompativeis'])})")
+    if r["status"] == "evoluido":
+        print(f"🧬 {fonte}: schema evoluiu para v{r['versao']:04d} "
+              f"(+{r['adicionados'] or '-'}, tipos ampliados: {r['alterados'] or '-'})")
+    elif r["status"] == "novo":
+        print(f"🧬 {fonte}: schema registrado como v0001 a partir de {key}")
+    return r
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        r = verificar(sys.argv[1], sys.argv[2])
+        print(json.dumps(r, indent=2, ensure_ascii=False))
+        if r["status"] == "incompativel":
+            raise SystemExit(1)
+    else:
+        for fonte in FONTES:
+            v = ultima_versao(fonte)
+            print(f"{fonte:<28} {'v%04d' % v['versao'] if v else '-':<6} {len(v['campos']) if v else 0} campos")
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Log de snapshots da Prata db_loja: leitura "como estava em" sem listar o bucket.
+
+Cada snapshot gravado pela Prata (full load, alterações row-hash, merge
+do produto e engine Spark) entra no log da tabela:
+
+prata/dbloja/controle/snapshots/{tabela}.json
+    [{"versao": 1, "instante": "YYYYMMDD_HHMMSS", "arquivos": [...],
+      "linhas": N, "schema": [[coluna, tipo], ...], "expirado": false}, ...]
+
+As entradas ficam em ordem de versão e de instante, então as leituras
+resolvem versao=N ou as_of=<instante> por busca binária (O(log n)) sobre
+o log, sem list_objects. Linhas e schema vêm do footer dos arquivos.
+
+expirar() apaga os arquivos de snapshots antigos (mantendo as MANTER_VERSOES
+últimas e os dos últimos MANTER_DIAS dias) e marca as entradas como
+expiradas; leituras em versões expiradas falham com mensagem clara.
+
+Uso (API):
+    from snapshots_prata import ler
+    df = ler("produto", as_of="2025-11-01 12:00")
+    df = ler("cliente", versao=3, columns=["id", "email"])
+
+Uso (CLI):
+    python script/snapshots_prata.py produto                          # versões do log
+    python script/snapshots_prata.py produto --as-of "2025-11-01 12:00"
+    python script/snapshots_prata.py produto --reconstruir            # cria/completa o log a partir do bucket
+    python script/snapshots_prata.py produto --expirar
+"""
+
+import argparse
+import bisect
+import json
+import re
+from datetime import datetime, timedelta
+import boto3
+import pandas as pd
+import pyarrow as pa
+
+from leitor_parquet_s3 import ler_metadados, ler_tabela
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+BUCKET = "data-ingest"
+PATH_PRATA = "prata/dbloja/"
+PATH_LOG = f"{PATH_PRATA}controle/snapshots/"
+MANTER_VERSOES = 5    # snapshots mais recentes nunca expiram
+MANTER_DIAS = 30      # nem os gravados nos últimos dias
+
+s3 = boto3.client(
+    "s3",
+    endpoint_url="http://minio:9000",
+    aws_access_key_id="minioadmin",
+    aws_secret_access_key="minioadmin",
+    region_name="us-east-1"
+)
+
+# ============================================================
+# LOG
+# ============================================================
+def _key_log(tabela: str) -> str:
+    return f"{PATH_LOG}{tabela}.json"
+
+def ler_log(tabela: str) -> list[dict]:
+    try:
+        obj = s3.get_object(Bucket=BUCKET, Key=_key_log(tabela))
+        return json.loads(obj["Body"].read().decode("utf-8"))
+    except s3.exceptions.NoSuchKey:
+        return []
+
+def salvar_log(tabela: str, log: list[dict]):
+    s3.put_object(Bucket=BUCKET, Key=_key_log(tabela),
+                  Body=json.dumps(log, ensure_ascii=False, indent=1).encode("utf-8"),
+                  ContentType="application/json")
+
+def _entrada(versao: int, instante: str, arquivos: list[str]) -> dict:
+    linhas, schema = 0, None
+    for key in arquivos:
+        md = ler_metadados(key, bucket=BUCKET)
+        linhas += md.num_rows
+        schema = schema or md.schema.to_arrow_schema()
+    return {
+        "versao": versao,
+        "instante": instante,
+        "arquivos": arquivos,
+        "linhas": linhas,
+        "schema": [[f.name, str(f.type)] for f in schema] if schema else [],
+        "expirado": False,
+    }
+
+def registrar_snapshot(tabela: str, arquivos: list[str], run_date: str, run_time: str) -> dict | None:
+    """Acrescenta o snapshot ao log (ignora se os arquivos são os mesmos da última versão)."""
+    if not arquivos:
+        return None
+    instante = f"{run_date}_{run_time}"
+    log = ler_log(tabela)
+    if log and sorted(log[-1]["arquivos"]) == sorted(arquivos):
+        return log[-1]
+    if log and instante < log[-1]["instante"]:
+        print(f"⚠️ {tabela}: snapshot {instante} anterior à última versão do log ({log[-1]['instante']}); não registrado.")
+        return None
+    entrada = _entrada(log[-1]["versao"] + 1 if log else 1, instante, sorted(arquivos))
+    salvar_log(tabela, log + [entrada])
+    print(f"🗂️ {tabela}: versão {entrada['versao']} registrada ({entrada['linhas']} linhas).")
+    return entrada
+
+# ============================================================
+# RESOLUÇÃO E LEITURA
+# ============================================================
+def _instante(valor) -> str:
+    """Aceita 'YYYYMMDD_HHMMSS', datetime ou texto de data/hora."""
+    if isinstance(valor, str) and len(valor) == 15 and valor[8] == "_":
+        return valor
+    return pd.Timestamp(valor).strftime("%Y%m%d_%H%M%S")
+
+def resolver(tabela: str, as_of=None, versao: int | None = None, log: list[dict] | None = None) -> dict:
+    """Entrada do log para versao=N ou para o último snapshot com instante <= as_of (sem ambos: a atual)."""
+    log = ler_log(tabela) if log is None else log
+    if not log:
+        raise LookupError(f"{tabela}: log de snapshots vazio (use --reconstruir).")
+    if versao is not None:
+        i = bisect.bisect_left(log, versao, key=lambda e: e["versao"])
+        if i == len(log) or log[i]["versao"] != versao:
+            raise LookupError(f"{tabela}: versão {versao} não existe no log.")
+    elif as_of is not None:
+        i = bisect.bisect_right(log, _instante(as_of), key=lambda e: e["instante"]) - 1
+        if i < 0:
+            raise LookupError(f"{tabela}: nenhum snapshot até {as_of} (primeiro: {log[0]['instante']}).")
+    else:
+        i = len(log) - 1
+    entrada = log[i]
+    if entrada.get("expirado"):
+        raise LookupError(f"{tabela}: versão {entrada['versao']} ({entrada['instante']}) expirada.")
+    return entrada
+
+def ler_arrow(tabela: str, as_of=None, versao: int | None = None, columns=None, filters=None) -> pa.Table:
+    entrada = resolver(tabela, as_of=as_of, versao=versao)
+    return pa.concat_tables(
+        [ler_tabela(k, columns=columns, filters=filters, bucket=BUCKET) for k in entrada["arquivos"]],
+        promote_options="permissive",
+    )
+
+def ler(tabela: str, as_of=None, versao: int | None = None, columns=None, filters=None) -> pd.DataFrame:
+    """Snapshot da tabela em uma versão ou instante, como DataFrame."""
+    return ler_arrow(tabela, as_of=as_of, versao=versao, columns=columns, filters=filters).to_pandas()
+
+# ============================================================
+# MANUTENÇÃO
+# ============================================================
+def snapshot_do_arquivo(key: str) -> tuple[str, str]:
+    """(instante, unidade) do snapshot a que o arquivo da Prata pertence.
+
+    A unidade é o próprio arquivo (pandas), o dataset {tabela}_D_T.parquet/
+    (Spark) ou a partição data= com part-files soltos (layout antigo do
+    Spark, instante D_000000).
+    """
+    pasta, nome = key.rsplit("/", 1)
+    unidade = pasta if nome.startswith("part-") else key
+    data = re.search(r"/data=(\d{8})", key).group(1)
+    m = re.search(r"_(\d{8}_\d{6})", unidade.rsplit("/data=", 1)[1])
+    return (m.group(1) if m else f"{data}_000000"), unidade
+
+def reconstruir(tabela: str) -> list[dict]:
+    """Cria o log a partir dos snapshots existentes no bucket (única operação que lista).
+
+    Com log existente, só acrescenta os snapshots posteriores à última versão.
+    """
+    from new_script_silver import list_parquets  # só datasets confirmados e compactações visíveis
+    keys = list_parquets(f"{PATH_PRATA}{tabela}/data=")
+    snapshots = {}
+    for key in sorted(keys):
+        snapshots.setdefault(snapshot_do_arquivo(key), []).append(key)
+    log = ler_log(tabela)
+    ultimo = log[-1]["instante"] if log else ""
+    novos = [(instante, arquivos) for (instante, _), arquivos in sorted(snapshots.items()) if instante > ultimo]
+    proxima = log[-1]["versao"] + 1 if log else 1
+    log += [_entrada(proxima + i, instante, arquivos) for i, (instante, arquivos) in enumerate(novos)]
+    salvar_log(tabela, log)
+    print(f"🗂️ {tabela}: {len(novos)} versões acrescentadas ao log ({len(log)} no total).")
+    return log
+
+def substituir_arquivos(tabela: str, antigos: list[str], novos: list[str]):
+    """Troca, nas entradas do log, arquivos compactados (compactar_particoes.py) pelos novos."""
+    antigos = set(antigos)
+    log = ler_log(tabela)
+    alteradas = [e for e in log if antigos & set(e["arquivos"])]
+    for e in alteradas:
+        e["arquivos"] = sorted(set(e["arquivos"]) - antigos | set(novos))
+    if alteradas:
+        salvar_log(tabela, log)
+
+def expirar(tabela: str, manter_versoes: int = MANTER_VERSOES, manter_dias: int = MANTER_DIAS) -> int:
+    """Apaga os arquivos dos snapshots fora da retenção e marca as entradas como expiradas."""
+    log = ler_log(tabela)
+    limite = (datetime.now() - timedelta(days=manter_dias)).strftime("%Y%m%d_%H%M%S")
+    retidos = {k for e in log[-max(manter_versoes, 1):] for k in e["arquivos"]}
+    retidos |= {k for e in log if e["instante"] >= limite for k in e["arquivos"]}
+    expiradas = [e for e in log[:-max(manter_versoes, 1)] if not e.get("expirado") and e["instante"] < limite]
+    apagar = sorted({k for e in expiradas for k in e["arquivos"]} - retidos)
+    for i in range(0, len(apagar), 1000):
+        s3.delete_objects(Bucket=BUCKET, Delete={"Objects": [{"Key": k} for k in apagar[i:i + 1000]]})
+    for e in expiradas:
+        e["expirado"] = True
+    if expiradas:
+        salvar_log(tabela, log)
+    print(f"🧹 {tabela}: {len(expiradas)} versões expiradas, {len(apagar)} arquivos apagados.")
+    return len(expiradas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Log de snapshots da Prata db_loja")
+    parser.add_argument("tabela")
+    parser.add_argument("--as-of", help="instante (ex.: '2025-11-01 12:00')")
+    parser.add_argument("--versao", type=int)
+    parser.add_argument("--reconstruir", action="store_true", help="cria/completa o log listando os snapshots do bucket")
+    parser.add_argument("--expirar", action="store_true", help="apaga snapshots fora da retenção")
+    args = parser.parse_args()
+
+    if args.reconstruir:
+        reconstruir(args.tabela)
+    if args.expirar:
+        expirar(args.tabela)
+    if args.as_of or args.versao:
+        try:
+            e = resolver(args.tabela, as_of=args.as_of, versao=args.versao)
+        except LookupError as erro:
+            print(f"❌ {erro}")
+            raise SystemExit(1)
+        print(f"👉 versão {e['versao']} ({e['instante']}, {e['linhas']} linhas): {', '.join(e['arquivos'])}")
+    elif not (args.reconstruir or args.expirar):
+        for e in ler_log(args.tabela):
+            estado = " (expirado)" if e.get("expirado") else ""
+            print(f"v{e['versao']:>4}  {e['instante']}  {e['linhas']:>10} linhas  {len(e['arquivos'])} arquivo(s){estado}")
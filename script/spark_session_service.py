@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Serviço de sessão Spark compartilhada (Spark Connect) para a pipeline.
+
+Sobe um driver Spark "quente" uma única vez, com os jars já resolvidos
+(driver JDBC do Postgres, hadoop-aws e spark-connect), a configuração do
+spark-s3-fix.conf e as tabelas de referência da Prata em cache. As etapas
+Spark da pipeline (get_spark) se conectam a ele em vez de iniciar uma JVM
+nova a cada execução; sem o serviço no ar, cai para a sessão local.
+
+Cada tabela de referência fica em cache como global_temp.<tabela>_<versão>,
+com a versão calculada dos arquivos do snapshot: tabela_referencia() só
+devolve o cache se ele for do snapshot que a etapa vai ler (o merge do
+produto no new_script_silver_spark.py), nunca uma versão anterior.
+
+Uso:
+    python script/spark_session_service.py start    # mantém o serviço em primeiro plano
+    python script/spark_session_service.py status   # verifica se está ativo
+
+Jars pré-baixados podem ser colocados em jars/ (spark.jars) para evitar
+a resolução via Ivy também na subida do serviço.
+"""
+
+import glob
+import hashlib
+import os
+import signal
+import socket
+import sys
+import time
+from datetime import datetime
+import pyspark
+from pyspark.sql import SparkSession
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+BUCKET = "data-ingest"
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SPARK_CONF_FILE = os.path.join(RAIZ, "spark-s3-fix.conf")
+JARS_DIR = os.path.join(RAIZ, "jars")
+SPARK_PACKAGES = ["org.postgresql:postgresql:42.7.3", "org.apache.hadoop:hadoop-aws:3.3.4"]
+
+CONNECT_HOST = os.environ.get("SPARK_CONNECT_HOST", "localhost")
+CONNECT_PORT = int(os.environ.get("SPARK_CONNECT_PORT", "15002"))
+SPARK_REMOTE = os.environ.get("SPARK_REMOTE", f"sc://{CONNECT_HOST}:{CONNECT_PORT}")
+
+# Tabelas da Prata lidas pelas etapas Spark, mantidas em cache como global_temp.<tabela>_<versão>
+TABELAS_REFERENCIA = ["produto"]
+REFRESH_SEGUNDOS = 300  # intervalo de verificação de novos snapshots na Prata
+
+# ============================================================
+# CONFIGURAÇÃO DA SESSÃO
+# ============================================================
+def carregar_conf_spark(path: str = SPARK_CONF_FILE) -> dict:
+    """Lê o arquivo chave=valor com as configurações s3a do MinIO."""
+    conf = {}
+    if not os.path.exists(path):
+        print(f"⚠️ Arquivo de configuração Spark não encontrado: {path}")
+        return conf
+    with open(path, "r", encoding="utf-8") as f:
+        for linha in f:
+            linha = linha.strip()
+            if not linha or linha.startswith("#") or "=" not in linha:
+                continue
+            chave, valor = linha.split("=", 1)
+            conf[chave.strip()] = valor.strip()
+    return conf
+
+def _builder(app_name: str, connect_server: bool = False):
+    builder = (
+        SparkSession.builder
+        .appName(app_name)
+        .master(os.environ.get("SPARK_MASTER", "local[*]"))
+        .config("spark.sql.session.timeZone", "UTC")
+    )
+    packages = list(SPARK_PACKAGES)
+    if connect_server:
+        major = int(pyspark.__version__.split(".")[0])
+        if major < 4:
+            packages.append(f"org.apache.spark:spark-connect_2.12:{pyspark.__version__}")
+        builder = (
+            builder
+            .config("spark.plugins", "org.apache.spark.sql.connect.SparkConnectPlugin")
+            .config("spark.connect.grpc.binding.port", str(CONNECT_PORT))
+        )
+
+    jars_locais = sorted(glob.glob(os.path.join(JARS_DIR, "*.jar")))
+    if jars_locais:
+        builder = builder.config("spark.jars", ",".join(jars_locais))
+    else:
+        builder = builder.config("spark.jars.packages", ",".join(packages))
+
+    for chave, valor in carregar_conf_spark().items():
+        builder = builder.config(chave, valor)
+    return builder
+
+def servico_ativo(host: str = CONNECT_HOST, port: int = CONNECT_PORT) -> bool:
+    """True se o serviço Spark Connect estiver aceitando conexões."""
+    try:
+        with socket.create_connection((host, port), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+def get_spark(app_name: str = "PipelineSpark") -> SparkSession:
+    """Conecta ao serviço compartilhado, se ativo; senão cria uma sessão local.
+
+    Em modo Connect, spark.stop() encerra só o cliente: o driver continua no ar.
+    """
+    if os.environ.get("SPARK_REMOTE") or servico_ativo():
+        print(f"⚡ Conectando ao serviço Spark em {SPARK_REMOTE}")
+        return SparkSession.builder.remote(SPARK_REMOTE).getOrCreate()
+    print("🐢 Serviço Spark indisponível, iniciando sessão local.")
+    return _builder(app_name).getOrCreate()
+
+def paralelismo(spark: SparkSession) -> int:
+    """Paralelismo padrão da sessão (clientes Connect não expõem o SparkContext)."""
+    try:
+        return spark.sparkContext.defaultParallelism
+    except Exception:
+        return int(spark.conf.get("spark.default.parallelism", str(os.cpu_count() or 1)))
+
+# ============================================================
+# TABELAS DE REFERÊNCIA EM CACHE
+# ============================================================
+def versao_snapshot(keys: list[str]) -> str:
+    """Versão do snapshot (hash das keys), usada no nome da view em cache."""
+    return hashlib.sha256("\n".join(sorted(keys)).encode("utf-8")).hexdigest()[:12]
+
+def tabela_referencia(spark: SparkSession, tabela: str, keys: list[str]):
+    """DataFrame em cache no serviço para o snapshot `keys` da tabela, ou None.
+
+    Sem o serviço, com o cache ainda na versão anterior ou para tabelas fora
+    de TABELAS_REFERENCIA, quem chama lê os arquivos da Prata.
+    """
+    if tabela not in TABELAS_REFERENCIA or not keys:
+        return None
+    try:
+        df = spark.table(f"global_temp.{tabela}_{versao_snapshot(keys)}")
+        df.columns  # força a resolução da view (lazy no Spark Connect)
+        print(f"📌 {tabela}: usando o cache do serviço Spark")
+        return df
+    except Exception:
+        return None
+
+def registrar_referencias(spark: SparkSession, versoes: dict) -> dict:
+    """(Re)carrega em cache as tabelas cujo snapshot mudou desde a última verificação."""
+    # só o serviço precisa da Prata: get_spark não carrega a pilha do new_script_silver
+    from new_script_silver import latest_silver_snapshot_keys
+    for tabela in TABELAS_REFERENCIA:
+        keys = latest_silver_snapshot_keys(tabela)
+        if not keys:
+            continue
+        versao = versao_snapshot(keys)
+        if versoes.get(tabela) == versao:
+            continue
+        df = spark.read.parquet(*[f"s3a://{BUCKET}/{k}" for k in keys]).cache()
+        linhas = df.count()
+        df.createOrReplaceGlobalTempView(f"{tabela}_{versao}")
+        if tabela in versoes:
+            anterior = f"{tabela}_{versoes[tabela]}"
+            spark.table(f"global_temp.{anterior}").unpersist()
+            spark.catalog.dropGlobalTempView(anterior)
+        versoes[tabela] = versao
+        print(f"📌 {tabela} em cache ({linhas} linhas, versão {versao}) ← {keys[0]}")
+    return versoes
+
+# ============================================================
+# SERVIÇO
+# ============================================================
+def start():
+    if servico_ativo():
+        print(f"ℹ️ Serviço Spark já ativo em {SPARK_REMOTE}")
+        return
+
+    inicio = time.time()
+    print("🚀 Subindo driver Spark compartilhado (Spark Connect)...")
+    spark = _builder("SparkSessionService", connect_server=True).getOrCreate()
+    print(f"✅ Serviço ativo em {SPARK_REMOTE} ({time.time() - inicio:.1f}s)")
+
+    parar = []
+    signal.signal(signal.SIGTERM, lambda *_: parar.append(True))
+    signal.signal(signal.SIGINT, lambda *_: parar.append(True))
+
+    versoes = {}
+    proximo_refresh = 0.0
+    try:
+        while not parar:
+            if time.time() >= proximo_refresh:
+                try:
+                    registrar_referencias(spark, versoes)
+                except Exception as e:
+                    print(f"⚠️ Falha ao atualizar tabelas de referência: {e}")
+                proximo_refresh = time.time() + REFRESH_SEGUNDOS
+            time.sleep(1)
+    finally:
+        print(f"\n🔒 Encerrando serviço Spark ({datetime.now():%H:%M:%S}).")
+        spark.stop()
+
+def status():
+    if servico_ativo():
+        print(f"✅ Serviço Spark ativo em {SPARK_REMOTE}")
+    else:
+        print(f"❌ Serviço Spark inativo ({SPARK_REMOTE})")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    comando = sys.argv[1] if len(sys.argv) > 1 else "start"
+    if comando == "start":
+        start()
+    elif comando == "status":
+        status()
+    else:
+        print("Uso: python script/spark_session_service.py [start|status]")
+        raise SystemExit(1)
@@ -4,9 +4,15 @@
 #
 # Inicializa o Spark, lê dados do PostgreSQL em um DataFrame,
 # exibe o conteúdo e encerra a sessão Spark.
+# Se o script/spark_session_service.py estiver no ar, usa o driver
+# compartilhado (sem subir JVM nem resolver o driver JDBC novamente).
 
+import os
 import sys
-from pyspark.sql import SparkSession
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "script"))
+
+from spark_session_service import get_spark
 
 DB_HOST = "db"
 DB_PORT = "5432"
@@ -15,14 +21,9 @@ DB_USER = "myuser"
 DB_PASS = "mypassword"
 
 def main():
-    # Inicializa SparkSession com o driver JDBC do PostgreSQL
-    spark = (
-        SparkSession.builder
-        .appName("IngestCliente")
-        .master("local[*]")
-        .config("spark.jars.packages", "org.postgresql:postgresql:42.7.3")
-        .getOrCreate()
-    )
+    # Conecta ao serviço Spark compartilhado ou inicializa uma SparkSession
+    # local com o driver JDBC do PostgreSQL
+    spark = get_spark("IngestCliente")
 
     jdbc_url = f"jdbc:postgresql://{DB_HOST}:{DB_PORT}/{DB_NAME}"
     props = {
@@ -47,7 +48,7 @@ def main():
         print(f"❌ Erro ao ler dados do PostgreSQL: {e}", file=sys.stderr)
         sys.exit(1)
     finally:
-        # Fecha a conexão (SparkSession)
+        # Fecha a conexão (no modo compartilhado, só o cliente é encerrado)
         spark.stop()
         print("🔒 Conexão encerrada.")
 
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Teste da ingestão de municípios por UF (fan-out com limite de taxa) contra uma API local.
+
+Este script executa os seguintes passos:
+1. Sobe um servidor HTTP local que imita a BrasilAPI:
+   /api/ibge/uf/v1                 27 UFs
+   /api/ibge/municipios/v1/{uf}    3 municípios por UF (resposta com 50 ms de latência)
+2. Ingere as UFs e o consolidado de municípios no MinIO, sob teste/ibge/,
+   com no máximo 4 requisições simultâneas e 20 req/s (rajada de 2).
+3. Confere: uma chamada por UF, concorrência e taxa respeitadas, um único
+   objeto consolidado e, na segunda execução, nenhuma regravação.
+4. Aplica a transformação da Prata (montar_municipios) e confere a junção com as UFs.
+5. Simula UFs sem mudança desde um dia anterior (UF "identico", arquivo em
+   outra partição) e municípios alterados hoje ("gravado"): a Prata resolve
+   o arquivo atual de cada fonte separadamente (arquivo_atual).
+6. Remove os objetos e o estado criados pelo teste.
+
+Precisa do MinIO do docker-compose (minio:9000).
+"""
+
+import os
+import sys
+import json
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "script"))
+
+import pandas as pd
+
+from ingestao_api import BUCKET, chave_estado, ingerir, ler_estado, s3, salvar_estado
+from ingest_ibge_brasilapi_to_minio import PATH_MUNICIPIOS, PATH_UF, ingerir_municipios
+from new_script_silver_ibge_final import arquivo_atual, montar_municipios
+
+PREFIXO_TESTE = "teste/ibge"
+CONCORRENCIA, TAXA, RAJADA = 4, 20.0, 2
+SIGLAS = ["AC", "AL", "AP", "AM", "BA", "CE", "DF", "ES", "GO", "MA", "MT", "MS", "MG", "PA",
+          "PB", "PR", "PE", "PI", "RJ", "RN", "RS", "RO", "RR", "SC", "SP", "SE", "TO"]
+UFS = [{"id": 11 + i, "sigla": s, "nome": f"Estado {s}"} for i, s in enumerate(SIGLAS)]
+
+DATA_ANTIGA = "20000101"
+chamadas = []                      # (sigla, instante)
+extras = {"municipios": 0}         # municípios a mais por UF (simula mudança na API)
+em_voo = {"atual": 0, "maximo": 0}
+trava = threading.Lock()
+
+
+class BrasilApiStub(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def responder(self, dados):
+        corpo = json.dumps(dados, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        if self.path == PATH_UF:
+            self.responder(UFS)
+            return
+        m = re.fullmatch(r"/api/ibge/municipios/v1/([A-Z]{2})", self.path)
+        if not m:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        sigla = m.group(1)
+        with trava:
+            chamadas.append((sigla, time.monotonic()))
+            em_voo["atual"] += 1
+            em_voo["maximo"] = max(em_voo["maximo"], em_voo["atual"])
+        time.sleep(0.05)
+        n = SIGLAS.index(sigla)
+        self.responder([{"nome": f"Município {sigla} {i}", "codigo_ibge": str(1000000 * (n + 1) + i)}
+                        for i in range(3 + extras["municipios"])])
+        with trava:
+            em_voo["atual"] -= 1
+
+
+def limpar(base):
+    keys = [chave_estado(f"{base}{PATH_UF}"), chave_estado(f"{base}{PATH_MUNICIPIOS}")]
+    res = s3.list_objects_v2(Bucket=BUCKET, Prefix=f"{PREFIXO_TESTE}/")
+    keys += [o["Key"] for o in res.get("Contents", [])]
+    s3.delete_objects(Bucket=BUCKET, Delete={"Objects": [{"Key": k} for k in keys]})
+
+
+def verificar(condicao: bool, mensagem: str) -> int:
+    print(f"{'✅' if condicao else '❌'} {mensagem}")
+    return 0 if condicao else 1
+
+
+def main():
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), BrasilApiStub)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{servidor.server_port}"
+    print(f"🌐 BrasilAPI de teste em {base}")
+    limpar(base)
+
+    falhas = 0
+    try:
+        uf = ingerir(f"{base}{PATH_UF}", PREFIXO_TESTE, "ibge-uf")
+        inicio = time.monotonic()
+        primeira = ingerir_municipios(uf["key"], base, PREFIXO_TESTE, CONCORRENCIA, TAXA, RAJADA)
+        segundos = time.monotonic() - inicio
+
+        siglas = sorted(s for s, _ in chamadas)
+        falhas += verificar(siglas == sorted(SIGLAS), f"{len(chamadas)} chamadas, uma por UF")
+        falhas += verificar(em_voo["maximo"] <= CONCORRENCIA,
+                            f"máximo de {em_voo['maximo']} requisições simultâneas (limite {CONCORRENCIA})")
+        instantes = sorted(t for _, t in chamadas)
+        minimo = (len(instantes) - RAJADA) / TAXA
+        falhas += verificar(instantes[-1] - instantes[0] >= minimo * 0.95,
+                            f"chamadas espalhadas em {instantes[-1] - instantes[0]:.2f}s "
+                            f"(mínimo {minimo:.2f}s a {TAXA:g} req/s); etapa completa em {segundos:.2f}s")
+
+        dados = json.loads(s3.get_object(Bucket=BUCKET, Key=primeira["key"])["Body"].read())
+        falhas += verificar(primeira["status"] == "gravado" and len(dados) == 3 * len(SIGLAS),
+                            f"consolidado com {len(dados)} municípios em {primeira['key']}")
+
+        segunda = ingerir_municipios(uf["key"], base, PREFIXO_TESTE, CONCORRENCIA, TAXA, RAJADA)
+        gravados = s3.list_objects_v2(Bucket=BUCKET, Prefix=f"{PREFIXO_TESTE}/").get("KeyCount", 0)
+        falhas += verificar(segunda["status"] == "identico" and gravados == 2,
+                            f"segunda execução: {segunda['status']}, {gravados} objetos na Bronze de teste")
+
+        df = montar_municipios(dados, pd.DataFrame(UFS))
+        sp = df[df["sigla_uf"] == "SP"]
+        falhas += verificar(df["id_uf"].notna().all() and (sp["nome_uf"] == "Estado SP").all(),
+                            f"Prata: {len(df)} municípios com id_uf/nome_uf juntados pela sigla")
+
+        # UFs sem mudança desde um dia anterior, municípios alterados hoje
+        mesma_uf = ingerir(f"{base}{PATH_UF}", PREFIXO_TESTE, "ibge-uf")
+        uf_antiga = f"{PREFIXO_TESTE}/data={DATA_ANTIGA}/ibge-uf_{DATA_ANTIGA}_000000.json"
+        s3.copy_object(Bucket=BUCKET, Key=uf_antiga, CopySource={"Bucket": BUCKET, "Key": mesma_uf["key"]})
+        s3.delete_object(Bucket=BUCKET, Key=mesma_uf["key"])
+        salvar_estado(f"{base}{PATH_UF}", {**ler_estado(f"{base}{PATH_UF}"), "key": uf_antiga})
+        extras["municipios"] = 1
+        terceira = ingerir_municipios(uf_antiga, base, PREFIXO_TESTE, CONCORRENCIA, TAXA, RAJADA)
+        falhas += verificar(mesma_uf["status"] == "identico" and terceira["status"] == "gravado",
+                            f"UF {mesma_uf['status']} em data={DATA_ANTIGA}, municípios {terceira['status']} hoje")
+
+        hoje = datetime.now().strftime("%Y%m%d")
+        key_uf = arquivo_atual(r"ibge[-_]?uf_", hoje, f"{PREFIXO_TESTE}/")
+        key_mun = arquivo_atual("ibge-municipios_", hoje, f"{PREFIXO_TESTE}/")
+        falhas += verificar(key_uf == uf_antiga and key_mun == terceira["key"],
+                            f"Prata resolve cada fonte na própria partição: {key_uf} | {key_mun}")
+        ufs = json.loads(s3.get_object(Bucket=BUCKET, Key=key_uf)["Body"].read())
+        municipios = json.loads(s3.get_object(Bucket=BUCKET, Key=key_mun)["Body"].read())
+        df = montar_municipios(municipios, pd.DataFrame(ufs))
+        falhas += verificar(len(df) == 4 * len(SIGLAS) and df["id_uf"].notna().all(),
+                            f"Prata: {len(df)} municípios com a UF da partição antiga")
+    finally:
+        limpar(base)
+        servidor.shutdown()
+
+    if falhas:
+        print(f"\n❌ {falhas} verificação(ões) falharam.")
+        raise SystemExit(1)
+    print("\n✅ Todas as verificações passaram.")
+
+
+if __name__ == "__main__":
+    main()
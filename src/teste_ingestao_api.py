@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Teste do componente de ingestão HTTP (script/ingestao_api.py) contra um servidor local.
+
+Este script executa os seguintes passos:
+1. Sobe um servidor HTTP local (thread) que imita uma API pública:
+   /uf          JSON com ETag/Last-Modified, responde 304 a requisições condicionais
+   /sem-cache   mesmo JSON sem ETag (só a comparação por hash evita a regravação)
+   /instavel    responde 503 nas duas primeiras chamadas (exercita retry/backoff)
+   /grande      ~27 MB, acima de TAMANHO_PARTE (exercita o multipart upload)
+2. Ingere cada endpoint duas vezes no MinIO, sob teste/ingestao_api/.
+3. Confere os status esperados (gravado → nao_modificado / identico).
+4. Remove os objetos e o estado criados pelo teste.
+
+Precisa do MinIO do docker-compose (minio:9000).
+"""
+
+import os
+import sys
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "script"))
+
+import ingestao_api
+from ingestao_api import BUCKET, PATH_CONTROLE, criar_sessao, ingerir, s3
+
+PREFIXO_TESTE = "teste/ingestao_api"
+ETAG = '"uf-v1"'
+LAST_MODIFIED = "Mon, 06 Oct 2025 12:00:00 GMT"
+CORPO = json.dumps([{"id": 35, "sigla": "SP", "nome": "São Paulo"},
+                    {"id": 33, "sigla": "RJ", "nome": "Rio de Janeiro"}]).encode("utf-8")
+CORPO_GRANDE = b"[" + b",".join(b'{"id": %d, "valor": "%s"}' % (i, b"x" * 40) for i in range(400000)) + b"]"
+
+chamadas = {"instavel": 0}
+
+
+class ApiStub(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def responder(self, corpo: bytes, headers: dict | None = None):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        for nome, valor in (headers or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        if self.path == "/uf":
+            if self.headers.get("If-None-Match") == ETAG:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.responder(CORPO, {"ETag": ETAG, "Last-Modified": LAST_MODIFIED})
+        elif self.path == "/sem-cache":
+            self.responder(CORPO)
+        elif self.path == "/instavel":
+            chamadas["instavel"] += 1
+            if chamadas["instavel"] <= 2:
+                self.send_response(503)
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.responder(CORPO)
+        elif self.path == "/grande":
+            self.responder(CORPO_GRANDE)
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+
+def limpar(urls):
+    keys = [ingestao_api.chave_estado(u) for u in urls]
+    res = s3.list_objects_v2(Bucket=BUCKET, Prefix=f"{PREFIXO_TESTE}/")
+    keys += [o["Key"] for o in res.get("Contents", [])]
+    s3.delete_objects(Bucket=BUCKET, Delete={"Objects": [{"Key": k} for k in keys]})
+
+
+def main():
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), ApiStub)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{servidor.server_port}"
+    print(f"🌐 Servidor de teste em {base}")
+
+    sessao = criar_sessao(backoff=0.01)
+    casos = {
+        "uf": ("gravado", "nao_modificado"),
+        "sem-cache": ("gravado", "identico"),
+        "instavel": ("gravado", "identico"),
+        "grande": ("gravado", "identico"),
+    }
+    urls = [f"{base}/{nome}" for nome in casos]
+    limpar(urls)
+
+    falhas = 0
+    try:
+        for nome, esperados in casos.items():
+            url = f"{base}/{nome}"
+            obtidos = tuple(ingerir(url, PREFIXO_TESTE, nome, sessao=sessao)["status"] for _ in esperados)
+            ok = obtidos == esperados
+            falhas += not ok
+            print(f"{'✅' if ok else '❌'} /{nome}: {obtidos} (esperado {esperados})")
+
+        gravados = s3.list_objects_v2(Bucket=BUCKET, Prefix=f"{PREFIXO_TESTE}/").get("KeyCount", 0)
+        ok = gravados == len(casos)
+        falhas += not ok
+        print(f"{'✅' if ok else '❌'} {gravados} objeto(s) na Bronze de teste (esperado {len(casos)})")
+
+        grande = s3.head_object(Bucket=BUCKET, Key=ingestao_api.ler_estado(f"{base}/grande")["key"])
+        ok = grande["ContentLength"] == len(CORPO_GRANDE)
+        falhas += not ok
+        print(f"{'✅' if ok else '❌'} /grande enviado em multipart: {grande['ContentLength']} bytes")
+    finally:
+        limpar(urls)
+        servidor.shutdown()
+
+    print(f"\n🏁 Estado de controle em {BUCKET}/{PATH_CONTROLE} (removido ao final).")
+    if falhas:
+        print(f"❌ {falhas} verificação(ões) falharam.")
+        raise SystemExit(1)
+    print("✅ Todas as verificações passaram.")
+
+
+if __name__ == "__main__":
+    main()
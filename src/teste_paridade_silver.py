@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+Teste de paridade entre as engines pandas e Spark da camada Prata (db_loja).
+
+Este script executa os seguintes passos:
+1. Monta DataFrames de exemplo no formato da Bronze (colunas como texto).
+2. Aplica a tipagem com o apply_schema (pandas) e o apply_schema_spark (Spark).
+3. Executa o merge de produto nas duas engines, também com ids repetidos
+   (fica a linha de data_atualizacao mais recente; empate: a última).
+4. Compara tipos e valores das saídas, linha a linha, ordenadas por id.
+5. Ponta a ponta: grava no MinIO, sob teste/paridade_silver/, arquivos da
+   Bronze com tipos misturados (uma extração tipada e outra só texto, como
+   saem de engines de extração diferentes), roda o full refresh das duas
+   engines (silver_full_from_bronze e silver_full_from_bronze_spark) sobre
+   os mesmos arquivos e compara os Parquets gravados por cada uma.
+6. Remove os objetos criados pelo teste.
+
+Os passos 1 a 4 não acessam o MinIO; o passo 5 precisa do MinIO do
+docker-compose (minio:9000). A sessão vem do get_spark (serviço Spark
+compartilhado, se estiver no ar, ou sessão local com o spark-s3-fix.conf).
+"""
+
+import os
+import sys
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "script"))
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import new_script_silver as silver
+import new_script_silver_spark as silver_spark
+import schema_bronze
+import snapshots_prata
+from leitor_parquet_s3 import ler_tabela
+from new_script_silver import BUCKET, SCHEMA_TIPOS, apply_schema, merge_produto
+from new_script_silver_spark import TIPOS_SPARK, apply_schema_spark, merge_produto_spark
+from spark_session_service import get_spark
+
+# Dados de exemplo no formato da Bronze (tudo texto, como no ingest_dbloja.py)
+BRONZE = {
+    "categorias_produto": pd.DataFrame({
+        "id": ["1", "2", "3"],
+        "nome": ["Eletrônicos", "Livros", "Casa"],
+        "descricao": ["Aparelhos", None, "Utilidades"],
+    }),
+    "cliente": pd.DataFrame({
+        "id": ["10", "11"],
+        "nome": ["Ana", "Bruno"],
+        "email": ["ana@x.com", "bruno@x.com"],
+        "telefone": ["1199999", None],
+        "data_cadastro": ["2025-01-10 08:30:00", "2025-02-01 12:00:00"],
+    }),
+    "pedido_cabecalho": pd.DataFrame({
+        "id": ["100", "101"],
+        "id_cliente": ["10", "11"],
+        "data_pedido": ["2025-03-01 10:00:00", None],
+        "valor_total": ["150.50", "99.90"],
+    }),
+    "pedido_itens": pd.DataFrame({
+        "id": ["1000", "1001", "1002"],
+        "id_pedido": ["100", "100", "101"],
+        "id_produto": ["1", "2", "1"],
+        "quantidade": ["1", "2", "3"],
+        "preco_unitario": ["50.50", "50.00", "33.30"],
+    }),
+}
+
+PRODUTO_SILVER = pd.DataFrame({
+    "id": ["1", "2", "3"],
+    "nome": ["Notebook", "Livro", "Panela"],
+    "descricao": ["i7", "Romance", None],
+    "preco": ["5000.00", "49.90", "120.00"],
+    "estoque": ["5", "100", "8"],
+    "id_categoria": ["1", "2", "3"],
+    "data_criacao": ["2025-01-01 00:00:00"] * 3,
+    "data_atualizacao": ["2025-01-01 00:00:00"] * 3,
+})
+
+# Delta: atualiza preço do id 2, atualiza id 3 com preço nulo (mantém o anterior) e cria o id 4
+PRODUTO_DELTA = pd.DataFrame({
+    "id": ["2", "3", "4"],
+    "nome": ["Livro", "Panela Inox", "Cadeira"],
+    "descricao": ["Romance", "Inox", "Escritório"],
+    "preco": ["39.90", None, "350.00"],
+    "estoque": ["90", "7", "12"],
+    "id_categoria": ["2", "3", "3"],
+    "data_criacao": ["2025-01-01 00:00:00", "2025-01-01 00:00:00", "2025-02-01 00:00:00"],
+    "data_atualizacao": ["2025-02-01 00:00:00"] * 3,
+})
+
+# ids repetidos: id 2 com a versão mais nova antes da antiga, id 4 empatado (vale a
+# última linha) e id 1 duplicado na própria Prata
+PRODUTO_DELTA_DUPLICADO = pd.DataFrame({
+    "id": ["2", "2", "4", "4"],
+    "nome": ["Livro Novo", "Livro Velho", "Cadeira", "Cadeira Gamer"],
+    "descricao": ["Romance", "Romance", "Escritório", "Escritório"],
+    "preco": ["44.90", "29.90", "350.00", "990.00"],
+    "estoque": ["80", "95", "12", "3"],
+    "id_categoria": ["2", "2", "3", "3"],
+    "data_criacao": ["2025-01-01 00:00:00"] * 2 + ["2025-02-01 00:00:00"] * 2,
+    "data_atualizacao": ["2025-03-01 00:00:00", "2025-02-15 00:00:00",
+                         "2025-02-01 00:00:00", "2025-02-01 00:00:00"],
+})
+PRODUTO_SILVER_DUPLICADO = pd.concat([PRODUTO_SILVER, pd.DataFrame({
+    "id": ["1"], "nome": ["Notebook Pro"], "descricao": ["i9"], "preco": ["7000.00"],
+    "estoque": ["2"], "id_categoria": ["1"], "data_criacao": ["2025-01-01 00:00:00"],
+    "data_atualizacao": ["2025-01-20 00:00:00"],
+})], ignore_index=True)
+
+
+# Ponta a ponta: mesmas tabelas gravadas também já tipadas (tipos do Postgres, como no extracao_faixas.py)
+BRONZE_TIPADA = {
+    "pedido_cabecalho": pa.table({
+        "id": pa.array([102, 103], pa.int64()),
+        "id_cliente": pa.array([10, None], pa.int64()),
+        "data_pedido": pa.array([pd.Timestamp("2025-03-02 09:15:00"), None], pa.timestamp("us")),
+        "valor_total": pa.array([10.0, 2500.75], pa.float64()),
+    }),
+    "pedido_itens": pa.table({
+        "id": pa.array([1003, 1004], pa.int64()),
+        "id_pedido": pa.array([102, 103], pa.int32()),
+        "id_produto": pa.array([2, 3], pa.int32()),
+        "quantidade": pa.array([1, 4], pa.int16()),
+        "preco_unitario": pa.array([10.0, 625.1875], pa.float64()),
+    }),
+}
+
+PREFIXO_TESTE = "teste/paridade_silver/"
+BRONZE_TESTE = f"{PREFIXO_TESTE}bronze/dbloja/"
+DATA_TIPADA, DATA_TEXTO, DATA_EXECUCAO = "20250301", "20250302", "20250303"
+
+
+def normalizar(df: pd.DataFrame) -> list:
+    """Converte o DataFrame em linhas de valores Python comparáveis (nulos -> None)."""
+    df = df.sort_values("id").reset_index(drop=True)
+    linhas = []
+    for _, row in df.iterrows():
+        valores = []
+        for v in row.tolist():
+            if v is None or (not isinstance(v, str) and pd.isna(v)):
+                valores.append(None)
+            elif isinstance(v, pd.Timestamp):
+                valores.append(v.tz_localize(None) if v.tzinfo else v)
+            elif isinstance(v, (int, float)) and not isinstance(v, bool):
+                valores.append(float(v))
+            else:
+                valores.append(str(v))
+        linhas.append(valores)
+    return linhas
+
+
+def comparar(nome: str, tabela: str, df_pandas: pd.DataFrame, df_spark) -> bool:
+    """Compara colunas, tipos e valores das duas engines."""
+    ok = True
+    if list(df_pandas.columns) != df_spark.columns:
+        print(f"❌ {nome}: colunas diferentes {list(df_pandas.columns)} x {df_spark.columns}")
+        return False
+
+    tipos_spark = dict(df_spark.dtypes)
+    for col, typ in SCHEMA_TIPOS.get(tabela, {}).items():
+        if col in tipos_spark and tipos_spark[col] != TIPOS_SPARK[typ]:
+            print(f"❌ {nome}: tipo de '{col}' é {tipos_spark[col]}, esperado {TIPOS_SPARK[typ]}")
+            ok = False
+
+    if normalizar(df_pandas) != normalizar(df_spark.toPandas()):
+        print(f"❌ {nome}: valores diferentes")
+        print(df_pandas.sort_values("id").to_string(index=False))
+        print(df_spark.toPandas().sort_values("id").to_string(index=False))
+        ok = False
+
+    if ok:
+        print(f"✅ {nome}: saídas idênticas ({len(df_pandas)} linhas)")
+    return ok
+
+
+def apontar_para(engine: str):
+    """Aponta as duas engines para a Bronze de teste e para uma Prata/controle por engine."""
+    silver.PATH_BRONZE = silver_spark.PATH_BRONZE = BRONZE_TESTE
+    silver.PATH_PRATA = silver_spark.PATH_PRATA = f"{PREFIXO_TESTE}{engine}/prata/dbloja/"
+    silver.ENTRADAS_PREFIX = f"{PREFIXO_TESTE}{engine}/controle/entradas/"
+    snapshots_prata.PATH_LOG = f"{PREFIXO_TESTE}{engine}/controle/snapshots/"
+    schema_bronze.PATH_SCHEMAS = f"{PREFIXO_TESTE}controle/schemas/"
+    schema_bronze._versoes.clear()
+
+
+def gravar_bronze(table: pa.Table, tabela: str, data: str):
+    buf = BytesIO()
+    pq.write_table(table, buf)
+    key = f"{BRONZE_TESTE}data={data}/{tabela}_{data}_120000.parquet"
+    silver.s3.put_object(Bucket=BUCKET, Key=key, Body=buf.getvalue())
+
+
+def limpar():
+    for page in silver.s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET, Prefix=PREFIXO_TESTE):
+        keys = [{"Key": o["Key"]} for o in page.get("Contents", [])]
+        if keys:
+            silver.s3.delete_objects(Bucket=BUCKET, Delete={"Objects": keys})
+
+
+def tipo_coluna(tipo: pa.DataType) -> str:
+    """Família do tipo gravado (larguras e unidades de tempo podem variar entre as engines)."""
+    if pa.types.is_integer(tipo):
+        return "inteiro"
+    if pa.types.is_floating(tipo):
+        return "decimal"
+    if pa.types.is_timestamp(tipo):
+        return "timestamp"
+    if pa.types.is_string(tipo) or pa.types.is_large_string(tipo):
+        return "texto"
+    return str(tipo)
+
+
+def comparar_arquivos(tabela: str) -> bool:
+    """Compara os Parquets gravados na Prata de teste pelas duas engines."""
+    saidas = {}
+    for engine in ("pandas", "spark"):
+        apontar_para(engine)
+        keys = silver.latest_silver_snapshot_keys(tabela)
+        if not keys:
+            print(f"❌ ponta a ponta {tabela}: {engine} não gravou snapshot")
+            return False
+        saidas[engine] = pa.concat_tables([ler_tabela(k, bucket=BUCKET) for k in keys], promote_options="permissive")
+
+    nome = f"ponta a ponta {tabela}"
+    tp, ts = saidas["pandas"], saidas["spark"]
+    if tp.column_names != ts.column_names:
+        print(f"❌ {nome}: colunas diferentes {tp.column_names} x {ts.column_names}")
+        return False
+    ok = True
+    for col in tp.column_names:
+        a, b = tipo_coluna(tp.schema.field(col).type), tipo_coluna(ts.schema.field(col).type)
+        if a != b:
+            print(f"❌ {nome}: tipo de '{col}' é {b} no Spark e {a} no pandas")
+            ok = False
+    if normalizar(tp.to_pandas()) != normalizar(ts.to_pandas()):
+        print(f"❌ {nome}: valores diferentes")
+        print(tp.to_pandas().sort_values("id").to_string(index=False))
+        print(ts.to_pandas().sort_values("id").to_string(index=False))
+        ok = False
+    if ok:
+        print(f"✅ {nome}: Parquets idênticos ({tp.num_rows} linhas)")
+    return ok
+
+
+def paridade_ponta_a_ponta(spark) -> list:
+    """Full refresh das duas engines sobre os mesmos arquivos da Bronze (tipados + texto)."""
+    limpar()
+    for tabela, df in BRONZE.items():
+        gravar_bronze(pa.Table.from_pandas(df, preserve_index=False), tabela, DATA_TEXTO)
+    for tabela, table in BRONZE_TIPADA.items():
+        gravar_bronze(table, tabela, DATA_TIPADA)
+
+    for tabela in BRONZE:
+        apontar_para("pandas")
+        silver.silver_full_from_bronze(tabela, DATA_EXECUCAO, "120000")
+        apontar_para("spark")
+        silver_spark.silver_full_from_bronze_spark(spark, tabela, DATA_EXECUCAO, "120000")
+    return [comparar_arquivos(tabela) for tabela in BRONZE]
+
+
+def main():
+    """Função principal que executa o teste de paridade."""
+
+    print("Iniciando a sessão Spark para o teste de paridade...")
+    spark = get_spark("TesteParidadeSilver")
+
+    try:
+        resultados = []
+
+        # 1. Tipagem (full refresh)
+        for tabela, df in BRONZE.items():
+            df_pandas = apply_schema(tabela, df.copy())
+            df_spark = apply_schema_spark(tabela, spark.createDataFrame(df))
+            resultados.append(comparar(f"schema {tabela}", tabela, df_pandas, df_spark))
+
+        # 2. Merge (upsert) de produto, sem e com ids repetidos
+        casos = {
+            "merge produto": (PRODUTO_SILVER, PRODUTO_DELTA),
+            "merge produto (ids repetidos)": (PRODUTO_SILVER_DUPLICADO, PRODUTO_DELTA_DUPLICADO),
+        }
+        for nome, (silver_df, delta_df) in casos.items():
+            silver_pd = apply_schema("produto", silver_df.copy())
+            delta_pd = apply_schema("produto", delta_df.copy())
+            merged_pd = apply_schema("produto", merge_produto(silver_pd, delta_pd))
+
+            silver_sp = apply_schema_spark("produto", spark.createDataFrame(silver_df))
+            delta_sp = apply_schema_spark("produto", spark.createDataFrame(delta_df))
+            merged_sp = apply_schema_spark("produto", merge_produto_spark(silver_sp, delta_sp))
+            resultados.append(comparar(nome, "produto", merged_pd, merged_sp))
+
+        # 3. Full refresh ponta a ponta, Bronze com tipos misturados
+        try:
+            resultados += paridade_ponta_a_ponta(spark)
+        finally:
+            limpar()
+
+        if not all(resultados):
+            print("\n❌ Teste de paridade falhou.")
+            sys.exit(1)
+
+        print("\n\nTeste de paridade pandas x Spark concluído com sucesso!")
+
+    finally:
+        print("\nEncerrando a sessão Spark.")
+        spark.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,8 @@
 Script de teste para PySpark usando o mesmo dataset do exemplo do Pandas.
 
 Este script executa os seguintes passos:
-1. Cria uma SparkSession.
+1. Obtém a SparkSession pelo get_spark: conecta ao serviço compartilhado
+   (script/spark_session_service.py) se estiver no ar; senão sobe uma sessão local.
 2. Cria um DataFrame do Spark com dados de produtos.
 3. Exibe o schema e o conteúdo do DataFrame.
 4. Demonstra como selecionar, filtrar e adicionar novas colunas com a sintaxe do PySpark.
@@ -11,18 +12,24 @@ Este script executa os seguintes passos:
 """
 
 # 1. Importações Necessárias
-# SparkSession é o ponto de entrada.
+# get_spark (script/spark_session_service.py) é o ponto de entrada.
 # 'col' e 'avg' são funções do PySpark que usaremos para manipular colunas
 # de forma mais limpa e expressiva.
-from pyspark.sql import SparkSession
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "script"))
+
 from pyspark.sql.functions import col, avg
 
+from spark_session_service import get_spark
+
 def main():
     """Função principal que executa o teste do Spark."""
 
     print("Iniciando a sessão Spark com o dataset de produtos...")
-    # 2. Inicialização da SparkSession (semelhante ao anterior)
-    spark = SparkSession.builder.appName("TesteProdutosSpark").getOrCreate()
+    # 2. Conexão ao serviço Spark compartilhado (ou sessão local, se ele não estiver no ar)
+    spark = get_spark("TesteProdutosSpark")
     print("Sessão Spark iniciada com sucesso!")
 
     try:
@@ -80,7 +87,7 @@ def main():
         print("\n\nTeste do Spark com dataset de produtos concluído com sucesso!")
 
     finally:
-        # 8. Encerramento da Sessão
+        # 8. Encerramento da Sessão (em modo Connect, encerra só o cliente)
         print("\nEncerrando a sessão Spark.")
         spark.stop()
 